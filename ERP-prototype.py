@@ -10,32 +10,57 @@ part image - done
 job checklist - done
 part process templates - done
 bulk parts list entry - done
-bulk raw material list
+bulk raw material list - done
 gantt chart - done
-add material to part process frame
+add material to part process frame - done
 bulk parts process entries
 part check boxes
 automatic cost calculations
 profitability calculations
 Part profit bar graph visualisation - done
 estimated delivery date - done
-job scheduling system
+job scheduling system - done
 '''
 
+import lazy_imports
 import tkinter as tk
 from tkinter import ttk
+from tkinter import messagebox
+from tkinter import filedialog
+from tkinter import simpledialog
 from tkinter.scrolledtext import ScrolledText
-import pandas as pd
 import os
-from PIL import Image, ImageTk
+import sys
+import collections
+import csv
 import datetime
-
-import numpy as np
-from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg, NavigationToolbar2TkAgg)
-from matplotlib.backend_bases import key_press_handler
-from matplotlib.figure import Figure
-
-import pdf_reports
+import heapq
+import pathlib
+import traceback
+import webbrowser
+
+import erp_model
+import erp_store
+import image_cache
+import drawing_store
+import costing
+import job_totals
+import scheduler
+import gantt
+import task_runner
+import process_templates
+import bom_import
+import mrp
+import part_search
+import event_log
+
+#Heavy modules are imported on first use, or by the warm up thread once the window is shown
+np = lazy_imports.lazy('numpy')
+pdf_reports = lazy_imports.lazy('pdf_reports')
+risk = lazy_imports.lazy('risk')
+CHART_MODULES = ['matplotlib.figure', 'matplotlib.backends.backend_tkagg']
+HEAVY_MODULES = ['numpy'] + CHART_MODULES + ['pdf_reports']
+lazy_imports.mark('imports done')
 
 #Global constants
 TITLE_FONT = ('Droid', 12, 'bold')
@@ -48,34 +73,79 @@ COLOR2 = '#COD5EA' #light blue
 COLOR3 = '#0F4563' #blue
 COLOR4 = '#636361' #darker grey
 COLOR5 = '#BCB2D2' #purple grey
+APPLICATION_FOLDER = os.path.dirname(os.path.abspath(__file__))  #data files live next to the program
+LOGO_FILE = os.path.join(APPLICATION_FOLDER, 'img', 'logo.png')
+THUMBNAIL_SIZE = (150, 150)
+POLL_INTERVAL = 50  #ms between checks for work finished in background threads
+DATABASE_FILE = os.path.join(APPLICATION_FOLDER, 'erp.db')
+ROUTER_POOL_SIZE = 4  #Part_Router widgets kept alive for recently opened parts
+RECOMPUTE_DELAY = 300  #ms without edits before the costs are recalculated
+MAX_CHART_PARTS = 6  #parts shown in the profitability chart and the delivery dates
+GANTT_FILE = os.path.join(APPLICATION_FOLDER, 'gantt-chart.html')
+SCHEDULING_RULE = 'edd'  #priority rule of the scheduler, 'edd' or 'cr'
+RISK_SAMPLES = 1000  #schedules sampled by the What If analysis
+MAX_MISSING_ROWS = 5  #shortages of the job shown in the What's Missing list
+MAX_MATERIAL_ROWS = 8  #material lines of the job shown in the main window, the rest is in the material list
+MAX_LIST_LINES = 1000  #material lines shown in the material list window
+MAX_HISTORY_EVENTS = 2000  #most recent events shown in the history of a job
+NOT_RECEIVED = 'Not Received'  #material line filter, every status but Received
+NO_TEMPLATE = '(no routing)'  #bulk entry choice to add the parts without a process template
 
 class Main_Application(tk.Frame):
     def __init__(self, master):
+        configure_styles(master)
         tk.Frame.__init__(self, master, background='white')
         self.master.title('ERP Prototype')
-        self.master.iconphoto(self.master, tk.PhotoImage(file='img\logo.png'))
+        self.master.iconphoto(self.master, image_cache.get_photo(LOGO_FILE))
         self.master.geometry('+25+5') #('1050x600+50+50')
 
-        self.parts_list = []
+        self.job = erp_model.Job()
+        self.material_index = erp_model.Material_Index([self.job])
+        self.indexed_jobs = []  #open jobs whose material lines are in material_index
+        self.store = erp_store.Job_Store(DATABASE_FILE)
+        self.event_log = event_log.Event_Log()
+        lazy_imports.mark('event log loaded')
+        self.log_id = None
+        self.logged_parts = {}  #id(part): part, edited since the last log_changes()
+        self.log_number = None  #job number at the last save or open, the events are keyed on it
+        self.runner = task_runner.Task_Runner()
 
         self.create_frames()
+        self.recompute_id = None
+        self.open_jobs = None  #other open jobs from the database, loaded on the first schedule
+        self.open_routes = None  #scheduler routes of the open jobs, built with them
+        self.open_jobs_task = None
+        self.schedule_task = None
+        self.risk_task = None
+        self.open_demand = None  #material demand of the open jobs, exploded with them
+        self.stock = None
+        self.materials_task = None
+        self.requirements = None
+        self.material_window = None
+        self.totals = job_totals.Job_Totals(self.job, views=[self.show_totals])
         configure_frames(self)  #Configures the frames in Main_Application, padding, relief, color, etc.
-        configure_widgets(self) #Configures all widgets and their children with padding, color, font
+        configure_widgets(self) #Pads the widgets created at startup, colors and fonts come from configure_styles
         self.configure(background='lightgrey')
+        self.poll_background_work()
+        self.warm_up_thread = None
+        self.after_idle(self.warm_up)
+        self.master.protocol('WM_DELETE_WINDOW', self.close)
 
 
 
     def create_frames(self):
         self.title1 = Title_Frame(self, 'Built with tkinter')
         self.buttons_frame = Buttons_Frame(self)
-        self.job_summary_frame = Job_Summary_Frame(self)
-        self.job_image_frame = Image_Frame(self, 'img/assembly-REV-A.png')
+        self.job_summary_frame = Job_Summary_Frame(self, self.job)
+        self.job_image_frame = Image_Frame(self, self.job.drawing, self.import_job_drawing)
         self.parts_list_frame = Parts_List_Frame(self)
-        self.material_list_frame = Material_List_Frame(self)
-        self.job_checklist_frame = Job_Checklist_Frame(self)
+        self.material_list_frame = Material_List_Frame(self, self.job)
+        self.job_checklist_frame = Job_Checklist_Frame(self, self.job)
         self.graph = Bar_Graph(self)
         self.parts_frame = Parts_Frame(self)
-        self.estimated_deliveries_frame = Estimated_Deliveries_Frame(self)
+        self.router_pool = Router_Pool(self.parts_frame, ROUTER_POOL_SIZE, self.part_changed)
+        self.estimated_deliveries_frame = Estimated_Deliveries_Frame(self, self.job)
+        self.jobs_frame = Jobs_Frame(self, self.runner)
 
         #Column 0
         self.title1.grid(row=0, column=0, sticky=tk.NSEW, columnspan=2)
@@ -89,6 +159,7 @@ class Main_Application(tk.Frame):
         self.parts_list_frame.grid(row=0, column=2, sticky=tk.NSEW, rowspan=2)
         self.material_list_frame.grid(row=2, column=2, sticky=tk.NSEW)
         self.graph.grid(row=3, column=2, sticky=tk.NSEW)
+        self.jobs_frame.grid(row=4, column=0, sticky=tk.NSEW, columnspan=3)
         self.rowconfigure(1, weight=2)
         self.rowconfigure(2, weight=1)
         #column3
@@ -96,86 +167,474 @@ class Main_Application(tk.Frame):
         self.parts_frame.rowconfigure(0, weight=0)
 
 
-    def add_tooltips(self, children):
-        '''recursive function to add a tooltip to all widgets'''
-        for child in children:
-            tooltip.create_ToolTip(child, child.winfo_name())
-            if len(child.winfo_children()) > 0:
-                self.add_tooltips(child.winfo_children())
+    def warm_up(self):
+        '''Imports the chart and report modules in the background once the window is shown'''
+        lazy_imports.mark('window shown')
+        self.warm_up_thread = lazy_imports.warm_up(HEAVY_MODULES, lambda: lazy_imports.mark('warm up done'))
 
-    def add_part(self, part_title, event=None):
-        self.part_router = Part_Router(self.parts_frame, part_title)
-        self.parts_list.append(self.part_router)
+    def print_startup_report(self):
+        '''Prints the startup report once the warm up thread is done'''
+        if self.warm_up_thread is None or self.warm_up_thread.is_alive():
+            self.after(POLL_INTERVAL, self.print_startup_report)
+        else:
+            print(lazy_imports.startup_report())
 
-    def open_part(self, item, event=None):
-        if item != ():
-            if len(self.parts_frame.grid_slaves()) > 1:
-                self.parts_frame.grid_slaves()[0].grid_remove()
-            self.parts_list[item[0]].grid(row=1, column=0, sticky=tk.N)
-            self.parts_frame.focus_set()
+    def poll_background_work(self):
+        '''Collects the drawings decoded and the tasks finished in the background, runs on the Tk thread.
+        An error in a callback is printed, the polling goes on'''
+        try:
+            image_cache.loader.poll()
+            self.runner.poll()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.after(POLL_INTERVAL, self.poll_background_work)
+
+    def close(self):
+        '''Window closed: the edits still waiting for the debounce are logged before quitting'''
+        self.log_changes()
+        self.event_log.close()
+        self.store.close()
+        self.master.destroy()
+
+    def create_report(self, kind, part=None):
+        '''Renders a pdf_reports report of a snapshot of the job, or of one part, in the process
+        pool. The report is opened once it is written'''
+        if part is None:
+            job = pdf_reports.report_snapshot(self.job)
+            path = pdf_reports.report_filename(kind, job)
+        else:
+            job = pdf_reports.report_snapshot(self.job, [part])
+            path = pdf_reports.report_filename(kind, job, suffix=part.number)
+        cached = pdf_reports.cache_path(kind, job)
+        if pdf_reports.copy_cached(cached, path):
+            open_document(path)
+            return
+        self.runner.add_future(os.path.basename(path), pdf_reports.submit_report(kind, job, path, cached),
+                               on_done=open_document, on_error=lambda error: self.report_error(kind, error))
+
+    def report_error(self, kind, error):
+        messagebox.showerror('Report', 'The {} could not be created:\n{}'.format(kind, error))
+
+    def export_csv(self, title, path, header, rows):
+        '''Writes the rows in the background and opens the file. rows must be a copy of the model data'''
+        self.runner.submit(title, write_csv, path, header, rows, pass_task=True, on_done=open_document,
+                           on_error=lambda error: self.report_error(title, error))
+
+    def add_tooltips(self):
+        '''Shows the name of every widget in a tooltip, through a single class binding'''
+        self.tooltip = Tooltip(self.master)
+
+    def import_drawing(self, path, number, on_done):
+        '''Stores the drawing in the drawing store in the background, on_done(blob reference)'''
+        self.runner.submit('Import ' + os.path.basename(path), drawing_store.store.import_drawing, path, number,
+                           drawing_store.revision_from_name(path), on_done=on_done,
+                           on_error=lambda error: self.report_error('drawing import', error))
+
+    def import_job_drawing(self, path):
+        '''Attaches the drawing to the job once it is stored'''
+        job = self.job
+        self.import_drawing(path, job.number, lambda blob: self.job_drawing_imported(job, blob))
+
+    def job_drawing_imported(self, job, blob):
+        job.drawing = blob
+        if job is self.job:
+            self.job_image_frame.load_image(blob)
+
+    def add_part(self, part_title, event=None):
+        '''Adds the part to the job, its Part_Router is only built when the part is opened'''
+        part = self.job.add_part(part_title)
+        part.add_task()
+        self.part_changed(part)
+        return part
+
+    def add_parts(self, parts, template=None):
+        '''Adds the parts to the job, with the routing of the process template if one is given'''
+        if template is not None:
+            if template not in process_templates.library:
+                messagebox.showwarning('Template', 'The template {} does not exist'.format(template))
+                return False
+            process_templates.library.apply(template, parts)
+            self.log_routing(parts)
+        self.job.parts.extend(parts)
+        for part in parts:
+            self.totals.mark_dirty(part)
+        self.schedule_recompute()
+        return True
+
+    def apply_template(self, name, parts):
+        '''Replaces the routing of the parts with a process template. Only the data is
+        written, the routers already built for these parts are rebound to it'''
+        if name not in process_templates.library:
+            messagebox.showwarning('Template', 'The template {} does not exist'.format(name))
+            return
+        process_templates.library.apply(name, parts)
+        self.log_routing(parts)
+        for part in parts:
+            self.totals.mark_dirty(part)
+        self.router_pool.rebind(parts)
+        self.schedule_recompute()
+
+    def save_template(self, name, part):
+        '''Saves the routing of the part in the template library, raises ValueError on an
+        operation that does not belong to its department'''
+        process_templates.library.add_from_part(name, part)
+        process_templates.library.save()
+
+    def delete_template(self, name):
+        process_templates.library.remove(name)
+        process_templates.library.save()
+
+    def part_changed(self, part):
+        '''Called by the views on every edit of a part or of its routing'''
+        self.totals.mark_dirty(part)
+        self.parts_list_frame.search.invalidate()  #rebuilt on the next search
+        if self.log_number is not None:
+            self.logged_parts[id(part)] = part
+            self.schedule_log()
+        self.schedule_recompute()
+
+    def part_renamed(self, part):
+        '''The part number was edited, the parts list shows the new number'''
+        self.parts_list_frame.rename_part(part)
+
+    def job_changed(self):
+        '''Called by the job summary on every edit, a new number or delivery date reschedules the job'''
+        self.schedule_recompute()
+        if self.log_number is not None:
+            self.schedule_log()
+
+    def schedule_log(self):
+        '''Debounce: the changes are written to the event log once the edits stop'''
+        if self.log_id is not None:
+            self.after_cancel(self.log_id)
+        self.log_id = self.after(RECOMPUTE_DELAY, self.log_changes)
+
+    def log_changes(self):
+        '''Records the job status and the status and routing of the edited parts, when they changed.
+        A job never saved or opened is not logged, its number is still being typed'''
+        if self.log_id is not None:
+            self.after_cancel(self.log_id)
+            self.log_id = None
+        if self.log_number is not None:
+            number = self.log_number
+            self.event_log.record_change('status', number, 'job', self.job.status, default='')
+            for part in self.logged_parts.values():
+                self.event_log.record_change('status', number, 'part:' + part.number, part.status, default='')
+                self.event_log.record_change('routing', number, part.number, routing_steps(part))
+        self.logged_parts.clear()
+
+    def log_routing(self, parts):
+        '''One event for a process template applied to the parts'''
+        if parts and self.log_number is not None:
+            self.event_log.record('routing', self.log_number, keys=[part.number for part in parts],
+                                  value=routing_steps(parts[0]))
+
+    def log_key(self, job):
+        '''Job number the events of the job are recorded under'''
+        return self.log_number if job is self.job else job.number
+
+    def job_saved(self):
+        '''The job was saved under its number. A new number starts its log with the current
+        state of the job, later edits are recorded under it'''
+        if self.log_number != self.job.number:
+            self.log_number = self.job.number
+            for item in self.job.checklist:
+                self.checklist_changed(item)
+            for part in self.job.parts:
+                self.logged_parts[id(part)] = part
+        self.log_changes()
+
+    def checklist_changed(self, item):
+        if self.log_number is not None:
+            self.event_log.record_change('checklist', self.log_number, item.task,
+                                         [item.done, item.employee, item.date.isoformat() if item.date else None])
+
+    def show_history(self):
+        '''Reads the most recent events of the job from the log in the background'''
+        number = self.log_key(self.job)
+        if number is None:
+            messagebox.showinfo('History', 'The job has no history until it is saved')
+            return
+        self.runner.submit('History', self.event_log.last, number, MAX_HISTORY_EVENTS,
+                           on_done=lambda events: Event_History_Window(self, number, events))
+
+    def schedule_recompute(self):
+        '''Debounce: the recalculation runs once the edits stop for RECOMPUTE_DELAY'''
+        if self.recompute_id is not None:
+            self.after_cancel(self.recompute_id)
+        self.recompute_id = self.after(RECOMPUTE_DELAY, self.recompute)
+
+    def recompute(self):
+        self.recompute_id = None
+        self.totals.recompute()
+
+    def show_totals(self, changed, removed):
+        '''Updates the views that depend on the parts whose totals changed'''
+        self.job_summary_frame.refresh_attributes(erp_model.COMPUTED_FIELDS)
+        router = self.router_pool.shown
+        if router is not None and any(part is router.part for part in changed):
+            router.refresh_attributes(erp_model.COMPUTED_FIELDS)
+        self.graph.update_parts(changed, removed)
+        self.schedule_deliveries()
+        self.plan_materials()
+
+    def load_open_jobs(self):
+        '''Other open jobs with their routes and material demand, and the material stock.
+        Loaded once in the background and kept until the job is saved or replaced.
+        Returns None until they are loaded, the schedule and the material planning run again then'''
+        if self.open_jobs is None and self.open_jobs_task is None:
+            self.open_jobs_task = self.runner.submit('Open Jobs', load_open_data, DATABASE_FILE, self.job.number,
+                                                     self.totals.rates, on_done=self.open_jobs_loaded,
+                                                     on_error=self.open_jobs_failed)
+        return self.open_jobs
+
+    def open_jobs_loaded(self, data):
+        self.open_jobs_task = None
+        self.open_jobs, self.open_routes, self.open_demand, self.stock = data
+        for job in self.indexed_jobs:
+            self.material_index.remove_job(job)
+        for job in self.open_jobs:
+            self.material_index.add_job(job)
+        self.indexed_jobs = self.open_jobs
+        self.schedule_deliveries()
+        self.plan_materials()
+
+    def open_jobs_failed(self, error):
+        self.report_error('open jobs list', error)
+        self.open_jobs_loaded(([], [], mrp.Demand(), {}))
+
+    def forget_open_jobs(self):
+        '''The open jobs are loaded again on the next schedule'''
+        if self.open_jobs_task is not None:
+            self.open_jobs_task.cancel()
+            self.open_jobs_task = None
+        self.open_jobs = self.open_routes = None
+
+    def schedule_deliveries(self):
+        '''Schedules the job with every other open job, in a background thread.
+        The routings of the job are copied first so it can be edited while the schedule runs,
+        the routes of the other open jobs were built when they were loaded'''
+        for task in (self.schedule_task, self.risk_task):
+            if task is not None:
+                task.cancel()
+        self.schedule_task = self.risk_task = None
+        if not self.job.parts:
+            self.estimated_deliveries_frame.bind_job(self.job)
+            return
+        if self.load_open_jobs() is None:
+            return  #scheduled once the open jobs are loaded
+        routes = scheduler.routes_from_jobs([self.job], self.totals.rates) + self.open_routes
+        self.schedule_task = self.runner.submit('Schedule', scheduler.schedule, routes, None, SCHEDULING_RULE,
+                                                on_done=self.schedule_done)
+
+    def schedule_done(self, schedule):
+        self.schedule_task = None
+        self.estimated_deliveries_frame.show_schedule(schedule)
+
+    def simulate_deliveries(self, schedule):
+        '''Monte Carlo analysis of the schedule of the job, in the background'''
+        if self.risk_task is not None:
+            self.risk_task.cancel()
+        self.risk_task = self.runner.submit('What If', risk.simulate, schedule, RISK_SAMPLES, [self.job.number],
+                                            on_done=self.risk_done)
+
+    def risk_done(self, result):
+        self.risk_task = None
+        self.estimated_deliveries_frame.show_risk(result)
+
+    def plan_materials(self):
+        '''Material requirements of the job and of every other open job, netted against
+        the stock in a background thread'''
+        if self.materials_task is not None:
+            self.materials_task.cancel()
+            self.materials_task = None
+        window_open = self.material_window is not None and self.material_window.winfo_exists()
+        if not self.job.parts and not self.job.materials and not window_open:
+            self.material_list_frame.show_requirements(None)
+            return
+        if self.load_open_jobs() is None:
+            return  #planned once the open jobs are loaded
+        self.materials_task = self.runner.submit('Materials', mrp.plan, [mrp.explode([self.job]), self.open_demand],
+                                                 dict(self.stock), on_done=self.materials_done)
+
+    def materials_done(self, requirements):
+        self.materials_task = None
+        self.requirements = requirements
+        self.material_list_frame.show_requirements(requirements)
+        if self.material_window is not None and self.material_window.winfo_exists():
+            self.material_window.show_requirements(requirements)
+            self.material_window.show_lines()
+
+    def add_material_line(self, line):
+        self.job.materials.append(line)
+        self.material_index.add(self.job, line)
+        self.materials_changed()
+
+    def set_material_status(self, line, status):
+        '''Status changes go through the material index, the material planning is updated'''
+        self.material_index.set_status(line, status)
+        number = self.log_key(self.material_index.job_of(line))
+        if number is not None:
+            self.event_log.record_change('status', number, 'material:{}:{}'.format(line.material, line.part), status)
+        self.material_list_frame.refresh()
+        if self.material_window is not None and self.material_window.winfo_exists():
+            self.material_window.show_lines()
+        self.plan_materials()
+
+    def materials_changed(self):
+        '''Material lines added or removed, their costs and the material planning are recalculated'''
+        self.material_list_frame.refresh()
+        if self.material_window is not None and self.material_window.winfo_exists():
+            self.material_window.show_lines()
+        self.totals.recompute_all()
+
+    def update_stock(self, material, on_hand, on_order):
+        self.store.save_stock({material: (on_hand, on_order)})
+        if self.open_jobs is not None:
+            self.stock[material] = (on_hand, on_order)
+        else:
+            self.forget_open_jobs()  #a load in progress may have read the old stock
+        self.plan_materials()
+
+    def load_job(self, job):
+        '''Replaces the current job, every view is rebound to the new model'''
+        self.log_changes()
+        self.job = job
+        self.log_number = job.number
+        self.material_index = erp_model.Material_Index([job])
+        self.indexed_jobs = []
+        self.job_summary_frame.bind_job(job)
+        self.job_image_frame.load_image(job.drawing)
+        self.job_checklist_frame.bind_job(job)
+        self.material_list_frame.bind_job(job)
+        self.router_pool.clear()
+        self.parts_list_frame.bind_job(job)
+        self.graph.clear()
+        self.estimated_deliveries_frame.bind_job(job)
+        self.forget_open_jobs()
+        if self.recompute_id is not None:
+            self.after_cancel(self.recompute_id)
+            self.recompute_id = None
+        self.totals = job_totals.Job_Totals(job, self.totals.rates, views=[self.show_totals])
+
+    def update_costs(self):
+        '''Recalculates the cost and hours of every part and of the job'''
+        self.totals.recompute_all()
+
+    def delete_part(self, part):
+        self.job.remove_part(self.job.parts.index(part))
+        self.router_pool.discard(part)
+        self.totals.remove_part(part)
+
+    def open_part(self, part, event=None):
+        self.router_pool.show(part)
+        self.parts_frame.focus_set()
 
 class Title_Frame(tk.Frame):
     def __init__(self, master, title):
         tk.Frame.__init__(self, master)
-        self.img = tk.PhotoImage(file='img/logo.png')
+        self.img = image_cache.get_photo(LOGO_FILE)
         self.img_label = ttk.Label(self, image=self.img)
         self.title = ttk.Label(self, text=title, font=TITLE_FONT)
         self.img_label.grid(row=0, column=0, sticky=tk.W)
         self.title.grid(row=0, column=1, sticky=tk.W)
 
 class Entry_Bar(tk.Frame):
-    '''Basic label and entry bar, grided horizontally'''
-    def __init__(self, master, text):
+    '''Basic label and entry bar, grided horizontally.
+    When bound to a model attribute, the entry is a view: edits are written to the model'''
+    def __init__(self, master, text, model=None, attribute=None, command=None):
         tk.Frame.__init__(self, master)
         self.entry_label = ttk.Label(self, text=text, width=12)
         self.entry_var = tk.StringVar()
         self.entry = ttk.Entry(self, width=12, text=self.entry_var)
+        if attribute in erp_model.COMPUTED_FIELDS:
+            self.entry.configure(state='readonly')
+        self.model = None
+        self.attribute = attribute
+        self.command = command  #called after every edit written to the model
+        self.entry_var.trace_add('write', self.on_write)
+        if model is not None:
+            self.bind_model(model)
 
         self.entry_label.grid(row=0, column=0, sticky=tk.W)
         self.entry.grid(row=0, column=1, sticky=tk.W)
 
+    def bind_model(self, model, attribute=None):
+        '''Displays model.attribute, the model is detached while the text is loaded'''
+        if attribute is not None:
+            self.attribute = attribute
+        self.model = None
+        self.entry_var.set(model.get_text(self.attribute))
+        self.model = model
+
+    def on_write(self, *args):
+        if self.model is not None:
+            self.model.set_text(self.attribute, self.entry_var.get())
+            if self.command is not None:
+                self.command()
+
 class Job_Summary_Frame(tk.Frame):
     '''This is where the basic information for the job goes'''
-    def __init__(self, master):
+    def __init__(self, master, job):
         tk.Frame.__init__(self, master)
         self.title = tk.Label(self, text='Job Summary', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W)
+        self.job = job
         self.entry_bars = []
-        self.item_names = ['Job Number', 'Description', 'Client', 'Quantity',
-                           'Cost', 'Delivery Date', 'Status']
-        for item in self.item_names:
-            self.entry_bars.append(Entry_Bar(self, item))
+        self.item_names = [label for label, attribute in erp_model.JOB_FIELDS]
+        for label, attribute in erp_model.JOB_FIELDS:
+            self.entry_bars.append(Entry_Bar(self, label, job, attribute, self.master.job_changed))
 
         for i, entry_bar in enumerate(self.entry_bars):
             entry_bar.grid(row=i+1, column=0, sticky=tk.W)
 
+    def bind_job(self, job):
+        self.job = job
+        for entry_bar in self.entry_bars:
+            entry_bar.bind_model(job)
+
+    def refresh_attributes(self, attributes):
+        '''Reloads the entry bars of these attributes, after they were calculated'''
+        for entry_bar in self.entry_bars:
+            if entry_bar.attribute in attributes:
+                entry_bar.bind_model(self.job)
+
 class Job_Checklist_Frame(tk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, job):
         tk.Frame.__init__(self, master)
         self.title = tk.Label(self, text='Checklist', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W)
         self.row = 1
-        self.task_list = ['Confirmation', 'Material Requisition', 'Purchase',
-                          'Job Released']
+        self.job = job
+        self.task_list = [item.task for item in job.checklist]
         self.task_objects = []
+        self.history_button = ttk.Button(self, text='History', command=self.master.show_history)
+        self.history_button.grid(row=0, column=1, sticky=tk.E)
 
-        self.create_tasks(self.task_list)
+        self.create_tasks(job.checklist)
 
-    def create_tasks(self, tasks):
-        for task in tasks:
-            self.task = Job_Checklist_Task(self, task)
+    def create_tasks(self, items):
+        for item in items:
+            self.task = Job_Checklist_Task(self, item)
             self.task_objects.append(self.task)
             self.task.grid(row=self.row, column=0, sticky=tk.NSEW)
             self.row += 1
 
+    def bind_job(self, job):
+        self.job = job
+        for task, item in zip(self.task_objects, job.checklist):
+            task.bind_item(item)
+
 class Job_Checklist_Task(tk.Frame):
-    def __init__(self, master, text):
+    '''View of an erp_model.Checklist_Item'''
+    def __init__(self, master, item):
         tk.Frame.__init__(self, master)
+        self.item = item
+        text = item.task
         self.configure(relief=tk.GROOVE, bd=2)
-        self.style = ttk.Style()
-        self.style.configure('my.TCheckbutton', font=LABEL_FONT_BOLD)
         self.widget_width = 14
-        self.var = tk.IntVar()
+        self.var = tk.IntVar(value=int(item.done))
         self.check = ttk.Checkbutton(self, text=text, variable=self.var, command=self.on_select, width=self.widget_width, style='my.TCheckbutton')
         self.create_combobox()
         self.status_var = tk.StringVar()
@@ -188,47 +647,99 @@ class Job_Checklist_Task(tk.Frame):
         self.combobox.grid(row=1, column=0, sticky=tk.W)
         self.date_label.grid(row=1, column=1, sticky=tk.W)
 
-        self.on_select()
+        self.show_state()
 
 
     def create_combobox(self):
-        self.combobox_var = tk.StringVar()
+        self.combobox_var = tk.StringVar(value=self.item.employee)
         self.combobox = ttk.Combobox(self, width=self.widget_width, textvariable=self.combobox_var)
         self.combobox.configure(state='readonly')
-        self.combobox['values'] = ['Paul tempsdniaser', 'Bob', 'Jacqueline', 'Chuck Norris']
-        self.combobox.current(0)
+        self.combobox['values'] = erp_model.EMPLOYEES
+        self.combobox.bind('<<ComboboxSelected>>', self.on_employee)
+
+    def bind_item(self, item):
+        self.item = item
+        self.var.set(int(item.done))
+        self.combobox_var.set(item.employee)
+        self.show_state()
+
+    def on_employee(self, event=None):
+        self.item.employee = self.combobox_var.get()
+        self.master.master.checklist_changed(self.item)
 
     def on_select(self):
-        if self.var.get() == 1:
+        self.item.check(self.var.get() == 1)
+        self.show_state()
+        self.master.master.checklist_changed(self.item)
+
+    def show_state(self):
+        '''Updates the labels from the checklist item'''
+        if self.item.done:
             self.status_var.set('DONE')
             self.status_label.config(background='green')
-            self.now = datetime.datetime.now()
+            self.now = self.item.date
             self.date_var.set('{}/{}/{}'.format(self.now.year, self.now.month, self.now.day))
-        if self.var.get() == 0:
+        else:
             self.status_var.set(' - ')
             self.status_label.config(background='white')
             self.now = None
             self.date_var.set('----/--/--')
 
 class Image_Frame(tk.Frame):
-    def __init__(self, master, imagefile):
+    '''Drawing thumbnail. import_command(path) is called with the file chosen with the Import button'''
+    def __init__(self, master, imagefile, import_command=None):
         tk.Frame.__init__(self, master)
+        self.import_command = import_command
         self.title = tk.Label(self, text='Drawing', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W, columnspan=3)
-        self.imagefile = imagefile
-        self.img = Image.open(imagefile)
-        maxsize = (150, 150)
-        self.img = self.img.resize(maxsize)
         self.create_buttons()
-        self.tk_img = ImageTk.PhotoImage(self.img)
-        self.img_label = tk.Label(self, image=self.tk_img)
+        self.ticket = None
+        self.loaded = False
+        self.img_label = tk.Label(self)
         self.img_label.grid(row=2, column=0, sticky=tk.W, columnspan=3)
-        self.filename_label = tk.Label(self, text=self.imagefile)
+        self.filename_label = tk.Label(self)
         self.filename_label.grid(row=3, column=0, sticky=tk.W, columnspan=3)
+        self.load_image(imagefile)
+
+    def load_image(self, imagefile):
+        '''Shows a placeholder, the drawing is decoded in a background thread'''
+        self.cancel()
+        self.imagefile = imagefile
+        self.loaded = False
+        self.tk_img = image_cache.cache.placeholder(THUMBNAIL_SIZE)
+        self.img_label.configure(image=self.tk_img)
+        self.filename_label.configure(text=self.imagefile)
+        display_file = drawing_store.store.display_path(drawing_store.store.resolve(imagefile), THUMBNAIL_SIZE)
+        try:
+            self.ticket = image_cache.loader.request(display_file, THUMBNAIL_SIZE, self.show_image)
+        except OSError:  #drawing missing on this machine, the placeholder stays
+            self.filename_label.configure(text='{} (not found)'.format(self.imagefile))
+
+    def show_image(self, photo):
+        self.ticket = None
+        self.loaded = True
+        self.tk_img = photo
+        self.img_label.configure(image=self.tk_img)
+
+    def cancel(self):
+        '''Stops waiting for the drawing being decoded'''
+        if self.ticket is not None:
+            image_cache.loader.cancel(self.ticket)
+            self.ticket = None
+
+    def resume(self):
+        '''Restarts the decode if it was cancelled before the drawing was shown'''
+        if not self.loaded and self.ticket is None:
+            self.load_image(self.imagefile)
+
+    def destroy(self):
+        self.cancel()
+        tk.Frame.destroy(self)
 
     def create_buttons(self):
         self.button_open = ttk.Button(self, text='Open', width=6, command=self.open_image)
-        self.button_import = ttk.Button(self, text='Import', width=6, command=self.import_image)
+        self.button_import = ttk.Button(self, text='Import', width=6, command=self.import_image,
+                                        state=tk.NORMAL if self.import_command is not None else tk.DISABLED)
         self.button_folder = ttk.Button(self, text='Folder', width=6, command=self.open_folder)
 
         self.button_open.grid(row=1, column=0, sticky=tk.W)
@@ -236,12 +747,12 @@ class Image_Frame(tk.Frame):
         self.button_folder.grid(row=1, column=2, sticky=tk.W)
 
     def open_image(self):
-        dirname = os.path.dirname(__file__)
-        filepath = os.path.join(dirname, self.imagefile)
-        os.startfile(filepath)
+        os.startfile(drawing_store.store.resolve(self.imagefile))
 
     def import_image(self):
-        pass
+        path = filedialog.askopenfilename(parent=self, title='Import Drawing')
+        if path and self.import_command is not None:
+            self.import_command(path)
 
     def open_folder(self):
         dirname = os.path.dirname(__file__)
@@ -251,43 +762,69 @@ class Buttons_Frame(tk.Frame):
     '''Save, load, print, etc... buttons'''
     def __init__(self, master):
         tk.Frame.__init__(self, master)
-        self.button1 = ttk.Button(self, text='Save', width=12)
-        #self.button2 = ttk.Button(self, text='Print', width=5)
+        self.button1 = ttk.Button(self, text='Save', width=12, command=self.save)
+        self.button2 = ttk.Button(self, text='Open', width=12, command=self.open_job)
+        self.button6 = ttk.Button(self, text='Costing', width=12, command=self.master.update_costs)
         self.button3 = ttk.Button(self, text='Print', width=12, command=self.print_summary)
         self.button4 = ttk.Button(self, text='Soumission', width=12, command=self.price_quotation)
         self.button5 = ttk.Button(self, text='Confirmation', width=12, command=self.order_confirmation)
+        self.button7 = ttk.Button(self, text='Routing Sheets', width=12, command=self.routing_sheets)
 
         self.button1.grid(row=0, column=0, sticky=tk.W)
-        #self.button2.grid(row=0, column=1, sticky=tk.W)
         self.button3.grid(row=0, column=1, sticky=tk.W)
         self.button4.grid(row=1, column=0, sticky=tk.W)
         self.button5.grid(row=1, column=1, sticky=tk.W)
+        self.button2.grid(row=2, column=0, sticky=tk.W)
+        self.button6.grid(row=2, column=1, sticky=tk.W)
+        self.button7.grid(row=3, column=0, sticky=tk.W)
+
+    def save(self):
+        '''Saves the job model to the database'''
+        try:
+            self.master.store.save_job(self.master.job)
+        except ValueError as error:
+            messagebox.showwarning('Save', str(error))
+            return
+        self.master.forget_open_jobs()
+        self.master.job_saved()
+
+    def open_job(self):
+        '''Loads the job matching the job number entered in the job summary'''
+        number = self.master.job.number
+        job = self.master.store.load_job(number)
+        if job is None:
+            messagebox.showwarning('Open', 'Job {} not found'.format(number))
+        else:
+            self.master.load_job(job)
 
     def print_summary(self):
-        '''prints the data contained in the job_summary_frame'''
-        widget_list = self.master.job_summary_frame.entry_bars
-        for widget in widget_list:
-            widget_name = widget.entry_label['text']
-            widget_entry = widget.entry.get()
-            print(widget_name + ' ' + widget_entry)
+        '''prints the job summary, read from the job model'''
+        job = self.master.job
+        for label, attribute in erp_model.JOB_FIELDS:
+            print(label + ' ' + job.get_text(attribute))
 
     def price_quotation(self):
-        pdf_file = 'Quote.pdf'
-        order_confirmation = pdf_reports.Price_Quotation(pdf_file)
+        self.master.create_report('quotation')
 
     def order_confirmation(self):
-        pdf_file = 'Order Confirmation.pdf'
-        order_confirmation = pdf_reports.Order_Confirmation(pdf_file)
+        self.master.create_report('confirmation')
+
+    def routing_sheets(self):
+        '''Routing sheets of every part of the job, in one file'''
+        self.master.create_report('routing')
 
 
 class Parts_List_Frame(tk.Frame):
-    '''This will display the parts list'''
+    '''This will display the parts list, filtered by the search entry.
+    visible holds the part shown at each row of the listbox'''
     def __init__(self, master):
         tk.Frame.__init__(self, master, background=COLOR1)
         self.master = master
-        self.title = tk.Label(self, text='Parts List', font=TITLE_FONT)
-        self.button_frame = tk.Frame(self)
-        self.listbox_frame = tk.Frame(self)
+        self.search = part_search.Part_Search(master.job.parts)
+        self.visible = []
+        self.title = tk.Label(self, text='Parts List', font=TITLE_FONT, background=COLOR1)
+        self.button_frame = tk.Frame(self, background=COLOR1)
+        self.listbox_frame = tk.Frame(self, background=COLOR1)
 
         self.title.grid(row=0, column=0, sticky=tk.W)
         self.button_frame.grid(row=1, column=0, sticky=tk.W)
@@ -295,19 +832,43 @@ class Parts_List_Frame(tk.Frame):
 
         self.create_listbox()
         self.create_buttons()
+        self.refresh()
 
 
     def create_listbox(self):
+        self.search_var = tk.StringVar()
+        self.search_entry = tk.Entry(self.listbox_frame, textvariable=self.search_var)
+        self.search_count = tk.Label(self.listbox_frame, font=LABEL_FONT, anchor=tk.W, background=COLOR1)
         self.scrollbar = tk.Scrollbar(self.listbox_frame, orient=tk.VERTICAL)
-        self.listbox = tk.Listbox(self.listbox_frame, yscrollcommand=self.scrollbar.set) #, selectmode=EXTENTED)
+        self.listbox = tk.Listbox(self.listbox_frame, yscrollcommand=self.scrollbar.set, selectmode=tk.EXTENDED)
         self.listbox.config(height=7)
         self.scrollbar.config(command=self.listbox.yview)
 
 
-        self.listbox.grid(row=0, column=0, sticky=tk.NSEW)
-        self.scrollbar.grid(row=0, column=1, sticky=tk.NS)
+        self.search_entry.grid(row=0, column=0, sticky=tk.EW)
+        self.search_count.grid(row=1, column=0, sticky=tk.W)
+        self.listbox.grid(row=2, column=0, sticky=tk.NSEW)
+        self.scrollbar.grid(row=2, column=1, sticky=tk.NS)
 
         self.listbox.bind("<<ListboxSelect>>", self.open_part)
+        self.search_var.trace_add('write', lambda *args: self.refresh())
+
+    def refresh(self):
+        '''Shows the parts matching the search, with a single listbox insert'''
+        parts = self.master.job.parts
+        positions, complete = self.search.search(self.search_var.get())
+        self.visible = [parts[i] for i in positions]
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *[part.number for part in self.visible])
+        if self.search_var.get().strip():
+            self.search_count.configure(text='{}{} of {} parts'.format(len(positions), '' if complete else '+',
+                                                                      len(parts)))
+        else:
+            self.search_count.configure(text='{} parts'.format(len(parts)))
+
+    def bind_job(self, job):
+        self.search.bind_parts(job.parts)
+        self.refresh()
 
     def create_buttons(self):
         self.button_new = ttk.Button(self.button_frame, text='New Part', width='8', command=self.insert_part)
@@ -315,30 +876,67 @@ class Parts_List_Frame(tk.Frame):
         self.button_bulk = ttk.Button(self.button_frame, text='Bulk Entry', width='9', command=self.bulk_entry)
         self.part_number = tk.StringVar()
         self.part_number_entry = tk.Entry(self.button_frame, textvariable=self.part_number)
+        self.template_var = tk.StringVar()
+        self.template_box = create_template_box(self.button_frame, self.template_var)
+        self.button_template = ttk.Button(self.button_frame, text='Apply', width='6', command=self.apply_template)
 
 
         self.button_new.grid(row=0, column=0, sticky=tk.W)
         self.button_del.grid(row=0, column=1, sticky=tk.W)
         self.button_bulk.grid(row=0, column=2, sticky=tk.W)
         self.part_number_entry.grid(row=1, column=0, sticky=tk.W, columnspan=3)
+        self.template_box.grid(row=2, column=0, sticky=tk.W, columnspan=2)
+        self.button_template.grid(row=2, column=2, sticky=tk.W)
 
         self.part_number_entry.bind('<Return>', self.insert_part)
 
     def insert_part(self, event=None):
-        if len(self.part_number.get()) > 0:
-            self.listbox.insert(tk.END, self.part_number.get())
-        self.master.add_part(self.part_number.get())
+        self.add_parts([self.master.add_part(self.part_number.get())], added=True)
+
+    def add_parts(self, parts, added=False, template=None):
+        '''Bulk insert, one listbox call for all the part numbers'''
+        if not added and not self.master.add_parts(parts, template):
+            return
+        self.search.invalidate()
+        if self.search_var.get().strip():
+            self.refresh()
+        else:
+            self.visible.extend(parts)
+            self.listbox.insert(tk.END, *[part.number for part in parts])
+            self.search_count.configure(text='{} parts'.format(len(self.master.job.parts)))
 
     def delete_part(self):
         item = self.listbox.curselection()
-        self.listbox.delete(item)
+        if not item:
+            return
+        part = self.visible.pop(item[0])
+        self.listbox.delete(item[0])
         self.listbox.select_set(0)
-        self.master.parts_list[item[0]].destroy()
-        del(self.master.parts_list[item[0]])
+        self.master.delete_part(part)
+        self.search.invalidate()
+
+    def rename_part(self, part):
+        '''Replaces the listbox entry of an edited part number, keeping the selection'''
+        try:
+            i = self.visible.index(part)
+        except ValueError:
+            return
+        selected = self.listbox.selection_includes(i)
+        self.listbox.delete(i)
+        self.listbox.insert(i, part.number)
+        if selected:
+            self.listbox.selection_set(i)
+
+    def apply_template(self):
+        '''Applies the process template to the selected parts, or to every part shown if none is selected'''
+        selection = self.listbox.curselection()
+        parts = [self.visible[i] for i in selection] if selection else list(self.visible)
+        self.master.apply_template(self.template_var.get(), parts)
 
     def open_part(self, event=None):
         item = self.listbox.curselection()
-        self.master.open_part(item)
+        if item:
+            self.master.open_part(self.visible[item[0]])
 
     def bindings(self):
         '''Create all keyboard and mouse bindings here'''
@@ -348,32 +946,80 @@ class Parts_List_Frame(tk.Frame):
         Parts_List_Bulk_Entry(self)
 
 class Material_List_Frame(tk.Frame):
-    def __init__(self, master):
+    '''Material lines of the job and its What's Missing list, from the material planning (mrp)'''
+    def __init__(self, master, job):
         tk.Frame.__init__(self, master)
         self.title = tk.Label(self, text='Material', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W)
         self.row = 1
+        self.job = job
+        self.missing_rows = []  #(part, material, missing) labels, reused for every plan
+        self.rows = []  #Material_Row widgets, rebound to the lines matching the filter
 
         self.create_buttons()
         self.create_labels()
-        self.row1 = Material_Row(self, 'Steel 1010', 'part-01', 0)
-        self.row2 = Material_Row(self, 'Washer 3/4', 'part-08', 1)
-        self.row3 = Material_Row(self, 'Custom Screw', 'part-12', 2)
-        self.row1.grid(row=self.row, column=0, sticky=tk.W, columnspan=3)
-        self.row2.grid(row=self.row+1, column=0, sticky=tk.W, columnspan=3)
-        self.row3.grid(row=self.row+2, column=0, sticky=tk.W, columnspan=3)
+        self.first_row = self.row
+        self.more_label = ttk.Label(self, font=LABEL_FONT)
+        self.more_label.grid(row=self.first_row + MAX_MATERIAL_ROWS, column=0, sticky=tk.W, columnspan=3)
+        self.refresh()
+
+    def refresh(self):
+        '''Shows the material lines of the job matching the filter, from the material index.
+        Only the first MAX_MATERIAL_ROWS lines have widgets'''
+        status = self.filter_var.get()
+        statuses = erp_model.MISSING_STATUSES if status == NOT_RECEIVED else None if status == 'All' else status
+        lines = self.master.material_index.find(statuses, job=self.job)
+        for i, line in enumerate(lines[:MAX_MATERIAL_ROWS]):
+            if i == len(self.rows):
+                self.rows.append(Material_Row(self, line))
+            else:
+                self.rows[i].bind_line(line)
+            self.rows[i].grid(row=self.first_row + i, column=0, sticky=tk.W, columnspan=3)
+        for material_row in self.rows[len(lines):]:
+            material_row.grid_remove()
+        hidden = len(lines) - MAX_MATERIAL_ROWS
+        self.more_label.configure(text='{} more in the list'.format(hidden) if hidden > 0 else '')
+
+    def bind_job(self, job):
+        self.job = job
+        self.refresh()
 
     def create_buttons(self):
-        self.material_list_button = ttk.Button(self, text='Open List')
+        self.material_list_button = ttk.Button(self, text='Open List', command=self.open_list)
 
         self.material_list_button.grid(row=self.row, column=0, sticky=tk.W)
         self.row +=1
 
+    def open_list(self):
+        main = self.master
+        if main.material_window is None or not main.material_window.winfo_exists():
+            main.material_window = Material_List_Window(main)
+            main.plan_materials()
+        main.material_window.lift()
+
     def create_labels(self):
         self.label_missing_material = ttk.Label(self, text="What's Missing?", font=LABEL_FONT_BOLD)
         self.label_missing_material.grid(row=self.row, column=0, sticky=tk.W)
         self.row +=1
 
+        self.missing_frame = tk.Frame(self)
+        self.missing_frame.grid(row=self.row, column=0, sticky=tk.W, columnspan=3)
+        for column, text in enumerate(['Part', 'Material', 'Missing']):
+            ttk.Label(self.missing_frame, text=text, font=LABEL_FONT, width=10, anchor=tk.W).grid(
+                row=0, column=column, sticky=tk.W)
+        self.missing_summary = ttk.Label(self.missing_frame, text='Nothing missing', font=LABEL_FONT)
+        self.missing_summary.grid(row=MAX_MISSING_ROWS + 1, column=0, sticky=tk.W, columnspan=3)
+        self.row +=1
+
+        self.label_lines = ttk.Label(self, text='Material Lines', font=LABEL_FONT_BOLD)
+        self.filter_var = tk.StringVar(value=NOT_RECEIVED)
+        self.filter_box = ttk.Combobox(self, textvariable=self.filter_var, font=LABEL_FONT, width=12, state='readonly',
+                                       values=[NOT_RECEIVED, 'All'] + erp_model.MATERIAL_STATUSES)
+        self.filter_box.bind('<<ComboboxSelected>>', lambda event: self.refresh())
+        self.label_lines.grid(row=self.row, column=0, sticky=tk.W)
+        self.filter_box.grid(row=self.row, column=1, sticky=tk.W, columnspan=2)
+        self.row +=1
+
         self.label_part = ttk.Label(self, text='Part', font=LABEL_FONT, width=8, anchor=tk.W)
         self.label_material = ttk.Label(self, text='Material', font=LABEL_FONT, width=12, anchor=tk.W)
         self.label_status = ttk.Label(self, text='Status', font=LABEL_FONT, width=8, anchor=tk.W)
@@ -383,25 +1029,218 @@ class Material_List_Frame(tk.Frame):
         self.label_status.grid(row=self.row, column=2, sticky=tk.W)
         self.row +=1
 
+    def show_requirements(self, requirements):
+        '''Shows the largest shortages of the job, requirements is a mrp.Requirements or None'''
+        shortages = requirements.job_shortages(self.job.number) if requirements is not None else []
+        largest = heapq.nlargest(MAX_MISSING_ROWS, shortages, key=lambda shortage: shortage[3])
+        for i, (part, material, quantity, short) in enumerate(largest):
+            if i == len(self.missing_rows):
+                self.missing_rows.append([ttk.Label(self.missing_frame, font=LABEL_FONT, width=10, anchor=tk.W)
+                                          for column in range(3)])
+            for column, (label, text) in enumerate(zip(self.missing_rows[i], (part, material, '{:g}'.format(short)))):
+                label.configure(text=text)
+                label.grid(row=i + 1, column=column, sticky=tk.W)
+        for labels in self.missing_rows[len(largest):]:
+            for label in labels:
+                label.grid_remove()
+        if not shortages:
+            self.missing_summary.configure(text='Nothing missing')
+        elif len(shortages) > len(largest):
+            self.missing_summary.configure(text='{} more'.format(len(shortages) - len(largest)))
+        else:
+            self.missing_summary.configure(text='')
+
 class Material_Row(tk.Frame):
-    def __init__(self, master, material, part, status=0):
+    '''View of an erp_model.Material_Line, checked when the material is received'''
+    def __init__(self, master, line):
         tk.Frame.__init__(self, master)
         self.check_var = tk.IntVar()
-        self.material_check = ttk.Checkbutton(self, text=material, variable=self.check_var, command=self.on_select, width=12)
-        self.part_label = ttk.Label(self, text=part, font=LABEL_FONT, width=8, anchor=tk.W)
-        self.status_combobox = ttk.Combobox(self, text=material, font=LABEL_FONT, width=8, state='readonly')
-        self.status_combobox['values'] = ['Not Ordered', 'RFQ', 'Ordered', 'Received']
-        self.status_combobox.current(status)
+        self.material_check = ttk.Checkbutton(self, variable=self.check_var, command=self.on_select, width=12)
+        self.part_label = ttk.Label(self, font=LABEL_FONT, width=8, anchor=tk.W)
+        self.status_combobox = ttk.Combobox(self, font=LABEL_FONT, width=8, state='readonly')
+        self.status_combobox['values'] = erp_model.MATERIAL_STATUSES
         self.status_combobox.unbind_class("TCombobox", "<MouseWheel>")
+        self.status_combobox.bind('<<ComboboxSelected>>', self.on_status)
 
 
         self.material_check.grid(row=0, column=0, sticky=tk.W)
         self.part_label.grid(row=0, column=1, sticky=tk.W)
         self.status_combobox.grid(row=0, column=2, sticky=tk.W)
+        self.bind_line(line)
+
+    def bind_line(self, line):
+        self.line = line
+        self.material_check.configure(text=line.material)
+        self.part_label.configure(text=line.part)
+        self.status_combobox.current(erp_model.MATERIAL_STATUSES.index(line.status))
+        self.check_var.set(1 if line.status == 'Received' else 0)
+
+    def on_status(self, event=None):
+        self.master.master.set_material_status(self.line, self.status_combobox.get())
 
     def on_select(self):
-        if self.check_var.get() == 1:
-            self.destroy()
+        '''Checked: the material is received, unchecked: back to ordered'''
+        self.master.master.set_material_status(self.line, 'Received' if self.check_var.get() == 1 else 'Ordered')
+
+class Material_List_Window(tk.Toplevel):
+    '''Bulk raw material list: requirements of every open job by material, the stock,
+    and the material lines of every open job filtered through the material index'''
+    COLUMNS = ('Material', 'Required', 'On Hand', 'On Order', 'Missing')
+    LINE_COLUMNS = ('Job', 'Part', 'Material', 'Quantity', 'Status')
+
+    def __init__(self, master):
+        tk.Toplevel.__init__(self, master)
+        self.title('Material List')
+        self.title_label = tk.Label(self, text='Material Requirements', font=TITLE_FONT)
+        self.tree_frame = tk.Frame(self)
+        self.stock_frame = tk.Frame(self)
+        self.filter_frame = tk.Frame(self)
+        self.lines_frame = tk.Frame(self)
+        self.line_frame = tk.Frame(self)
+
+        self.title_label.grid(row=0, column=0, sticky=tk.W)
+        self.tree_frame.grid(row=1, column=0, sticky=tk.NSEW)
+        self.stock_frame.grid(row=2, column=0, sticky=tk.W)
+        self.filter_frame.grid(row=3, column=0, sticky=tk.W)
+        self.lines_frame.grid(row=4, column=0, sticky=tk.NSEW)
+        self.line_frame.grid(row=5, column=0, sticky=tk.W)
+
+        self.create_tree()
+        self.create_stock_entries()
+        self.create_filters()
+        self.create_lines_tree()
+        self.create_line_entries()
+        if master.requirements is not None:
+            self.show_requirements(master.requirements)
+        self.show_lines()
+
+    def create_tree(self):
+        self.tree = ttk.Treeview(self.tree_frame, columns=self.COLUMNS, show='headings', height=15)
+        self.scrollbar = tk.Scrollbar(self.tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=160 if column == 'Material' else 90, anchor=tk.W)
+        self.tree.grid(row=0, column=0, sticky=tk.NSEW)
+        self.scrollbar.grid(row=0, column=1, sticky=tk.NS)
+        self.tree.bind('<<TreeviewSelect>>', self.on_select)
+
+    def create_stock_entries(self):
+        self.material_var = tk.StringVar()
+        self.on_hand_var = tk.StringVar()
+        self.on_order_var = tk.StringVar()
+        self.material_label = tk.Label(self.stock_frame, textvariable=self.material_var, font=LABEL_FONT_BOLD, width=16,
+                                       anchor=tk.W)
+        self.on_hand_label = tk.Label(self.stock_frame, text='On Hand')
+        self.on_hand = tk.Entry(self.stock_frame, textvariable=self.on_hand_var, width=10)
+        self.on_order_label = tk.Label(self.stock_frame, text='On Order')
+        self.on_order = tk.Entry(self.stock_frame, textvariable=self.on_order_var, width=10)
+        self.stock_button = ttk.Button(self.stock_frame, text='Update Stock', command=self.update_stock)
+        grid_all_widgets(self.stock_frame)
+
+    def create_filters(self):
+        self.status_filter_var = tk.StringVar(value=NOT_RECEIVED)
+        self.job_filter_var = tk.StringVar(value='All')
+        self.status_filter_label = tk.Label(self.filter_frame, text='Status')
+        self.status_filter = ttk.Combobox(self.filter_frame, textvariable=self.status_filter_var, width=12,
+                                          state='readonly', values=[NOT_RECEIVED, 'All'] + erp_model.MATERIAL_STATUSES)
+        self.job_filter_label = tk.Label(self.filter_frame, text='Job')
+        self.job_filter = ttk.Combobox(self.filter_frame, textvariable=self.job_filter_var, width=12, state='readonly',
+                                       postcommand=self.list_jobs)
+        self.material_filter_var = tk.IntVar()
+        self.material_filter = ttk.Checkbutton(self.filter_frame, text='Selected material only',
+                                               variable=self.material_filter_var, command=self.show_lines)
+        self.lines_count = tk.Label(self.filter_frame, font=LABEL_FONT, anchor=tk.W, width=30)
+        grid_all_widgets(self.filter_frame)
+        self.status_filter.bind('<<ComboboxSelected>>', lambda event: self.show_lines())
+        self.job_filter.bind('<<ComboboxSelected>>', lambda event: self.show_lines())
+
+    def create_lines_tree(self):
+        self.lines_tree = ttk.Treeview(self.lines_frame, columns=self.LINE_COLUMNS, show='headings', height=12)
+        self.lines_scrollbar = tk.Scrollbar(self.lines_frame, orient=tk.VERTICAL, command=self.lines_tree.yview)
+        self.lines_tree.configure(yscrollcommand=self.lines_scrollbar.set)
+        for column in self.LINE_COLUMNS:
+            self.lines_tree.heading(column, text=column)
+            self.lines_tree.column(column, width=160 if column == 'Material' else 90, anchor=tk.W)
+        self.lines_tree.grid(row=0, column=0, sticky=tk.NSEW)
+        self.lines_scrollbar.grid(row=0, column=1, sticky=tk.NS)
+
+    def jobs(self):
+        '''{job number: job} of the jobs in the material index'''
+        return {job.number: job for job in [self.master.job] + self.master.indexed_jobs}
+
+    def list_jobs(self):
+        self.job_filter['values'] = ['All'] + sorted(self.jobs())
+
+    def show_lines(self):
+        '''Material lines matching the filters, only the first MAX_LIST_LINES are inserted'''
+        index = self.master.material_index
+        status = self.status_filter_var.get()
+        statuses = erp_model.MISSING_STATUSES if status == NOT_RECEIVED else None if status == 'All' else status
+        job = self.jobs().get(self.job_filter_var.get()) if self.job_filter_var.get() != 'All' else None
+        material = self.material_var.get() if self.material_filter_var.get() and self.material_var.get() else None
+        if self.job_filter_var.get() != 'All' and job is None:
+            lines = []
+        else:
+            lines = index.find(statuses, material, job)
+        self.lines_tree.delete(*self.lines_tree.get_children())
+        for line in lines[:MAX_LIST_LINES]:
+            self.lines_tree.insert('', tk.END, values=(index.job_of(line).number, line.part, line.material,
+                                                       '{:g}'.format(line.quantity), line.status))
+        if len(lines) > MAX_LIST_LINES:
+            self.lines_count.configure(text='First {} of {} lines'.format(MAX_LIST_LINES, len(lines)))
+        else:
+            self.lines_count.configure(text='{} lines'.format(len(lines)))
+
+    def create_line_entries(self):
+        self.line_material_var = tk.StringVar()
+        self.line_part_var = tk.StringVar()
+        self.line_quantity_var = tk.StringVar(value='1')
+        self.line_material_label = tk.Label(self.line_frame, text='Material')
+        self.line_material = ttk.Combobox(self.line_frame, textvariable=self.line_material_var, width=16,
+                                          values=sorted(costing.MATERIAL_COSTS))
+        self.line_part_label = tk.Label(self.line_frame, text='Part')
+        self.line_part = tk.Entry(self.line_frame, textvariable=self.line_part_var, width=10)
+        self.line_quantity_label = tk.Label(self.line_frame, text='Quantity')
+        self.line_quantity = tk.Entry(self.line_frame, textvariable=self.line_quantity_var, width=6)
+        self.line_button = ttk.Button(self.line_frame, text='Add Line', command=self.add_line)
+        grid_all_widgets(self.line_frame)
+
+    def show_requirements(self, requirements):
+        '''Reloads the table, one bulk delete and one insert per material'''
+        selected = self.material_var.get()
+        self.tree.delete(*self.tree.get_children())
+        for material, required, on_hand, on_order, missing in requirements.summary():
+            self.tree.insert('', tk.END, iid=material, values=(material, '{:g}'.format(required), '{:g}'.format(on_hand),
+                                                               '{:g}'.format(on_order), '{:g}'.format(missing)))
+        if self.tree.exists(selected):
+            self.tree.selection_set(selected)
+        self.line_material['values'] = sorted(set(costing.MATERIAL_COSTS) | set(requirements.materials))
+
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            material, required, on_hand, on_order, missing = self.tree.item(selection[0], 'values')
+            self.material_var.set(material)
+            self.on_hand_var.set(on_hand)
+            self.on_order_var.set(on_order)
+            if self.material_filter_var.get():
+                self.show_lines()
+
+    def update_stock(self):
+        if self.material_var.get():
+            self.master.update_stock(self.material_var.get(), erp_model.to_number(self.on_hand_var.get()),
+                                     erp_model.to_number(self.on_order_var.get()))
+
+    def add_line(self):
+        '''Adds a material line to the job'''
+        material = self.line_material_var.get().strip()
+        quantity = erp_model.to_number(self.line_quantity_var.get(), 0.0)
+        if not material or quantity <= 0:
+            messagebox.showwarning('Material', 'A material line needs a material and a quantity', parent=self)
+            return
+        self.master.add_material_line(erp_model.Material_Line(material, self.line_part_var.get().strip(),
+                                                              quantity=quantity))
 
 class Parts_Frame(tk.Frame):
     def __init__(self, master):
@@ -412,29 +1251,129 @@ class Parts_Frame(tk.Frame):
         self.title = tk.Label(self, text='Part Process Sheet', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.NW)
 
+class Router_Pool():
+    '''Bounded LRU pool of Part_Router widgets, keyed by part.
+    Routers are only built when a part is opened. When the pool is full, the least
+    recently used router is rebound to the opened part instead of building a new one'''
+    def __init__(self, master, size=ROUTER_POOL_SIZE, on_change=None):
+        self.master = master
+        self.size = size
+        self.on_change = on_change
+        self.routers = collections.OrderedDict()  #id(part): Part_Router
+        self.shown = None
+
+    def get(self, part):
+        key = id(part)
+        if key in self.routers:
+            self.routers.move_to_end(key)
+            return self.routers[key]
+        if len(self.routers) >= self.size:
+            old_key, router = self.routers.popitem(last=False)
+            router.bind_part(part)
+        else:
+            router = Part_Router(self.master, part, self.on_change)
+        self.routers[key] = router
+        return router
+
+    def show(self, part):
+        '''Grids the router of the part in place of the one currently shown'''
+        router = self.get(part)
+        if self.shown is not None and self.shown is not router:
+            self.shown.image.cancel()
+            self.shown.grid_remove()
+        router.image.resume()
+        router.grid(row=1, column=0, sticky=tk.N)
+        self.shown = router
+        return router
+
+    def rebind(self, parts):
+        '''Reloads the routers of these parts, after their model was replaced'''
+        keys = {id(part) for part in parts}
+        for key, router in self.routers.items():
+            if key in keys:
+                router.bind_part(router.part)
+
+    def discard(self, part):
+        router = self.routers.pop(id(part), None)
+        if router is not None:
+            if router is self.shown:
+                self.shown = None
+            router.destroy()
+
+    def clear(self):
+        for router in self.routers.values():
+            router.destroy()
+        self.routers.clear()
+        self.shown = None
+
 class Part_Router(tk.Frame):
-    '''Part router containing the manufacturing steps, delays, material, processes,etc...'''
-    def __init__(self, master, part_title):
+    '''Part router containing the manufacturing steps, delays, material, processes,etc...
+    View of an erp_model.Part. on_change(part) is called after every edit of the part or its routing'''
+    def __init__(self, master, part, on_change=None):
         tk.Frame.__init__(self, master)
-        self.title = tk.Label(self, text=part_title, font=TITLE_FONT)
+        self.part = part
+        self.on_change = on_change
+        self.title = tk.Label(self, text=part.number, font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W)
         self.row = 1
         self.task_objects = []
 
-        self.image = Image_Frame(self, 'img/part-REV-B-2018-03-18.jpg')
+        self.image = Image_Frame(self, drawing_store.store.part_drawing(part), self.import_drawing)
         self.image.grid(row=self.row, column=1)
         self.create_part_attributes()
         self.create_buttons()
-        self.new_task()
+        for task in part.tasks:
+            self.show_task(task)
+
+    def bind_part(self, part):
+        '''Rebinds the router to another part, reusing the existing task widgets'''
+        self.part = part
+        self.title.configure(text=part.number)
+        self.image.load_image(drawing_store.store.part_drawing(part))
+        for entry_bar in self.entry_bars:
+            entry_bar.bind_model(part)
+        for task_object, task in zip(self.task_objects, part.tasks):
+            task_object.bind_task(task)
+        while len(self.task_objects) > len(part.tasks):
+            self.task_objects.pop().destroy()
+            self.row -= 1
+        for task in part.tasks[len(self.task_objects):]:
+            self.show_task(task)
+
+    def refresh_attributes(self, attributes):
+        '''Reloads the entry bars of these attributes, after they were calculated'''
+        for entry_bar in self.entry_bars:
+            if entry_bar.attribute in attributes:
+                entry_bar.bind_model(self.part)
+
+    def part_changed(self):
+        if self.title.cget('text') != self.part.number:
+            self.title.configure(text=self.part.number)
+            self.master.master.part_renamed(self.part)
+        if self.on_change is not None:
+            self.on_change(self.part)
+
+    def routing_sheet(self):
+        self.master.master.create_report('routing', self.part)
+
+    def import_drawing(self, path):
+        '''Attaches the drawing to the part once it is stored'''
+        part = self.part
+        self.master.master.import_drawing(path, part.number, lambda blob: self.drawing_imported(part, blob))
+
+    def drawing_imported(self, part, blob):
+        part.drawing = blob
+        if part is self.part and self.winfo_exists():
+            self.image.load_image(blob)
 
     def create_part_attributes(self):
         self.attributes_frame = tk.Frame(self)
         self.attributes_frame.grid(row=self.row, column=0, sticky=tk.W)
         self.entry_bars = []
-        self.item_names = ['Part Number', 'Description', 'Quantity', 'Material',
-                           'Cost', 'Status', 'Hours', 'Dimension', ]
-        for item in self.item_names:
-            self.entry_bars.append(Entry_Bar(self.attributes_frame, item))
+        self.item_names = [label for label, attribute in erp_model.PART_FIELDS]
+        for label, attribute in erp_model.PART_FIELDS:
+            self.entry_bars.append(Entry_Bar(self.attributes_frame, label, self.part, attribute,
+                                             self.part_changed))
 
         for i, entry_bar in enumerate(self.entry_bars[0:4]):
             entry_bar.grid(row=i, column=0, sticky=tk.W)
@@ -448,7 +1387,13 @@ class Part_Router(tk.Frame):
         self.button_new = ttk.Button(self.buttons_frame, text='New Task', command=self.new_task)
         self.button_del = ttk.Button(self.buttons_frame, text='Delete', command=self.delete_task)
         self.button_toggle_text = ttk.Button(self.buttons_frame, text='Hide Text', command=self.toggle_text)
-        self.button_template1 = ttk.Button(self.buttons_frame, text='Template 1', command=self.process_template)
+        self.template_var = tk.StringVar()
+        self.template_box = create_template_box(self.buttons_frame, self.template_var)
+        self.button_template = ttk.Button(self.buttons_frame, text='Apply', command=self.apply_template)
+        self.button_save_template = ttk.Button(self.buttons_frame, text='Save Template', command=self.save_template)
+        self.button_delete_template = ttk.Button(self.buttons_frame, text='Delete Template',
+                                                 command=self.delete_template)
+        self.button_sheet = ttk.Button(self.buttons_frame, text='Routing Sheet', command=self.routing_sheet)
 
         self.buttons_frame.grid(row=self.row, column=0, sticky=tk.W)
         for i, button in enumerate(self.buttons_frame.winfo_children()):
@@ -456,14 +1401,22 @@ class Part_Router(tk.Frame):
         self.row +=1
 
     def new_task(self):
-        self.task = Part_Task(self)
+        self.show_task(self.part.add_task())
+        self.part_changed()
+
+    def show_task(self, task):
+        '''Creates the Part_Task view of a routing task'''
+        self.task = Part_Task(self, task)
         self.task.grid(row=self.row, column=0, sticky=tk.W, padx=5, pady=5, columnspan=2)
         self.task_objects.append(self.task)
         self.row += 1
 
     def delete_task(self):
-        self.grid_slaves()[0].destroy()
-        self.task_objects.pop()
+        if self.task_objects:
+            self.task_objects.pop().destroy()
+            self.part.tasks.pop()
+            self.row -= 1
+            self.part_changed()
 
     def toggle_text(self):
         '''toggles the text box from the all instances of Part_Task.text'''
@@ -477,38 +1430,60 @@ class Part_Router(tk.Frame):
             for task in self.task_objects:
                 task.show_text_box()
 
-    def process_template(self):
-        while len(self.task_objects) > 0:
-            self.delete_task()
-        self.load_task(0, 0, 0.5)
-        self.load_task(0, 1, 3)
-        self.load_task(1, 0, 5)
-        self.load_task(3, 0, 1)
-        self.load_task(4, 0, 1)
-
-
-    def load_task(self, box1_index, box2_index, time):
-        self.new_task()
-        self.task.box1.current(box1_index)
-        self.task.box_update()
-        self.task.box2.current(box2_index)
-        self.task.hours_spinbox.delete(0, "end")
-        self.task.hours_spinbox.insert(0, time)
+    def apply_template(self):
+        '''Replaces the routing with the selected process template'''
+        self.master.master.apply_template(self.template_var.get(), [self.part])
+
+    def save_template(self):
+        '''Saves the routing of the part as a process template, named in a dialog'''
+        name = simpledialog.askstring('Save Template', 'Template name', parent=self,
+                                      initialvalue=self.part.number)
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        if name in process_templates.library and not messagebox.askyesno(
+                'Save Template', 'Replace the template {}?'.format(name), parent=self):
+            return
+        try:
+            self.master.master.save_template(name, self.part)
+        except ValueError as error:
+            messagebox.showwarning('Save Template', str(error), parent=self)
+            return
+        self.template_var.set(name)
+
+    def delete_template(self):
+        name = self.template_var.get()
+        if name in process_templates.library and messagebox.askyesno(
+                'Delete Template', 'Delete the template {}?'.format(name), parent=self):
+            self.master.master.delete_template(name)
+            names = process_templates.library.names()
+            self.template_var.set(names[0] if names else '')
 
 class Part_Task(tk.Frame):
-    '''Creates a part task which contains the department, task name, and time'''
-    def __init__(self, master):
+    '''Creates a part task which contains the department, task name, and time.
+    View of an erp_model.Routing_Task'''
+    def __init__(self, master, task=None):
         tk.Frame.__init__(self, master, class_='Part_Task')
         self.config(highlightbackground="black", highlightcolor="black", highlightthickness=1)
         #self.config(borderwidth=10, relief="flat", background='grey')
-        self.tasks = {'Methods':['Planning', 'Programming'],
-                      'Machining': ['Lathe', '5-axis mill', '3-axis mill'],
-                      'Sub-contracting': ['JobShop', 'MechantMachinage', 'MachinMachine', 'ToolShop'],
-                      'Surface Treatment': ['Black Oxyde', 'Hard Anodize'],
-                      'Inspection': ['Manual Inspection', 'CMM Inspection']}
+        self.tasks = erp_model.TASKS
+        self.routing_task = None
         self.create_task()
         self.create_spinbox()
         self.create_textbox()
+        self.bind_task(task if task is not None else erp_model.Routing_Task())
+
+    def bind_task(self, task):
+        '''Displays a routing task, the model is detached while the widgets are loaded'''
+        self.routing_task = None
+        self.box1_var.set(task.department)
+        self.box2['values'] = self.tasks[task.department]
+        self.box2_var.set(task.operation)
+        self.hours_var.set('{:.2f}'.format(task.hours))
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', task.notes)
+        self.text.edit_modified(False)
+        self.routing_task = task
 
     def create_combobox(self, combobox_values):
         self.combobox_var = tk.StringVar()
@@ -522,18 +1497,39 @@ class Part_Task(tk.Frame):
         self.box1, self.box1_var = self.create_combobox(list(self.tasks))
         self.box2, self.box2_var = self.create_combobox(self.tasks[self.box1_var.get()])
         self.box1.bind("<<ComboboxSelected>>", self.box_update)
+        self.box2.bind("<<ComboboxSelected>>", self.on_operation)
         self.box1.grid(row=0, column=0, sticky=tk.W)
         self.box2.grid(row=0, column=1, sticky=tk.W)
 
     def box_update(self, event=None):
         self.box2['values'] = self.tasks[self.box1_var.get()]
         self.box2.current(0)
+        self.on_operation()
+
+    def on_operation(self, event=None):
+        if self.routing_task is not None:
+            self.routing_task.department = self.box1_var.get()
+            self.routing_task.operation = self.box2_var.get()
+            self.master.part_changed()
+
+    def on_hours(self, *args):
+        if self.routing_task is not None:
+            self.routing_task.set_text('hours', self.hours_var.get())
+            self.master.part_changed()
+
+    def on_text(self, event=None):
+        if self.routing_task is not None:
+            self.routing_task.notes = self.text.get('1.0', 'end-1c')
+        self.text.edit_modified(False)
 
     def create_spinbox(self):
         '''Enter task hours here'''
         self.hours = tk.Label(self, text='heures')
-        self.hours_spinbox = tk.Spinbox(self, from_=0, to=100000, increment=.25, format='%.2f')
+        self.hours_var = tk.StringVar()
+        self.hours_spinbox = tk.Spinbox(self, from_=0, to=100000, increment=.25, format='%.2f',
+                                        textvariable=self.hours_var)
         self.hours_spinbox.config(width=6)
+        self.hours_var.trace_add('write', self.on_hours)
         self.hours_spinbox.selection_clear()
         self.hours.grid(row=0, column=2, sticky=tk.W)
         self.hours_spinbox.grid(row=0, column=3, sticky=tk.W)
@@ -543,6 +1539,7 @@ class Part_Task(tk.Frame):
         self.text = ScrolledText(self, width=50, height=5)
         self.text.config(borderwidth=3, relief="sunken", background='lightgrey')
         self.text.grid(row=1, column=0, columnspan=4, sticky='nsew')
+        self.text.bind('<<Modified>>', self.on_text)
         self.toggle_button = ttk.Button(self, text='hide', command=self.toggle_text_box)
         self.toggle_button.grid(row=0, column=4, sticky=tk.W)
 
@@ -574,7 +1571,9 @@ class Parts_List_Bulk_Entry(tk.Toplevel):
         self.buttons_frame = tk.Frame(self)
         self.auto_entry_frame = tk.Frame(self)
         self.header_row = Bulk_Entry_Row(self)
-        self.entries_frame = Scrollable_Frame(self)
+        self.table = erp_model.Column_Table(self.header_row.titles)
+        self.entries_frame = Virtual_Grid(self, self.table, width=self.header_row.width)
+        self.import_task = None
 
         self.title_label.grid(row=0, column=0, sticky=tk.W)
         self.buttons_frame.grid(row=1, column=0, sticky=tk.W)
@@ -582,9 +1581,6 @@ class Parts_List_Bulk_Entry(tk.Toplevel):
         self.header_row.grid(row=3, column=0, sticky=tk.W)
         self.entries_frame.grid(row=4, column=0, sticky=tk.W)
 
-        self.row_objects = []
-        self.row = 0
-
         self.create_buttons()
         self.create_auto_entries()
         self.header_row.create_column_titles()
@@ -594,12 +1590,29 @@ class Parts_List_Bulk_Entry(tk.Toplevel):
         self.button_new_row = ttk.Button(self.buttons_frame, text="New Row", command=self.new_row)
         self.button_delete_row = ttk.Button(self.buttons_frame, text="Delete", command=self.delete_row)
         self.button_paste = ttk.Button(self.buttons_frame, text="Paste", command=self.paste_from_clipboard)
+        self.button_import = ttk.Button(self.buttons_frame, text="Import", command=self.import_file)
+        self.button_add_parts = ttk.Button(self.buttons_frame, text="Add Parts", command=self.add_parts)
+        self.template_var = tk.StringVar()
+        self.template_box = create_template_box(self.buttons_frame, self.template_var, [NO_TEMPLATE])
+        self.import_progress = ttk.Progressbar(self.buttons_frame, length=120, maximum=100)
+        self.import_label = tk.Label(self.buttons_frame, font=LABEL_FONT, anchor=tk.W, width=30)
 
 
         self.button.grid(row=0, column=0, sticky=tk.W)
         self.button_new_row.grid(row=0, column=1, sticky=tk.W)
         self.button_delete_row.grid(row=0, column=2, sticky=tk.W)
         self.button_paste.grid(row=0, column=3, sticky=tk.W)
+        self.button_import.grid(row=0, column=4, sticky=tk.W)
+        self.button_add_parts.grid(row=0, column=5, sticky=tk.W)
+        self.template_box.grid(row=0, column=6, sticky=tk.W)
+        self.import_progress.grid(row=1, column=0, sticky=tk.W, columnspan=2)
+        self.import_label.grid(row=1, column=2, sticky=tk.W, columnspan=5)
+
+    def add_parts(self):
+        '''Adds one part per row of the table to the job, with the routing of the selected template'''
+        parts = erp_model.parts_from_table(self.table)
+        template = self.template_var.get()
+        self.master.add_parts(parts, template=None if template == NO_TEMPLATE else template)
 
     def create_auto_entries(self):
         '''This will create the interface to enter the data to generate a bunch of parts'''
@@ -622,90 +1635,165 @@ class Parts_List_Bulk_Entry(tk.Toplevel):
 
 
     def new_row(self):
-        self.entry_row = Bulk_Entry_Row(self.entries_frame.frame)
-        self.entry_row.grid(row=self.row, column=0, sticky=tk.W)
-        self.entry_row.create_entries()
-        self.entries_frame.bind_mouse_wheel(self.entry_row) #Bind widgets to enable scrolling
-        self.row +=1
+        self.table.append([''] * len(self.table.columns))
+        self.entries_frame.see(len(self.table) - 1)
 
     def delete_row(self):
-        self.entries_frame.frame.winfo_children()[-1].destroy()
-        self.row -=1
+        if len(self.table) > 0:
+            self.table.delete(len(self.table) - 1)
+            self.entries_frame.refresh()
 
     def generate_parts(self):
         part_number = self.part_number_var.get()
         qty = int(self.quantity_var.get())
         drawing = self.drawing_number_var.get()
 
-        for i in range(qty):
-            self.new_row()
-            self.entry_row.entry1_var.set(part_number + '-'+str(i+1))
-            self.entry_row.entry5_var.set(drawing)
+        self.table.extend(qty, {'Part Number': [part_number + '-' + str(i+1) for i in range(qty)],
+                                'Drawing': drawing})
+        self.entries_frame.see(len(self.table) - 1)
 
     def paste_from_clipboard(self):
-        self.part_number_var.set('170888')
-        self.quantity_var.set('30')
-        self.drawing_number_var.set('878A234FFGT')
-
-        part_number = self.part_number_var.get()
-        qty = int(self.quantity_var.get())
-        drawing = self.drawing_number_var.get()
-
-        for i in range(qty):
-            self.new_row()
-            self.entry_row.entry1_var.set(part_number + '-'+str(i+1))
-            self.entry_row.entry2_var.set('Part ' + str(i+1))
-            self.entry_row.entry3_var.set('1')
-            self.entry_row.entry4_var.set('Acier 1020')
-            self.entry_row.entry5_var.set(drawing)
-
-class Scrollable_Frame(tk.Frame):
-    # https://stackoverflow.com/questions/3085696/adding-a-scrollbar-to-a-group-of-widgets-in-tkinter/3092341#3092341
-    def __init__(self, master):
-        tk.Frame.__init__(self, master)
-        self.canvas = tk.Canvas(self, borderwidth=0, background="#e6e6e6") #ffffff
-        self.canvas.configure(width=1000, height=500)
-        self.frame = tk.Frame(self.canvas, background="#e6e6e6")
-        self.vsb = tk.Scrollbar(self, orient="vertical", command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vsb.set)
-
-        self.vsb.grid(row=0, column=1, sticky=tk.NS)
-        self.canvas.grid(row=0, column=0, sticky=tk.W)
-        self.canvas.create_window(0, 0, window=self.frame, anchor="nw", tags="self.frame")
-
-        self.frame.bind("<Configure>", self.onFrameConfigure)
-
-        #up-down key scrolling
-        self.canvas.bind("<Up>",    lambda event: self.canvas.yview_scroll(-1, "units"))
-        self.canvas.bind("<Down>",  lambda event: self.canvas.yview_scroll( 1, "units"))
-        self.bind_mouse_wheel(self.canvas) #mousewheel scrolling
-
-        self.canvas.focus_set()
-
-
-    def onFrameConfigure(self, event):
-        '''Reset the scroll region to encompass the inner frame'''
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-
-    def mouse_wheel(self, event):
-        # respond to Linux or Windows wheel event
-        if event.num == 5 or event.delta == -120:
-            self.canvas.yview_scroll(1, "units")
-        if event.num == 4 or event.delta == 120:
-            self.canvas.yview_scroll(-1, "units")
-
-    def bind_mouse_wheel(self, widget):
-        '''Bind all widgets and their children inside the frame to allow scrolling'''
+        '''Imports the rows copied from a spreadsheet, see bom_import'''
         try:
-            widget.bind("<MouseWheel>", self.mouse_wheel) #Windows
-            widget.bind("<Button-4>", self.mouse_wheel) # Linux, OS
-            widget.bind("<Button-5>", self.mouse_wheel) # Linux, OS
-            if len(widget.winfo_children()) > 0:
-                for child in widget.winfo_children():
-                    self.bind_mouse_wheel(child)
-
-        except:
-            pass
+            text = self.clipboard_get()
+        except tk.TclError:
+            messagebox.showwarning('Paste', 'The clipboard is empty', parent=self)
+            return
+        self.start_import('Paste', bom_import.import_text, text)
+
+    def import_file(self):
+        path = filedialog.askopenfilename(parent=self, title='Import Parts List',
+                                          filetypes=[('Parts lists', '*.csv *.txt *.tsv *.xlsx *.xlsm'),
+                                                     ('All files', '*.*')])
+        if path:
+            self.start_import(os.path.basename(path), bom_import.import_file, path)
+
+    def start_import(self, title, function, source):
+        '''Parses the source in a background thread, the rows are added to the table when it is done'''
+        runner = self.master.master.runner
+        if self.import_task is not None and self.import_task.active:
+            self.import_task.cancel()
+        if self.show_import not in runner.views:
+            runner.views.append(self.show_import)
+        self.import_task = runner.submit('Import ' + title, function, source, pass_task=True,
+                                         on_done=self.import_done, on_error=self.import_error)
+
+    def show_import(self, task):
+        '''task_runner view, shows the progress of the import'''
+        if task is not self.import_task:
+            return
+        if task.progress is None and task.active:
+            self.import_progress.configure(mode='indeterminate')
+            self.import_progress.start()
+        else:
+            self.import_progress.stop()
+            self.import_progress.configure(mode='determinate', value=(task.progress or 0.0) * 100)
+        self.import_label.configure(text='{} - {} {}'.format(task.title, task.status, task.message)[:40])
+
+    def import_done(self, result):
+        if not self.winfo_exists():
+            return
+        self.table.extend(len(result.table), dict(zip(result.table.columns, result.table.data)))
+        self.entries_frame.see(len(self.table) - 1)
+        self.import_label.configure(text='{} parts imported'.format(len(result.table)))
+        if result.error_count:
+            messagebox.showwarning('Import', result.summary(), parent=self)
+
+    def import_error(self, error):
+        if self.winfo_exists():
+            messagebox.showerror('Import', 'The parts list could not be imported:\n{}'.format(error), parent=self)
+
+    def destroy(self):
+        runner = self.master.master.runner
+        if self.show_import in runner.views:
+            runner.views.remove(self.show_import)
+        if self.import_task is not None:
+            self.import_task.cancel()
+        tk.Toplevel.destroy(self)
+
+class Virtual_Grid(tk.Frame):
+    '''Editable table over an erp_model.Column_Table.
+    Only the visible rows have Entry widgets, scrolling rebinds them to other rows of the table,
+    so the number of widgets stays the same whatever the number of rows'''
+    def __init__(self, master, table, visible_rows=20, width=15):
+        tk.Frame.__init__(self, master, background="#e6e6e6")
+        self.table = table
+        self.visible_rows = visible_rows
+        self.top = 0  #Index of the first visible row in the table
+        self.loading = False
+        self.cells = []
+        self.cell_vars = []
+
+        for r in range(visible_rows):
+            for c in range(len(table.columns)):
+                var = tk.StringVar()
+                var.trace_add('write', lambda *args, r=r, c=c: self.on_edit(r, c))
+                entry = tk.Entry(self, textvariable=var, width=width, font=LABEL_FONT)
+                entry.grid(row=r, column=c, sticky=tk.W, padx=10)
+                entry.bind("<Up>", lambda event, r=r, c=c: self.move_focus(r, c, -1))
+                entry.bind("<Down>", lambda event, r=r, c=c: self.move_focus(r, c, 1))
+                self.cells.append(entry)
+                self.cell_vars.append(var)
+
+        self.vsb = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.vsb.grid(row=0, column=len(table.columns), rowspan=visible_rows, sticky=tk.NS)
+        self.refresh()
+
+    def refresh(self):
+        '''Loads the visible rows of the table into the entries'''
+        n_columns = len(self.table.columns)
+        n_rows = len(self.table)
+        self.top = max(0, min(self.top, n_rows - self.visible_rows))
+        self.loading = True
+        for r in range(self.visible_rows):
+            i = self.top + r
+            for c in range(n_columns):
+                entry = self.cells[r * n_columns + c]
+                if i < n_rows:
+                    self.cell_vars[r * n_columns + c].set(self.table.get(i, c))
+                    entry.configure(state=tk.NORMAL)
+                else:
+                    self.cell_vars[r * n_columns + c].set('')
+                    entry.configure(state=tk.DISABLED)
+        self.loading = False
+        if n_rows > 0:
+            self.vsb.set(self.top / n_rows, min(1.0, (self.top + self.visible_rows) / n_rows))
+        else:
+            self.vsb.set(0, 1)
+
+    def on_edit(self, r, c):
+        '''In place editing, the entry text is written to the table'''
+        i = self.top + r
+        if not self.loading and i < len(self.table):
+            self.table.set(i, c, self.cell_vars[r * len(self.table.columns) + c].get())
+
+    def see(self, i):
+        '''Scrolls so row i is visible'''
+        if i < self.top:
+            self.top = i
+        elif i >= self.top + self.visible_rows:
+            self.top = i - self.visible_rows + 1
+        self.refresh()
+
+    def yview(self, *args):
+        '''Scrollbar command'''
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.table))
+        elif args[0] == 'scroll':
+            step = self.visible_rows if args[2] == 'pages' else 1
+            self.top += int(args[1]) * step
+        self.refresh()
+
+    def wheel_scroll(self, units):
+        '''Called by the shared mouse_wheel binding'''
+        self.yview('scroll', 3 * units, 'units')
+
+    def move_focus(self, r, c, step):
+        '''Up and down keys move between rows and scroll at the edges'''
+        if 0 <= r + step < self.visible_rows:
+            self.cells[(r + step) * len(self.table.columns) + c].focus_set()
+        else:
+            self.yview('scroll', step, 'units')
 
 class Bulk_Entry_Row(tk.Frame):
     # https://stackoverflow.com/questions/3085696/adding-a-scrollbar-to-a-group-of-widgets-in-tkinter/3092341#3092341
@@ -714,20 +1802,6 @@ class Bulk_Entry_Row(tk.Frame):
         self.titles = ['Part Number', 'Description', 'Quantity', 'Material', 'Drawing']
         self.width= 15
 
-    def create_entries(self):
-        self.entry1_var = tk.StringVar()
-        self.entry2_var = tk.StringVar()
-        self.entry3_var = tk.StringVar()
-        self.entry4_var = tk.StringVar()
-        self.entry5_var = tk.StringVar()
-        self.entry1 = tk.Entry(self, textvariable=self.entry1_var, width=self.width, font=LABEL_FONT)
-        self.entry2 = tk.Entry(self, textvariable=self.entry2_var, width=self.width, font=LABEL_FONT)
-        self.entry3 = tk.Entry(self, textvariable=self.entry3_var, width=self.width, font=LABEL_FONT)
-        self.entry4 = tk.Entry(self, textvariable=self.entry4_var, width=self.width, font=LABEL_FONT)
-        self.entry5 = tk.Entry(self, textvariable=self.entry5_var, width=self.width, font=LABEL_FONT)
-        grid_all_widgets(self)
-        configure_widgets(self)
-
     def create_column_titles(self):
         '''Part Number, description, quantity, material, drawing'''
         self.size = 24
@@ -737,7 +1811,6 @@ class Bulk_Entry_Row(tk.Frame):
         self.label4 = tk.Label(self, text='Material', width=self.width, anchor=tk.W, font=('Droid', self.size))
         self.label5 = tk.Label(self, text='Drawing', width=self.width, anchor=tk.W, font=('Droid', self.size))
         grid_all_widgets(self)
-        configure_widgets(self)
 
 class Bar_Graph(tk.Frame):
     def __init__(self, master, ):
@@ -745,8 +1818,20 @@ class Bar_Graph(tk.Frame):
         self.title = tk.Label(self, text='Job Profitability', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W)
         self.row = 1
+        self.margins = {}  #id(part): (part number, profit %)
+        self.axis = None
         self.create_buttons()
-        self.create_chart()
+        self.chart_placeholder = tk.Label(self, text='Loading chart...', width=25, height=10)
+        self.chart_placeholder.grid(row=self.row, column=0, sticky=tk.NSEW, columnspan=2)
+        self.wait_for_chart()
+
+    def wait_for_chart(self):
+        '''The chart is created once matplotlib has been imported by the warm up thread'''
+        if all(lazy_imports.is_loaded(name) for name in CHART_MODULES):
+            self.chart_placeholder.destroy()
+            self.create_chart()
+        else:
+            self.after(POLL_INTERVAL, self.wait_for_chart)
 
     def create_buttons(self):
         self.button1 = ttk.Button(self, text='Details', width=10, command=self.details)
@@ -758,13 +1843,47 @@ class Bar_Graph(tk.Frame):
         self.row += 1
 
     def create_chart(self):
-        self.objects = ['Part-01', 'Part-02', 'Part-03', 'Part-04', 'Part-05', 'Part-06']
-        self.y_pos = np.arange(len(self.objects))
-        self.profit = [65,110,25,88,92,100]
+        Figure = lazy_imports.load('matplotlib.figure').Figure
+        FigureCanvasTkAgg = lazy_imports.load('matplotlib.backends.backend_tkagg').FigureCanvasTkAgg
 
         self.fig = Figure(figsize=(2,2), facecolor='white', dpi=100)
         self.axis = self.fig.add_subplot(111) #1 row, 1 column
 
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self)  # A tk.DrawingArea.
+        self.draw_chart()
+        self.canvas.get_tk_widget().grid(row=self.row, column=0, sticky=tk.NSEW, columnspan=2)
+        self.row +=1
+
+    def update_parts(self, changed, removed):
+        '''Updates the margin of the changed parts, view of job_totals.Job_Totals'''
+        for part in changed:
+            revenue = part.price * part.quantity
+            if revenue > 0:
+                self.margins[id(part)] = (part.number, round((revenue - part.cost) / revenue * 100))
+            else:
+                self.margins.pop(id(part), None)
+        for part in removed:
+            self.margins.pop(id(part), None)
+        if self.axis is not None:
+            self.draw_chart()
+
+    def clear(self):
+        self.margins.clear()
+        if self.axis is not None:
+            self.draw_chart()
+
+    def draw_chart(self):
+        '''Bars of the least profitable parts, demo data until some parts have a price'''
+        if self.margins:
+            lowest = heapq.nsmallest(MAX_CHART_PARTS, self.margins.values(), key=lambda item: item[1])
+            self.objects = [number for number, percent in lowest]
+            self.profit = [percent for number, percent in lowest]
+        else:
+            self.objects = ['Part-01', 'Part-02', 'Part-03', 'Part-04', 'Part-05', 'Part-06']
+            self.profit = [65,110,25,88,92,100]
+        self.y_pos = np.arange(len(self.objects))
+
+        self.axis.clear()
         self.axis.barh(self.y_pos, self.profit, .8, align='center', alpha=0.5, )
         self.axis.set_yticks(self.y_pos)
         self.axis.set_yticklabels(self.objects)
@@ -775,74 +1894,293 @@ class Bar_Graph(tk.Frame):
             self.axis.text(1,i,s=str(percent)+'%', horizontalalignment='left', verticalalignment='center',
                            color='blue',weight='bold', clip_on=True)
         self.fig.tight_layout()
-
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self)  # A tk.DrawingArea.
-        self.canvas.draw()
-        self.canvas.get_tk_widget().grid(row=self.row, column=0, sticky=tk.NSEW, columnspan=2)
-        self.row +=1
+        self.canvas.draw_idle()
 
     def details(self):
         pass
 
     def report(self):
-        pass
+        '''Cost, price and margin of every part, exported in the background'''
+        job = self.master.job
+        rows = []
+        for part in job.parts:
+            revenue = part.price * part.quantity
+            margin = round((revenue - part.cost) / revenue * 100, 1) if revenue > 0 else ''
+            rows.append((part.number, part.description, part.quantity, part.price, round(part.cost, 2), margin))
+        self.master.export_csv('Profitability', 'Profitability {}.csv'.format(job.number).replace(' .csv', '.csv'),
+                               ['Part Number', 'Description', 'Quantity', 'Price', 'Cost', 'Margin %'], rows)
 
 class Estimated_Deliveries_Frame(tk.Frame):
-    def __init__(self, master):
+    def __init__(self, master, job):
         tk.Frame.__init__(self, master)
         self.title = tk.Label(self, text='Estimated Delivery Dates', font=TITLE_FONT)
         self.title.grid(row=0, column=0, sticky=tk.W, columnspan=3)
         self.row = 1
-        self.delivery_date = datetime.date(2018,4,21)
-        self.parts_list = { 'Part-01': datetime.date(2018,4,18),
-                            'Part-02':datetime.date(2018,4,17),
-                            'Part-03':datetime.date(2018,4,22),
-                            'Part-04':datetime.date(2018,4,28),
-                            'Part-05':datetime.date(2018,4,17),
-                            'Part-06':datetime.date(2018,4,21)
-                            }
+        self.estimates = {}  #id(part): (part number, estimated delivery date)
+        self.rows = []  #(name, date, status, risk) labels, reused on every update
+        self.schedule = None
+        self.risk = None  #risk.Risk of the schedule, from the What If button
 
         self.create_buttons()
-        self.create_part_estimated_delivery('Project', datetime.date(2018,4,28), font=('Droid', 12, 'bold'))
-        for part, date in self.parts_list.items():
-            self.create_part_estimated_delivery(part, date)
+        self.bind_job(job)
+
+    def bind_job(self, job):
+        self.job = job
+        self.schedule = None
+        self.risk = None
+        self.estimates.clear()
+        self.show_estimates()
 
     def create_buttons(self):
         self.button1 = ttk.Button(self, text='Gantt Chart', width=10, command=self.gantt_chart)
         self.button2 = ttk.Button(self, text='Report', width=10, command=self.report)
+        self.button3 = ttk.Button(self, text='What If', width=10, command=self.what_if)
 
 
         self.button1.grid(row=self.row, column=0, sticky=tk.W)
         self.button2.grid(row=self.row, column=1, sticky=tk.W)
+        self.button3.grid(row=self.row, column=2, sticky=tk.W)
         self.row += 1
 
-    def create_part_estimated_delivery(self, partname, date, font=LABEL_FONT):
+    def show_schedule(self, schedule):
+        '''Completion dates of the parts of the job, from a scheduler.Schedule'''
+        self.schedule = schedule
+        self.risk = None
+        dates = schedule.part_dates()
+        self.estimates = {id(part): (part.number, dates[id(part)]) for part in self.job.parts if id(part) in dates}
+        self.show_estimates()
+
+    def what_if(self):
+        '''Samples task hours and machine downtime, see risk.py'''
+        if self.schedule is None:
+            messagebox.showinfo('What If', 'The job has not been scheduled yet')
+            return
+        self.master.simulate_deliveries(self.schedule)
+
+    def show_risk(self, risk):
+        if self.schedule is not None:
+            self.risk = risk
+            self.show_estimates()
+
+    def risk_text(self, probability, p50, p90):
+        if probability is None:
+            return 'P50 {} P90 {}'.format(p50, p90)
+        return '{:.0%} on time, P50 {} P90 {}'.format(probability, p50, p90)
+
+    def show_estimates(self):
+        '''Project row and the latest parts, demo data until the job has parts'''
+        risks = {}
+        if self.estimates:
+            self.delivery_date = parse_date(self.job.delivery_date) or datetime.date.today()
+            latest = heapq.nlargest(MAX_CHART_PARTS, self.estimates.items(), key=lambda item: item[1][1])
+            self.parts_list = collections.OrderedDict(estimate for key, estimate in latest)
+            project_date = latest[0][1][1]
+            if self.risk is not None:
+                risks = {number: self.risk_text(*self.risk.parts[key])
+                         for key, (number, date) in latest if key in self.risk.parts}
+                if self.job.number in self.risk.jobs:
+                    risks['Project'] = self.risk_text(*self.risk.jobs[self.job.number])
+        else:
+            self.delivery_date = datetime.date(2018,4,21)
+            self.parts_list = { 'Part-01': datetime.date(2018,4,18),
+                                'Part-02':datetime.date(2018,4,17),
+                                'Part-03':datetime.date(2018,4,22),
+                                'Part-04':datetime.date(2018,4,28),
+                                'Part-05':datetime.date(2018,4,17),
+                                'Part-06':datetime.date(2018,4,21)
+                                }
+            project_date = datetime.date(2018,4,28)
+
+        self.show_part_estimated_delivery(0, 'Project', project_date, risks.get('Project', ''),
+                                          font=('Droid', 12, 'bold'))
+        for i, (part, date) in enumerate(self.parts_list.items(), 1):
+            self.show_part_estimated_delivery(i, part, date, risks.get(part, ''))
+        for labels in self.rows[len(self.parts_list) + 1:]:
+            for label in labels:
+                label.grid_remove()
+
+    def show_part_estimated_delivery(self, index, partname, date, risk_text='', font=LABEL_FONT):
+        if index == len(self.rows):
+            self.rows.append(self.create_part_estimated_delivery(font))
         self.day_count = (date - self.delivery_date).days
         if date <= self.delivery_date:
             self.status = 'green'
         else:
             self.status = 'red'
 
-        self.label1 = tk.Label(self, text=partname, font=font, fg='blue')
-        self.delivery_label = tk.Label(self, text=date, font=font)
-        self.status_label = tk.Label(self, text=str(self.day_count) + ' days', font=font, fg=self.status)
-
-        self.label1.grid(row=self.row, column=0, sticky=tk.W)
-        self.delivery_label.grid(row=self.row, column=1, sticky=tk.W)
-        self.status_label.grid(row=self.row, column=2, sticky=tk.W)
+        label1, delivery_label, status_label, risk_label = self.rows[index]
+        label1.configure(text=partname)
+        delivery_label.configure(text=date)
+        status_label.configure(text=str(self.day_count) + ' days', fg=self.status)
+        risk_label.configure(text=risk_text)
+        for label in self.rows[index]:
+            label.grid()
+
+    def create_part_estimated_delivery(self, font=LABEL_FONT):
+        label1 = tk.Label(self, font=font, fg='blue')
+        delivery_label = tk.Label(self, font=font)
+        status_label = tk.Label(self, font=font)
+        risk_label = tk.Label(self, font=LABEL_FONT)
+
+        label1.grid(row=self.row, column=0, sticky=tk.W)
+        delivery_label.grid(row=self.row, column=1, sticky=tk.W)
+        status_label.grid(row=self.row, column=2, sticky=tk.W)
+        risk_label.grid(row=self.row, column=3, sticky=tk.W)
 
         self.row += 1
+        return label1, delivery_label, status_label, risk_label
 
     def status_check(self):
         pass
 
     def gantt_chart(self):
-        os.startfile('gantt-chart.html')
+        '''Writes the schedule of the job to GANTT_FILE and opens it in the web browser'''
+        if self.schedule is None:
+            messagebox.showinfo('Gantt Chart', 'The job has not been scheduled yet')
+            return
+        self.master.runner.submit('Gantt Chart', gantt.write_gantt, self.schedule, GANTT_FILE, [self.job.number],
+                                  'Job {} {}'.format(self.job.number, self.job.description),
+                                  on_done=gantt.open_gantt)
 
     def report(self):
-        pass
+        '''Every scheduled operation of the job, exported in the background'''
+        if self.schedule is None:
+            messagebox.showinfo('Report', 'The job has not been scheduled yet')
+            return
+        routes = self.schedule.routes
+        rows = [(routes[booking.route].part, booking.position + 1, booking.machine,
+                 '{:%Y-%m-%d %H:%M}'.format(scheduler.to_datetime(booking.start)),
+                 '{:%Y-%m-%d %H:%M}'.format(scheduler.to_datetime(booking.end)))
+                for booking in self.schedule.bookings if routes[booking.route].job == self.job.number]
+        self.master.export_csv('Delivery Report', 'Deliveries {}.csv'.format(self.job.number).replace(' .csv', '.csv'),
+                               ['Part Number', 'Operation', 'Machine', 'Start', 'End'], rows)
+
+
+class Event_History_Window(tk.Toplevel):
+    '''Most recent events of a job in the event log, newest first'''
+    COLUMNS = ('Time', 'Kind', 'Key', 'Value')
+
+    def __init__(self, master, job_number, events):
+        tk.Toplevel.__init__(self, master)
+        self.title('History {}'.format(job_number))
+        self.tree = ttk.Treeview(self, columns=self.COLUMNS, show='headings', height=20)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        for column, width in zip(self.COLUMNS, (140, 80, 160, 300)):
+            self.tree.heading(column, text=column)
+            self.tree.column(column, width=width, anchor=tk.W)
+        self.tree.grid(row=0, column=0, sticky=tk.NSEW)
+        self.scrollbar.grid(row=0, column=1, sticky=tk.NS)
+        for event in reversed(events):
+            key = event['key'] if 'key' in event else '{} parts'.format(len(event['keys']))
+            self.tree.insert('', tk.END, values=(event['time'], event['kind'], key, str(event['value'])[:120]))
+
+class Jobs_Frame(tk.Frame):
+    '''Tasks running in the background, with their progress and a button to cancel them.
+    View of a task_runner.Task_Runner'''
+    def __init__(self, master, runner):
+        tk.Frame.__init__(self, master)
+        self.runner = runner
+        self.title = tk.Label(self, text='Background Jobs', font=TITLE_FONT)
+        self.title.grid(row=0, column=0, sticky=tk.W, columnspan=3)
+        self.row = 1
+        self.rows = []  #(label, progress bar, cancel button), reused for every refresh
+        self.idle_label = tk.Label(self, text='No background jobs', font=LABEL_FONT)
+        self.idle_label.grid(row=self.row, column=0, sticky=tk.W)
+        self.row += 1
+        runner.views.append(self.show_task)
+
+    def show_task(self, task):
+        tasks = list(self.runner.tasks.values())
+        for i, task in enumerate(tasks):
+            if i == len(self.rows):
+                self.rows.append(self.create_row())
+            label, progress_bar, button = self.rows[i]
+            text = '{} - {}'.format(task.title, task.status)
+            if task.message:
+                text += ': ' + task.message
+            label.configure(text=text[:80])
+            if task.active and task.progress is None:
+                if progress_bar.cget('mode') != 'indeterminate':
+                    progress_bar.configure(mode='indeterminate')
+                    progress_bar.start()
+            else:
+                progress_bar.stop()
+                progress_bar.configure(mode='determinate', value=(task.progress or 0.0) * 100)
+            button.configure(command=lambda task_id=task.id: self.runner.cancel(task_id),
+                             state=tk.NORMAL if task.active else tk.DISABLED)
+            for widget in self.rows[i]:
+                widget.grid()
+        for widgets in self.rows[len(tasks):]:
+            widgets[1].stop()
+            for widget in widgets:
+                widget.grid_remove()
+        if tasks:
+            self.idle_label.grid_remove()
+        else:
+            self.idle_label.grid()
+
+    def create_row(self):
+        label = tk.Label(self, font=LABEL_FONT, anchor=tk.W, width=50)
+        progress_bar = ttk.Progressbar(self, length=150, maximum=100)
+        button = ttk.Button(self, text='Cancel', width=8)
+        label.grid(row=self.row, column=0, sticky=tk.W)
+        progress_bar.grid(row=self.row, column=1, sticky=tk.W)
+        button.grid(row=self.row, column=2, sticky=tk.W)
+        self.row += 1
+        return label, progress_bar, button
+
+
 
+def routing_steps(part):
+    '''Routing of a part as recorded in the event log'''
+    return [[task.department, task.operation, task.hours] for task in part.tasks]
 
+def load_open_data(database, exclude, rates):
+    '''(open jobs but exclude, their scheduler routes, their material demand, the stock).
+    Runs in a worker thread with its own connection, a sqlite connection stays in its thread'''
+    store = erp_store.Job_Store(database)
+    try:
+        jobs = store.load_open_jobs(exclude=exclude, materials=True)
+        stock = store.load_stock()
+    finally:
+        store.close()
+    return jobs, scheduler.routes_from_jobs(jobs, rates), mrp.explode(jobs), stock
+
+def write_csv(task, path, header, rows):
+    '''Writes the rows to a CSV file, reports progress to the task_runner.Task. Returns path'''
+    temporary = path + '.tmp'
+    with open(temporary, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(0, len(rows), 1000):
+            if task.cancelled():
+                raise task_runner.Cancelled()
+            writer.writerows(rows[i:i + 1000])
+            task.report(i / max(len(rows), 1), '{} rows'.format(i))
+    os.replace(temporary, path)
+    return path
+
+def open_document(path):
+    '''Opens a file with the default application of the platform'''
+    webbrowser.open(pathlib.Path(path).resolve().as_uri())
+
+def parse_date(text):
+    '''date from YYYY-MM-DD text, None if empty or invalid'''
+    try:
+        return datetime.datetime.strptime(text.strip(), '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def create_template_box(master, variable, choices=()):
+    '''Readonly combobox of the choices and the process templates. The templates are
+    read from the library every time the list opens, so saved and deleted templates show'''
+    box = ttk.Combobox(master, width=14, state='readonly', textvariable=variable)
+    box.configure(values=list(choices) + process_templates.library.names(),
+                  postcommand=lambda: box.configure(values=list(choices) + process_templates.library.names()))
+    if box['values']:
+        box.current(0)
+    return box
 
 def grid_all_widgets(frame, horizontal=1, vertical=0):
     '''1 or nothing for horizontal'''
@@ -881,24 +2219,83 @@ def configure_frames(mainframe):
             frame.grid_configure(padx=FRAME_PADDING[0], pady=FRAME_PADDING[1])
 
 
-def configure_widgets(widget):
-    '''Configure all widgets and their children. Adds styles, colors, padding, etc...'''
-    try:
-        widget.grid_configure(padx=WIDGET_PADDING[0], pady=WIDGET_PADDING[1])
-        widget.configure(background='white')
-
-        #if widget.widgetName == 'frame': widget.configure(bd=1, relief=tk.SOLID) #For testing
-
-        if len(widget.winfo_children()) > 0:
-            for child in widget.winfo_children():
-                configure_widgets(child)
+def configure_styles(root):
+    '''Class level styling: option database defaults and ttk styles.
+    Applies to every widget created afterwards, so new widgets need no configuration pass'''
+    root.option_add('*Frame.Background', 'white')  #panels and their labels, not the entries and scrollbars
+    root.option_add('*Label.Background', 'white')
+    style = ttk.Style(root)
+    style.configure('TLabel', background='white')
+    style.configure('TCheckbutton', background='white')
+    style.configure('my.TCheckbutton', font=LABEL_FONT_BOLD)
+    for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+        root.bind_class('all', sequence, mouse_wheel, add='+')
 
-    except:
-        pass
+def configure_widgets(widget):
+    '''Adds the grid padding to a widget and its children. Run once at startup,
+    widgets created later are styled by configure_styles'''
+    widgets = [widget]
+    while widgets:
+        widget = widgets.pop()
+        if widget.winfo_manager() == 'grid':
+            widget.grid_configure(padx=WIDGET_PADDING[0], pady=WIDGET_PADDING[1])
+        widgets.extend(widget.winfo_children())
+
+def mouse_wheel(event):
+    '''Shared mouse wheel binding on the "all" bindtag.
+    Scrolls the closest parent of the widget under the mouse that has a wheel_scroll method'''
+    widget = event.widget
+    if isinstance(widget, str):  #Tk internal widgets, like the combobox popdown
+        return
+    while widget is not None and not hasattr(widget, 'wheel_scroll'):
+        widget = widget.master
+    if widget is None:
+        return
+    if event.num == 5 or event.delta < 0:
+        widget.wheel_scroll(1)
+    elif event.num == 4 or event.delta > 0:
+        widget.wheel_scroll(-1)
+
+class Tooltip():
+    '''One tooltip window shared by all the widgets, shown through a class binding on the
+    "all" bindtag, so no widget needs its own binding'''
+    def __init__(self, root, delay=600):
+        self.root = root
+        self.delay = delay
+        self.window = None
+        self.after_id = None
+        root.bind_class('all', '<Enter>', self.on_enter, add='+')
+        root.bind_class('all', '<Leave>', self.hide, add='+')
+
+    def on_enter(self, event):
+        self.hide()
+        if not isinstance(event.widget, str):
+            self.after_id = self.root.after(self.delay, lambda: self.show(event.widget))
+
+    def show(self, widget):
+        self.after_id = None
+        if not widget.winfo_exists():
+            return
+        self.window = tk.Toplevel(self.root)
+        self.window.wm_overrideredirect(True)
+        self.window.wm_geometry('+{}+{}'.format(widget.winfo_pointerx() + 12, widget.winfo_pointery() + 12))
+        tk.Label(self.window, text=widget.winfo_name(), background='lightyellow',
+                 relief=tk.SOLID, borderwidth=1).pack()
+
+    def hide(self, event=None):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
 
 
 if __name__ == '__main__':
     root = tk.Tk()
     app = Main_Application(root)
     app.grid(row=0, column=0, sticky=tk.W)
+    lazy_imports.mark('main window built')
+    if '--startup-report' in sys.argv:
+        app.print_startup_report()
     root.mainloop()
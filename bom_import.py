@@ -0,0 +1,213 @@
+'''
+Streaming import of parts lists (BOM exports) for the bulk parts entry: clipboard text
+copied from Excel (tab separated), CSV files and XLSX workbooks.
+
+Files are read in chunks of CHUNK_ROWS rows, a csv.reader for the text formats and an
+openpyxl read only worksheet for XLSX, so memory is bounded by the chunk size and the
+rows kept. Each chunk is validated with vectorized pandas operations and appended to an
+erp_model.Column_Table.
+
+The first row is a header when one of its cells is a known column name (see
+COLUMN_NAMES), its columns are mapped by name. Otherwise the columns are taken in
+the order of COLUMNS. Rows without a part number are skipped, rows with a quantity
+that is not a positive number or with more cells than the first row are skipped and
+reported.
+'''
+
+import csv
+import io
+import itertools
+import os
+
+import erp_model
+import lazy_imports
+import task_runner
+
+pd = lazy_imports.lazy('pandas')
+openpyxl = lazy_imports.lazy('openpyxl')
+
+COLUMNS = ['Part Number', 'Description', 'Quantity', 'Material', 'Drawing']
+CHUNK_ROWS = 20000
+MAX_ERRORS = 100  #errors kept in the result, the others are only counted
+SNIFF_SIZE = 65536  #bytes read to guess the CSV delimiter
+ENCODING = 'utf-8-sig'
+
+#lower case header text: column
+COLUMN_NAMES = {'part number': 'Part Number', 'part': 'Part Number', 'part no': 'Part Number',
+                'part #': 'Part Number', 'pn': 'Part Number', 'item': 'Part Number',
+                'numéro': 'Part Number', 'no de pièce': 'Part Number', 'pièce': 'Part Number',
+                'description': 'Description', 'desc': 'Description', 'name': 'Description',
+                'quantity': 'Quantity', 'qty': 'Quantity', 'qté': 'Quantity', 'quantité': 'Quantity',
+                'material': 'Material', 'matériel': 'Material', 'matériau': 'Material', 'matiere': 'Material',
+                'drawing': 'Drawing', 'drawing number': 'Drawing', 'dwg': 'Drawing', 'dessin': 'Drawing'}
+
+
+class Import_Result():
+    '''Rows imported into table, with the column mapping used and the rejected rows.
+    errors: [(line number, message)], the first MAX_ERRORS'''
+    def __init__(self, columns=COLUMNS):
+        self.table = erp_model.Column_Table(columns)
+        self.mapping = None  #column: index of the source column
+        self.header = False
+        self.lines = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        text = '{} parts imported from {} lines'.format(len(self.table), self.lines)
+        if self.error_count:
+            text += ', {} rejected'.format(self.error_count)
+            text += ''.join('\nline {}: {}'.format(line, message) for line, message in self.errors[:10])
+        return text
+
+
+def map_columns(cells, columns=COLUMNS):
+    '''{column: index} from a header row, None if no cell is a known column name'''
+    mapping = {}
+    for i, cell in enumerate(cells):
+        column = COLUMN_NAMES.get(str(cell).strip().lower())
+        if column in columns and column not in mapping:
+            mapping[column] = i
+    return mapping or None
+
+
+def csv_chunks(f, delimiter, on_bad_line=None):
+    '''DataFrames of text cells indexed by line number - 1, blank lines skipped. Every row gets
+    the number of cells of the first row: a shorter row is padded, a longer one is left out
+    and reported to on_bad_line(line number, message)'''
+    rows = csv.reader(f, delimiter=delimiter)
+    width = None
+    try:
+        while True:
+            chunk, index = [], []
+            for row in rows:
+                if not row:
+                    continue
+                if width is None:
+                    width = len(row)
+                if len(row) > width:
+                    if on_bad_line is not None:
+                        on_bad_line(rows.line_num, 'expected {} fields, saw {}'.format(width, len(row)))
+                    continue
+                row.extend([''] * (width - len(row)))
+                chunk.append(row)
+                index.append(rows.line_num - 1)
+                if len(chunk) == CHUNK_ROWS:
+                    break
+            if not chunk:
+                break
+            yield pd.DataFrame(chunk, index=index, dtype=str)
+    except csv.Error as error:
+        raise ValueError('line {}: {}'.format(rows.line_num, error)) from error
+
+
+def xlsx_chunks(path):
+    '''DataFrames of text cells of the first worksheet, indexed by row like csv_chunks'''
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        first = 0
+        while True:
+            chunk = [[cell_text(cell) for cell in row] for row in itertools.islice(rows, CHUNK_ROWS)]
+            if not chunk:
+                break
+            width = max(len(row) for row in chunk)
+            for row in chunk:
+                row.extend([''] * (width - len(row)))
+            yield pd.DataFrame(chunk, index=range(first, first + len(chunk)), dtype=str)
+            first += len(chunk)
+    finally:
+        workbook.close()
+
+
+def cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return '{:g}'.format(value)
+    return str(value)
+
+
+def sniff_delimiter(sample):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+
+def add_chunk(result, frame):
+    '''Validates a chunk and appends its rows to result.table'''
+    if result.mapping is None:
+        result.mapping = map_columns(frame.iloc[0].tolist(), result.table.columns)
+        result.header = result.mapping is not None
+        if result.header:
+            frame = frame.iloc[1:]
+        else:
+            result.mapping = {column: i for i, column in enumerate(result.table.columns) if i < frame.shape[1]}
+    result.lines += len(frame)
+    if 'Part Number' not in result.mapping:
+        raise ValueError('No part number column')
+
+    values = {column: frame[index].str.strip() for column, index in result.mapping.items()
+              if index < frame.shape[1]}
+    keep = values['Part Number'] != ''
+    if 'Quantity' in values:
+        text = values['Quantity'].str.replace(',', '.', regex=False)
+        quantity = pd.to_numeric(text.mask(text == '', '1'), errors='coerce')
+        bad = keep & ~(quantity > 0)
+        for line, value in zip((frame.index[bad] + 1).tolist(), values['Quantity'][bad].tolist()):
+            result.add_error(line, 'quantity {!r} is not a positive number'.format(value))
+        keep &= ~bad
+        values['Quantity'] = ['{:g}'.format(number) for number in quantity[keep].tolist()]
+
+    count = int(keep.sum())
+    result.table.extend(count, {column: column_values if isinstance(column_values, list)
+                                else column_values[keep].tolist()
+                                for column, column_values in values.items()})
+
+
+def import_chunks(task, chunks, size=None, position=None, result=None):
+    '''Adds the chunks to result, a new Import_Result if None. size and position() give the progress'''
+    if result is None:
+        result = Import_Result()
+    for frame in chunks:
+        if task is not None:
+            if task.cancelled():
+                raise task_runner.Cancelled()
+            progress = min(position() / size, 1.0) if size and position else None
+            task.report(progress, '{} rows'.format(result.lines))
+        add_chunk(result, frame)
+    return result
+
+
+def import_text(task, text):
+    '''Clipboard text, tab separated when copied from Excel'''
+    f = io.StringIO(text)
+    result = Import_Result()
+    chunks = csv_chunks(f, sniff_delimiter(text[:SNIFF_SIZE]), result.add_error)
+    return import_chunks(task, chunks, len(text), f.tell, result)
+
+
+def import_csv(task, path):
+    with open(path, encoding=ENCODING, errors='replace', newline='') as f:
+        delimiter = sniff_delimiter(f.read(SNIFF_SIZE))
+        f.seek(0)
+        result = Import_Result()
+        return import_chunks(task, csv_chunks(f, delimiter, result.add_error), os.path.getsize(path),
+                             f.buffer.tell, result)
+
+
+def import_xlsx(task, path):
+    return import_chunks(task, xlsx_chunks(path))
+
+
+def import_file(task, path):
+    '''Imports a .xlsx workbook or a delimited text file. Returns an Import_Result'''
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        return import_xlsx(task, path)
+    return import_csv(task, path)
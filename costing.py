@@ -0,0 +1,155 @@
+'''
+Automatic cost calculations.
+
+Every routing task of a job is flattened into numpy arrays (part index, operation index,
+hours), costed with the hourly rate and setup time of its operation, then rolled up to
+part and job totals with np.bincount.
+
+Task hours are run hours per piece, except for operations where per_piece is False
+(planning, programming) where they are the total for the part.
+'''
+
+import functools
+
+import lazy_imports
+
+np = lazy_imports.lazy('numpy')
+
+#operation: (hourly rate $, setup hours, task hours are per piece)
+OPERATION_RATES = {'Planning': (60.0, 0.0, False),
+                   'Programming': (75.0, 0.0, False),
+                   'Lathe': (85.0, 1.0, True),
+                   '5-axis mill': (140.0, 2.0, True),
+                   '3-axis mill': (95.0, 1.5, True),
+                   'JobShop': (70.0, 0.0, True),
+                   'MechantMachinage': (70.0, 0.0, True),
+                   'MachinMachine': (70.0, 0.0, True),
+                   'ToolShop': (80.0, 0.0, True),
+                   'Black Oxyde': (50.0, 0.5, True),
+                   'Hard Anodize': (65.0, 0.5, True),
+                   'Manual Inspection': (55.0, 0.0, True),
+                   'CMM Inspection': (90.0, 0.5, True)}
+DEFAULT_RATE = (75.0, 0.0, True)  #operations missing from the table
+
+#material: cost $ per unit of material, a part uses material_usage units per piece
+MATERIAL_COSTS = {'Acier 1020': 12.0,
+                  'Steel 1010': 10.0,
+                  'Washer 3/4': 0.25,
+                  'Custom Screw': 2.5}
+
+
+class Rates():
+    '''Operation rates as arrays, indexed by operation number. The last index is DEFAULT_RATE'''
+    def __init__(self, operations=OPERATION_RATES, materials=MATERIAL_COSTS, default=DEFAULT_RATE):
+        self.names = list(operations)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.values = [operations[name] for name in self.names] + [default]  #python tuples
+        self.materials = materials
+
+    #numpy arrays are built on first use, so the per part calculations do not import numpy
+    @functools.cached_property
+    def rate(self):
+        return np.array([value[0] for value in self.values], dtype=np.float64)
+
+    @functools.cached_property
+    def setup(self):
+        return np.array([value[1] for value in self.values], dtype=np.float64)
+
+    @functools.cached_property
+    def per_piece(self):
+        return np.array([value[2] for value in self.values], dtype=bool)
+
+    def operation_index(self, operation):
+        return self.index.get(operation, len(self.names))
+
+
+class Task_Array():
+    '''Every routing task of a list of parts, as flat arrays'''
+    def __init__(self, parts, rates):
+        part_index = []
+        operation_index = []
+        hours = []
+        get = rates.index.get
+        unknown = len(rates.names)
+        for i, part in enumerate(parts):
+            for task in part.tasks:
+                part_index.append(i)
+                operation_index.append(get(task.operation, unknown))
+                hours.append(task.hours)
+        self.part_index = np.array(part_index, dtype=np.int64)
+        self.operation_index = np.array(operation_index, dtype=np.int64)
+        self.hours = np.array(hours, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.hours)
+
+
+class Costing():
+    '''Cost and hours of every task, rolled up to the parts and the job'''
+    def __init__(self, parts, task_hours, task_cost, part_hours, labour_cost, material_cost):
+        self.parts = parts
+        self.task_hours = task_hours
+        self.task_cost = task_cost
+        self.part_hours = part_hours
+        self.labour_cost = labour_cost
+        self.material_cost = material_cost
+        self.part_cost = labour_cost + material_cost
+        self.job_hours = float(part_hours.sum())
+        self.job_cost = float(self.part_cost.sum())
+
+    def apply(self, job):
+        '''Writes the part and job totals in the model'''
+        for part, hours, cost in zip(self.parts, self.part_hours.tolist(), self.part_cost.tolist()):
+            part.hours = hours
+            part.cost = cost
+        job.cost = self.job_cost
+
+
+def line_costs(job, rates):
+    '''Cost of the material lines of the job, by part number'''
+    costs = {}
+    for line in job.materials:
+        costs[line.part] = costs.get(line.part, 0.0) + line.quantity * rates.materials.get(line.material, 0.0)
+    return costs
+
+
+def material_costs(job, rates):
+    '''Material cost of every part: part material per piece, plus the material lines of the part'''
+    costs = rates.materials
+    quantity = np.array([part.quantity for part in job.parts], dtype=np.float64)
+    per_piece = np.array([part.material_usage * costs.get(part.material, 0.0) for part in job.parts],
+                         dtype=np.float64)
+    material = quantity * per_piece
+    if job.materials:
+        lines = line_costs(job, rates)
+        material += np.array([lines.get(part.number, 0.0) for part in job.parts], dtype=np.float64)
+    return material
+
+
+def cost_part(part, rates, line_cost=0.0):
+    '''(hours, cost) of a single part in plain python, for incremental updates'''
+    hours = 0.0
+    cost = line_cost + part.quantity * part.material_usage * rates.materials.get(part.material, 0.0)
+    for task in part.tasks:
+        rate, setup, per_piece = rates.values[rates.operation_index(task.operation)]
+        task_hours = setup + task.hours * (part.quantity if per_piece else 1.0)
+        hours += task_hours
+        cost += rate * task_hours
+    return hours, cost
+
+
+def cost_job(job, rates=None):
+    '''Costs every task of the job and rolls the costs up to parts and job'''
+    rates = rates or Rates()
+    tasks = Task_Array(job.parts, rates)
+    n_parts = len(job.parts)
+    quantity = np.array([part.quantity for part in job.parts], dtype=np.float64)
+
+    op = tasks.operation_index
+    pieces = np.where(rates.per_piece[op], quantity[tasks.part_index], 1.0) if len(tasks) else np.zeros(0)
+    task_hours = rates.setup[op] + tasks.hours * pieces
+    task_cost = rates.rate[op] * task_hours
+
+    part_hours = np.bincount(tasks.part_index, weights=task_hours, minlength=n_parts)
+    labour_cost = np.bincount(tasks.part_index, weights=task_cost, minlength=n_parts)
+    return Costing(job.parts, task_hours, task_cost, part_hours, labour_cost, material_costs(job, rates))
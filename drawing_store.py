@@ -0,0 +1,184 @@
+'''
+Content addressed storage for imported drawings.
+
+Each drawing is copied once under blobs/, named by the sha256 of its content, so the
+same drawing attached to hundreds of parts is stored (and decoded) once. A small json
+index maps part number and revision to the blob. A thumbnail pyramid is generated at
+import time, the views then only read the thumbnails, never the original file.
+
+An import hashes, copies and decodes the whole file, the GUI runs it through the
+task_runner. A part without a drawing of its own shows the latest revision stored for
+its drawing number or its part number, see part_drawing().
+
+Jobs and parts keep a blob as a path relative to the store ('blobs/ab/ab12....png'), the
+same on every machine sharing the database. resolve() turns it into a local path.
+'''
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+import erp_model
+import lazy_imports
+
+Image = lazy_imports.lazy('PIL.Image')
+
+APPLICATION_FOLDER = os.path.dirname(os.path.abspath(__file__))
+DRAWINGS_FOLDER = os.path.join(APPLICATION_FOLDER, 'drawings')
+PYRAMID_SIZES = (600, 300, 150)  #max width/height of the thumbnails, largest first
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def revision_from_name(path):
+    '''part-REV-B-2018-03-18.jpg -> B'''
+    match = re.search(r'REV-?([A-Za-z0-9]+)', os.path.basename(path), re.IGNORECASE)
+    return match.group(1).upper() if match else ''
+
+
+class Drawing_Store():
+    def __init__(self, folder=DRAWINGS_FOLDER):
+        self.folder = folder
+        self.blobs_folder = os.path.join(folder, 'blobs')
+        self.thumbs_folder = os.path.join(folder, 'thumbs')
+        self.index_file = os.path.join(folder, 'index.json')
+        self.index = {}  #'part|revision': blob path relative to folder
+        self.latest = {}  #part: (revision order, blob path relative to folder) of its latest revision
+        self.lock = threading.Lock()  #imports run in worker threads
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+        for key, relative in self.index.items():
+            part_number, revision = key.rsplit('|', 1)
+            self.add_latest(part_number, revision, relative)
+
+    def blob_path(self, digest, extension=''):
+        return os.path.join(self.blobs_folder, digest[:2], digest + extension.lower())
+
+    def thumbnail_path(self, digest, size):
+        return os.path.join(self.thumbs_folder, digest[:2], '{}_{}.png'.format(digest, size))
+
+    def import_drawing(self, path, part_number='', revision=''):
+        '''Copies the drawing in the store unless the same content is already there, and
+        creates its thumbnails unless they all exist. Returns the reference() of the stored blob.
+        Slow on large scans, run it in a worker thread'''
+        digest = file_digest(path)
+        blob = self.blob_path(digest, os.path.splitext(path)[1])
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temporary = '{}.{}.tmp'.format(blob, threading.get_ident())
+            shutil.copyfile(path, temporary)
+            os.replace(temporary, blob)
+        if not self.has_pyramid(digest):
+            self.create_pyramid(blob, digest)
+        if part_number:
+            self.attach([part_number], revision, blob)
+        return self.reference(blob)
+
+    def reference(self, blob):
+        '''Path of a blob relative to the store, kept by the jobs and parts'''
+        return os.path.relpath(blob, self.folder).replace(os.sep, '/')
+
+    def resolve(self, path):
+        '''Local path of a drawing. A blob reference is relative to the store, any other relative
+        path to the application folder (the default drawings in img/). An absolute blob path
+        written by another machine is looked up in this store by its digest'''
+        if not path:
+            return path
+        if not os.path.isabs(path):
+            parts = path.replace('\\', '/').split('/')
+            if parts[0] == 'blobs':
+                return os.path.join(self.folder, *parts)
+            return os.path.join(APPLICATION_FOLDER, *parts)
+        if not os.path.exists(path) and os.path.basename(os.path.dirname(os.path.dirname(path))) == 'blobs':
+            digest, extension = os.path.splitext(os.path.basename(path))
+            return self.blob_path(digest, extension)
+        return path
+
+    def has_pyramid(self, digest):
+        return all(os.path.exists(self.thumbnail_path(digest, size)) for size in PYRAMID_SIZES)
+
+    def create_pyramid(self, blob, digest):
+        '''Decodes the drawing once (draft mode for JPEG) and saves every thumbnail size,
+        each level is reduced from the previous one'''
+        with Image.open(blob) as img:
+            img.draft('RGB', (PYRAMID_SIZES[0], PYRAMID_SIZES[0]))
+            if img.mode not in ('RGB', 'RGBA', 'L'):
+                img = img.convert('RGBA')
+            for size in PYRAMID_SIZES:
+                img.thumbnail((size, size))
+                thumbnail = self.thumbnail_path(digest, size)
+                os.makedirs(os.path.dirname(thumbnail), exist_ok=True)
+                temporary = '{}.{}.tmp'.format(thumbnail, threading.get_ident())
+                img.save(temporary, 'PNG')
+                os.replace(temporary, thumbnail)
+
+    def attach(self, part_numbers, revision, blob):
+        '''Maps every part number at this revision to the blob, a path or a reference, the index
+        is written once'''
+        relative = os.path.relpath(self.resolve(blob), self.folder)
+        with self.lock:
+            for part_number in part_numbers:
+                self.index['{}|{}'.format(part_number, revision)] = relative
+                self.add_latest(part_number, revision, relative)
+            self.save_index()
+
+    def add_latest(self, part_number, revision, relative):
+        '''Revisions are ordered by length then text: B < C < AA, 9 < 10'''
+        order = (len(revision), revision)
+        if part_number not in self.latest or self.latest[part_number][0] <= order:
+            self.latest[part_number] = (order, relative)
+
+    def save_index(self):
+        os.makedirs(self.folder, exist_ok=True)
+        temporary = self.index_file + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(temporary, self.index_file)
+
+    def lookup(self, part_number, revision=None):
+        '''Returns the blob path of the part drawing at this revision, the latest revision
+        if revision is None, or None'''
+        if revision is None:
+            relative = self.latest.get(part_number, (None, None))[1]
+        else:
+            relative = self.index.get('{}|{}'.format(part_number, revision))
+        return os.path.join(self.folder, relative) if relative else None
+
+    def part_drawing(self, part):
+        '''Local path of the drawing shown for an erp_model.Part: its own drawing, else the stored
+        drawing of its drawing number or of its part number, else the default drawing'''
+        if part.drawing and part.drawing != erp_model.DEFAULT_DRAWING:
+            return self.resolve(part.drawing)
+        for number in (part.drawing_number, part.number):
+            if number:
+                blob = self.lookup(number)
+                if blob is not None:
+                    return blob
+        return self.resolve(part.drawing)
+
+    def display_path(self, path, size):
+        '''For a stored blob, the smallest pyramid thumbnail at least as large as size.
+        Any other path is returned unchanged'''
+        if os.path.dirname(os.path.dirname(os.path.abspath(path))) != os.path.abspath(self.blobs_folder):
+            return path
+        digest = os.path.splitext(os.path.basename(path))[0]
+        for level in reversed(PYRAMID_SIZES):
+            if level >= max(size) or level == PYRAMID_SIZES[0]:
+                thumbnail = self.thumbnail_path(digest, level)
+                if os.path.exists(thumbnail):
+                    return thumbnail
+        return path
+
+
+store = Drawing_Store()
@@ -0,0 +1,353 @@
+'''
+Plain python data model for jobs, parts, routing tasks and material lines.
+
+The tkinter frames in ERP-prototype.py are only views over these objects,
+so costing, scheduling and reports can work on a job without a display.
+'''
+
+import collections
+import datetime
+
+#Departments and their operations, used by Part_Task comboboxes
+TASKS = {'Methods': ['Planning', 'Programming'],
+         'Machining': ['Lathe', '5-axis mill', '3-axis mill'],
+         'Sub-contracting': ['JobShop', 'MechantMachinage', 'MachinMachine', 'ToolShop'],
+         'Surface Treatment': ['Black Oxyde', 'Hard Anodize'],
+         'Inspection': ['Manual Inspection', 'CMM Inspection']}
+
+CHECKLIST_TASKS = ['Confirmation', 'Material Requisition', 'Purchase', 'Job Released']
+EMPLOYEES = ['Paul tempsdniaser', 'Bob', 'Jacqueline', 'Chuck Norris']
+MATERIAL_STATUSES = ['Not Ordered', 'RFQ', 'Ordered', 'Received']
+MISSING_STATUSES = ('Not Ordered', 'RFQ', 'Ordered')  #material lines not received yet
+
+#(label, attribute) pairs shown by the Entry_Bar views
+JOB_FIELDS = [('Job Number', 'number'), ('Description', 'description'),
+              ('Client', 'client'), ('Quantity', 'quantity'), ('Cost', 'cost'),
+              ('Delivery Date', 'delivery_date'), ('Status', 'status')]
+PART_FIELDS = [('Part Number', 'number'), ('Description', 'description'),
+               ('Quantity', 'quantity'), ('Material', 'material'), ('Cost', 'cost'),
+               ('Status', 'status'), ('Hours', 'hours'), ('Dimension', 'dimension'),
+               ('Price', 'price'), ('Material Qty', 'material_usage')]
+COMPUTED_FIELDS = ('cost', 'hours')  #calculated by the costing engine, read only in the views
+
+DEFAULT_DRAWING = 'img/part-REV-B-2018-03-18.jpg'
+
+
+def to_number(value, default=0.0):
+    '''Converts the text of an entry bar to a float, returns default if it is not a number'''
+    try:
+        return float(str(value).replace(',', '.').replace('$', '').strip())
+    except ValueError:
+        return default
+
+
+class Model():
+    '''Base class for the model objects, gives text access to the fields for the views'''
+    __slots__ = ()
+    numeric_fields = ()
+
+    def get_text(self, attribute):
+        value = getattr(self, attribute)
+        if value is None:
+            return ''
+        if isinstance(value, float):
+            return '{:g}'.format(value)
+        return str(value)
+
+    def set_text(self, attribute, text):
+        if attribute in self.numeric_fields:
+            setattr(self, attribute, to_number(text))
+        else:
+            setattr(self, attribute, text)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def copy(self):
+        '''Copy of the fields, the lists are shared'''
+        clone = type(self).__new__(type(self))
+        clone.__setstate__(self.__getstate__())
+        return clone
+
+    def __repr__(self):
+        fields = ', '.join('{}={!r}'.format(name, getattr(self, name))
+                           for name in self.__slots__ if not isinstance(getattr(self, name), list))
+        return '{}({})'.format(type(self).__name__, fields)
+
+
+class Routing_Task(Model):
+    '''One step of a part routing: department, operation, hours and notes'''
+    __slots__ = ('department', 'operation', 'hours', 'notes')
+    numeric_fields = ('hours',)
+
+    def __init__(self, department='Methods', operation='Planning', hours=0.0, notes=''):
+        self.department = department
+        self.operation = operation
+        self.hours = float(hours)
+        self.notes = notes
+
+
+class Material_Line(Model):
+    '''Raw material needed for a part'''
+    __slots__ = ('material', 'part', 'status', 'quantity')
+    numeric_fields = ('quantity',)
+
+    def __init__(self, material, part='', status='Not Ordered', quantity=1.0):
+        self.material = material
+        self.part = part
+        self.status = status
+        self.quantity = float(quantity)
+
+
+class Checklist_Item(Model):
+    '''A job checklist task, who did it and when'''
+    __slots__ = ('task', 'done', 'employee', 'date')
+
+    def __init__(self, task, done=False, employee=EMPLOYEES[0], date=None):
+        self.task = task
+        self.done = done
+        self.employee = employee
+        self.date = date
+
+    def check(self, done, today=None):
+        self.done = done
+        self.date = (today or datetime.date.today()) if done else None
+
+
+class Part(Model):
+    '''A part of a job with its attributes and its routing'''
+    __slots__ = ('number', 'description', 'quantity', 'material', 'cost', 'status',
+                 'hours', 'dimension', 'drawing', 'drawing_number', 'price', 'material_usage', 'tasks')
+    numeric_fields = ('quantity', 'cost', 'hours', 'price', 'material_usage')
+
+    def __init__(self, number='', description='', quantity=1.0, material='', cost=0.0,
+                 status='', hours=0.0, dimension='', drawing=DEFAULT_DRAWING, drawing_number='',
+                 price=0.0, material_usage=1.0, tasks=None):
+        self.number = number
+        self.description = description
+        self.quantity = float(quantity)
+        self.material = material
+        self.cost = float(cost)
+        self.status = status
+        self.hours = float(hours)
+        self.dimension = dimension
+        self.drawing = drawing
+        self.drawing_number = drawing_number
+        self.price = float(price)  #selling price per piece
+        self.material_usage = float(material_usage)  #units of material per piece
+        self.tasks = tasks if tasks is not None else []
+
+    def add_task(self, department='Methods', operation=None, hours=0.0, notes=''):
+        if operation is None:
+            operation = TASKS[department][0]
+        task = Routing_Task(department, operation, hours, notes)
+        self.tasks.append(task)
+        return task
+
+    def total_hours(self):
+        return sum(task.hours for task in self.tasks)
+
+    def snapshot(self):
+        '''Copy of the part and its routing, the views can keep editing the part'''
+        part = self.copy()
+        part.tasks = [task.copy() for task in self.tasks]
+        return part
+
+
+class Job(Model):
+    '''A job: summary information, parts, checklist and material'''
+    __slots__ = ('number', 'description', 'client', 'quantity', 'cost', 'delivery_date',
+                 'status', 'drawing', 'parts', 'checklist', 'materials')
+    numeric_fields = ('quantity', 'cost')
+
+    def __init__(self, number='', description='', client='', quantity=0.0, cost=0.0,
+                 delivery_date='', status='', drawing='img/assembly-REV-A.png'):
+        self.number = number
+        self.description = description
+        self.client = client
+        self.quantity = float(quantity)
+        self.cost = float(cost)
+        self.delivery_date = delivery_date
+        self.status = status
+        self.drawing = drawing
+        self.parts = []
+        self.checklist = [Checklist_Item(task) for task in CHECKLIST_TASKS]
+        self.materials = []
+
+    def add_part(self, number='', **kwargs):
+        part = Part(number, **kwargs)
+        self.parts.append(part)
+        return part
+
+    def add_parts(self, numbers, **kwargs):
+        '''Bulk insert, one Part per part number'''
+        parts = [Part(number, **kwargs) for number in numbers]
+        self.parts.extend(parts)
+        return parts
+
+    def remove_part(self, index):
+        return self.parts.pop(index)
+
+    def with_parts(self, parts):
+        '''Copy of the job summary with only these parts, for the reports of a selection'''
+        job = Job()
+        job.__setstate__(self.__getstate__())
+        job.parts = list(parts)
+        return job
+
+    def snapshot(self, parts=None):
+        '''Copy of the job and everything it contains (only these parts if given), taken on
+        the Tk thread before the job is handed to a worker thread or process'''
+        job = self.copy()
+        job.parts = [part.snapshot() for part in (self.parts if parts is None else parts)]
+        job.checklist = [item.copy() for item in self.checklist]
+        job.materials = [line.copy() for line in self.materials]
+        return job
+
+    def total_hours(self):
+        return sum(part.total_hours() for part in self.parts)
+
+
+class Material_Index():
+    '''Material lines of several jobs, indexed by status, material and job.
+    Lines are keyed by id(line) and jobs by id(job), so editing a job number does not
+    break the index. A lookup costs the size of its result, not the number of lines.
+    Status changes must go through set_status() to keep the index up to date'''
+    def __init__(self, jobs=()):
+        self.lines = {}  #id(line): line
+        self.line_job = {}  #id(line): job
+        self.order = {}  #id(line): insertion number, the results keep the order of the lines
+        self.by_status = collections.defaultdict(set)
+        self.by_material = collections.defaultdict(set)
+        self.by_job = collections.defaultdict(set)
+        self.count = 0
+        for job in jobs:
+            self.add_job(job)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add_job(self, job):
+        for line in job.materials:
+            self.add(job, line)
+
+    def remove_job(self, job):
+        for key in list(self.by_job.get(id(job), ())):
+            self.remove(self.lines[key])
+
+    def add(self, job, line):
+        key = id(line)
+        if key in self.lines:
+            return
+        self.lines[key] = line
+        self.line_job[key] = job
+        self.order[key] = self.count
+        self.count += 1
+        self.by_status[line.status].add(key)
+        self.by_material[line.material].add(key)
+        self.by_job[id(job)].add(key)
+
+    def remove(self, line):
+        key = id(line)
+        if self.lines.pop(key, None) is None:
+            return
+        job = self.line_job.pop(key)
+        del self.order[key]
+        self.by_status[line.status].discard(key)
+        self.by_material[line.material].discard(key)
+        self.by_job[id(job)].discard(key)
+
+    def set_status(self, line, status):
+        key = id(line)
+        if key in self.lines:
+            self.by_status[line.status].discard(key)
+            self.by_status[status].add(key)
+        line.status = status
+
+    def job_of(self, line):
+        return self.line_job[id(line)]
+
+    def find(self, statuses=None, material=None, job=None):
+        '''Lines matching every criterion given: one of the statuses, the material, the job.
+        Returns the lines in the order they were added'''
+        if isinstance(statuses, str):
+            statuses = (statuses,)
+        sets = []
+        if material is not None:
+            sets.append(self.by_material.get(material, set()))
+        if job is not None:
+            sets.append(self.by_job.get(id(job), set()))
+        status_sets = [self.by_status.get(status, set()) for status in statuses] if statuses is not None else []
+        if sets and (statuses is None or min(map(len, sets)) <= sum(map(len, status_sets))):
+            #start from the smallest set and check the status on the lines
+            sets.sort(key=len)
+            keys = sets[0].intersection(*sets[1:])
+            if statuses is not None:
+                keys = [key for key in keys if self.lines[key].status in statuses]
+        elif statuses is not None:
+            keys = set().union(*status_sets).intersection(*sets)
+        else:
+            keys = self.lines.keys()
+        return [self.lines[key] for key in sorted(keys, key=self.order.__getitem__)]
+
+    def missing(self, job=None):
+        '''Lines not received yet, of one job or of every job'''
+        return self.find(MISSING_STATUSES, job=job)
+
+
+def parts_from_table(table):
+    '''Creates one Part per row of a bulk entry Column_Table'''
+    columns = [table.column(name) for name in ('Part Number', 'Description', 'Quantity',
+                                               'Material', 'Drawing')]
+    return [Part(number, description, to_number(quantity, 1.0), material, drawing_number=drawing)
+            for number, description, quantity, material, drawing in zip(*columns)]
+
+
+class Column_Table():
+    '''Column store: one list per column instead of one object per row.
+    Used by the bulk entry grid, which only creates widgets for the visible rows'''
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.data = [[] for column in self.columns]
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def column(self, name):
+        return self.data[self.columns.index(name)]
+
+    def get(self, row, column):
+        return self.data[column][row]
+
+    def set(self, row, column, value):
+        self.data[column][row] = value
+
+    def row(self, row):
+        return [values[row] for values in self.data]
+
+    def append(self, row):
+        for values, value in zip(self.data, row):
+            values.append(value)
+
+    def extend(self, count, columns):
+        '''Adds count rows. columns maps a column name to a sequence of count values,
+        or to a single string repeated on every row. Missing columns are left empty'''
+        for name, values in zip(self.columns, self.data):
+            column_values = columns.get(name, '')
+            if isinstance(column_values, str):
+                values.extend([column_values] * count)
+            else:
+                values.extend(column_values)
+
+    def delete(self, row):
+        for values in self.data:
+            del values[row]
+
+    def clear(self):
+        for values in self.data:
+            del values[:]
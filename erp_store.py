@@ -0,0 +1,215 @@
+'''
+SQLite storage for jobs, parts, routing tasks, checklist states and material rows.
+
+The database runs in WAL mode so several shop floor seats can read while one
+writes. A job is always written in one transaction with executemany().
+'''
+
+import datetime
+import sqlite3
+
+import erp_model
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    number TEXT NOT NULL UNIQUE,
+    description TEXT, client TEXT, quantity REAL, cost REAL,
+    delivery_date TEXT, status TEXT, drawing TEXT
+);
+CREATE TABLE IF NOT EXISTS parts (
+    job_id INTEGER NOT NULL, position INTEGER NOT NULL,
+    number TEXT, description TEXT, quantity REAL, material TEXT, cost REAL,
+    status TEXT, hours REAL, dimension TEXT, drawing TEXT, drawing_number TEXT, price REAL,
+    material_usage REAL,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS routing_tasks (
+    job_id INTEGER NOT NULL, part_position INTEGER NOT NULL, position INTEGER NOT NULL,
+    department TEXT, operation TEXT, hours REAL, notes TEXT,
+    PRIMARY KEY (job_id, part_position, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS checklist (
+    job_id INTEGER NOT NULL, position INTEGER NOT NULL,
+    task TEXT, done INTEGER, employee TEXT, date TEXT,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS materials (
+    job_id INTEGER NOT NULL, position INTEGER NOT NULL,
+    material TEXT, part TEXT, status TEXT, quantity REAL,
+    PRIMARY KEY (job_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stock (
+    material TEXT PRIMARY KEY, on_hand REAL, on_order REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS parts_number ON parts (number);
+CREATE INDEX IF NOT EXISTS parts_status ON parts (status);
+CREATE INDEX IF NOT EXISTS materials_status ON materials (status);
+'''
+
+JOB_COLUMNS = ('number', 'description', 'client', 'quantity', 'cost',
+               'delivery_date', 'status', 'drawing')
+PART_COLUMNS = ('number', 'description', 'quantity', 'material', 'cost',
+                'status', 'hours', 'dimension', 'drawing', 'drawing_number', 'price', 'material_usage')
+TASK_COLUMNS = ('department', 'operation', 'hours', 'notes')
+MATERIAL_COLUMNS = ('material', 'part', 'status', 'quantity')
+CLOSED_STATUSES = ('Shipped', 'Closed', 'Cancelled')  #job statuses left out of the schedule
+#columns added after the first release, added to older databases when they are opened
+ADDED_COLUMNS = {'parts': [('drawing_number', "TEXT DEFAULT ''"), ('price', 'REAL DEFAULT 0.0'),
+                           ('material_usage', 'REAL DEFAULT 1.0')]}
+
+
+class Job_Store():
+    '''Saves and loads erp_model.Job objects to a SQLite database'''
+
+    def __init__(self, database='erp.db'):
+        self.database = database
+        self.connection = sqlite3.connect(database, timeout=10)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.add_columns()
+
+    def add_columns(self):
+        '''Upgrades a database created by an older version, new columns go at the end of their table'''
+        with self.connection:
+            for table, columns in ADDED_COLUMNS.items():
+                existing = {row[1] for row in self.connection.execute('PRAGMA table_info({})'.format(table))}
+                for column, definition in columns:
+                    if column not in existing:
+                        self.connection.execute('ALTER TABLE {} ADD COLUMN {} {}'.format(table, column, definition))
+
+    def close(self):
+        self.connection.close()
+
+    def save_job(self, job):
+        '''Writes the job and everything it contains in a single transaction'''
+        if not job.number:
+            raise ValueError('A job needs a job number to be saved')
+        with self.connection:
+            cursor = self.connection.cursor()
+            cursor.execute('INSERT INTO jobs ({0}) VALUES ({1}) '
+                           'ON CONFLICT(number) DO UPDATE SET {2}'.format(
+                               ', '.join(JOB_COLUMNS), ', '.join('?' * len(JOB_COLUMNS)),
+                               ', '.join('{0}=excluded.{0}'.format(column) for column in JOB_COLUMNS[1:])),
+                           [getattr(job, column) for column in JOB_COLUMNS])
+            job_id = cursor.execute('SELECT id FROM jobs WHERE number=?', (job.number,)).fetchone()[0]
+
+            for table in ('parts', 'routing_tasks', 'checklist', 'materials'):
+                cursor.execute('DELETE FROM {} WHERE job_id=?'.format(table), (job_id,))
+
+            cursor.executemany(
+                'INSERT INTO parts (job_id, position, {}) VALUES (?, ?, {})'.format(
+                    ', '.join(PART_COLUMNS), ', '.join('?' * len(PART_COLUMNS))),
+                [(job_id, i) + tuple(getattr(part, column) for column in PART_COLUMNS)
+                 for i, part in enumerate(job.parts)])
+            cursor.executemany(
+                'INSERT INTO routing_tasks VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(job_id, i, j, task.department, task.operation, task.hours, task.notes)
+                 for i, part in enumerate(job.parts)
+                 for j, task in enumerate(part.tasks)])
+            cursor.executemany(
+                'INSERT INTO checklist VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, i, item.task, int(item.done), item.employee,
+                  item.date.isoformat() if item.date else None)
+                 for i, item in enumerate(job.checklist)])
+            cursor.executemany(
+                'INSERT INTO materials VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, i, line.material, line.part, line.status, line.quantity)
+                 for i, line in enumerate(job.materials)])
+        return job_id
+
+    def load_job(self, number):
+        '''Returns the erp_model.Job saved under this job number, or None'''
+        cursor = self.connection.cursor()
+        row = cursor.execute('SELECT id, {} FROM jobs WHERE number=?'.format(', '.join(JOB_COLUMNS)),
+                             (number,)).fetchone()
+        if row is None:
+            return None
+        job_id = row[0]
+        job = erp_model.Job(*row[1:])
+
+        job.parts = [erp_model.Part(*row) for row in cursor.execute(
+            'SELECT {} FROM parts WHERE job_id=? ORDER BY position'.format(', '.join(PART_COLUMNS)),
+            (job_id,))]
+        parts = job.parts
+        for part_position, department, operation, hours, notes in cursor.execute(
+                'SELECT part_position, {} FROM routing_tasks WHERE job_id=? '
+                'ORDER BY part_position, position'.format(', '.join(TASK_COLUMNS)), (job_id,)):
+            parts[part_position].tasks.append(erp_model.Routing_Task(department, operation, hours, notes))
+
+        checklist = [erp_model.Checklist_Item(task, bool(done), employee,
+                                              datetime.date.fromisoformat(date) if date else None)
+                     for task, done, employee, date in cursor.execute(
+                         'SELECT task, done, employee, date FROM checklist WHERE job_id=? '
+                         'ORDER BY position', (job_id,))]
+        if checklist:
+            job.checklist = checklist
+
+        job.materials = [erp_model.Material_Line(*row) for row in cursor.execute(
+            'SELECT {} FROM materials WHERE job_id=? ORDER BY position'.format(', '.join(MATERIAL_COLUMNS)),
+            (job_id,))]
+        return job
+
+    def load_open_jobs(self, exclude=None, closed_statuses=CLOSED_STATUSES, materials=False):
+        '''Returns every job that is not closed, with its parts and routing tasks only
+        (no checklist, material lines with materials=True), for the scheduler and the
+        material planning. One query per table for all the jobs, the rows of the closed jobs
+        are not read: the primary keys are searched for the open job ids only'''
+        cursor = self.connection.cursor()
+        where = 'number IS NOT ? AND (status IS NULL OR status NOT IN ({}))'.format(
+            ', '.join('?' * len(closed_statuses)))
+        parameters = (exclude,) + tuple(closed_statuses)
+        open_ids = 'job_id IN (SELECT id FROM jobs WHERE {})'.format(where)
+
+        jobs = {}
+        for row in cursor.execute('SELECT id, {} FROM jobs WHERE {}'.format(', '.join(JOB_COLUMNS), where),
+                                  parameters):
+            jobs[row[0]] = erp_model.Job(*row[1:])
+        for row in cursor.execute('SELECT job_id, {} FROM parts WHERE {} ORDER BY job_id, position'.format(
+                ', '.join(PART_COLUMNS), open_ids), parameters):
+            jobs[row[0]].parts.append(erp_model.Part(*row[1:]))
+        for job_id, part_position, department, operation, hours, notes in cursor.execute(
+                'SELECT job_id, part_position, {} FROM routing_tasks WHERE {} '
+                'ORDER BY job_id, part_position, position'.format(', '.join(TASK_COLUMNS), open_ids), parameters):
+            jobs[job_id].parts[part_position].tasks.append(erp_model.Routing_Task(department, operation, hours, notes))
+        if materials:
+            for row in cursor.execute('SELECT job_id, {} FROM materials WHERE {} ORDER BY job_id, position'.format(
+                    ', '.join(MATERIAL_COLUMNS), open_ids), parameters):
+                jobs[row[0]].materials.append(erp_model.Material_Line(*row[1:]))
+        return list(jobs.values())
+
+    def load_stock(self):
+        '''{material: (on hand, on order)}'''
+        return {material: (on_hand or 0.0, on_order or 0.0) for material, on_hand, on_order in
+                self.connection.execute('SELECT material, on_hand, on_order FROM stock')}
+
+    def save_stock(self, stock):
+        '''Writes the quantities of the materials in stock, {material: (on hand, on order)}'''
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO stock VALUES (?, ?, ?) ON CONFLICT(material) DO UPDATE SET '
+                'on_hand=excluded.on_hand, on_order=excluded.on_order',
+                [(material, on_hand, on_order) for material, (on_hand, on_order) in stock.items()])
+
+    def list_jobs(self, client=None, status=None):
+        '''Returns (number, description, client, status) of the saved jobs, optionally filtered'''
+        query = 'SELECT number, description, client, status FROM jobs'
+        conditions, parameters = [], []
+        if client is not None:
+            conditions.append('client=?')
+            parameters.append(client)
+        if status is not None:
+            conditions.append('status=?')
+            parameters.append(status)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        return self.connection.execute(query + ' ORDER BY number', parameters).fetchall()
+
+    def find_parts(self, number):
+        '''Returns (job number, part position) for every saved part with this part number'''
+        return self.connection.execute(
+            'SELECT jobs.number, parts.position FROM parts JOIN jobs ON jobs.id = parts.job_id '
+            'WHERE parts.number=?', (number,)).fetchall()
@@ -0,0 +1,147 @@
+'''
+Append-only audit log of the changes to jobs: checklist items, statuses and routings.
+
+Every change is one JSON line in EVENT_LOG_FILE:
+    {"seq": 12, "time": "2026-10-18T09:12:03", "kind": "checklist", "job": "J-101",
+     "key": "Purchase", "value": [true, "Bob", "2026-10-18"]}
+A change of many keys at once (a template applied to many parts) is a single event
+with "keys" instead of "key".
+
+The current state, {kind: {job: {key: value}}}, is kept in memory. Every
+SNAPSHOT_EVERY events it is written to SNAPSHOT_FILE with the byte offset of the log
+at that point, in a background thread. At startup, the snapshot is read and only the
+events after its offset are replayed, so the load time does not grow with the history.
+
+A line that cannot be read is skipped and left in the file. Only a last line without
+its newline, cut by a crash, is removed so the next event starts a line.
+'''
+
+import collections
+import concurrent.futures
+import datetime
+import json
+import os
+
+EVENT_LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events.jsonl')
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'events-snapshot.json')
+SNAPSHOT_EVERY = 10000  #events between two snapshots
+
+
+def apply(state, event):
+    '''Applies one event to the state'''
+    values = state.setdefault(event['kind'], {}).setdefault(event['job'], {})
+    if 'keys' in event:
+        for key in event['keys']:
+            values[key] = event['value']
+    else:
+        values[event['key']] = event['value']
+
+
+class Event_Log():
+    def __init__(self, path=EVENT_LOG_FILE, snapshot_path=SNAPSHOT_FILE, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.state = {}
+        self.seq = 0
+        self.since_snapshot = 0  #events replayed or recorded since the last snapshot
+        self.skipped = 0  #unreadable lines skipped by load()
+        self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)  #writes the snapshots in order
+        self.load()
+        self.file = open(path, 'ab')
+
+    def load(self):
+        '''Rebuilds the state from the snapshot and the events written after it'''
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.state, self.seq, offset = snapshot['state'], snapshot['seq'], snapshot['offset']
+        if not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if offset > size:  #the log was replaced or cut after the snapshot, replayed from the start
+            self.state, self.seq, offset = {}, 0, 0
+        end = offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                end += len(line)
+                try:
+                    event = json.loads(line)
+                    apply(self.state, event)
+                    self.seq = event['seq']
+                except (ValueError, KeyError, TypeError):
+                    self.skipped += 1
+                    continue
+                self.since_snapshot += 1
+        if end < size:  #last line cut by a crash
+            os.truncate(self.path, end)
+
+    def get(self, kind, job, key, default=None):
+        return self.state.get(kind, {}).get(job, {}).get(key, default)
+
+    def record(self, kind, job, key=None, value=None, keys=None):
+        '''Appends an event and applies it to the state. Returns the event'''
+        self.seq += 1
+        event = {'seq': self.seq, 'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'kind': kind, 'job': job}
+        if keys is not None:
+            event['keys'] = list(keys)
+        else:
+            event['key'] = key
+        event['value'] = value
+        self.file.write(json.dumps(event, separators=(',', ':')).encode('utf-8') + b'\n')
+        self.file.flush()
+        apply(self.state, json.loads(json.dumps(event)))  #values as they will be read back, lists not tuples
+        self.since_snapshot += 1
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return event
+
+    def record_change(self, kind, job, key, value, default=None):
+        '''Records the value only if it differs from the current state, default when the key
+        has no state yet. Returns the event or None'''
+        if self.get(kind, job, key, default) == json.loads(json.dumps(value)):
+            return None
+        return self.record(kind, job, key, value)
+
+    def snapshot(self):
+        '''Writes the state and the current end of the log in the background, returns a Future.
+        The events replace the values, never change them in place, so copying the
+        dictionaries is enough to keep the state being written from changing'''
+        self.file.flush()
+        state = {kind: {job: dict(values) for job, values in jobs.items()} for kind, jobs in self.state.items()}
+        self.since_snapshot = 0
+        return self.writer.submit(self.write_snapshot, state, self.seq, self.file.tell())
+
+    def write_snapshot(self, state, seq, offset):
+        temporary = self.snapshot_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'seq': seq, 'offset': offset, 'state': state}, f, separators=(',', ':'))
+        os.replace(temporary, self.snapshot_path)
+
+    def history(self, job=None, kinds=None):
+        '''Events of a job (every job if None), oldest first, streamed from the whole log.
+        Can run in another thread, record() flushes every event'''
+        marker = '"job":{}'.format(json.dumps(job)).encode('utf-8') if job is not None else b''
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if marker in line:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:  #skipped by load() too, or being written
+                        continue
+                    if (job is None or event['job'] == job) and (kinds is None or event['kind'] in kinds):
+                        yield event
+
+    def last(self, job=None, count=1000, kinds=None):
+        '''The count most recent events of a job, oldest first'''
+        return list(collections.deque(self.history(job, kinds), maxlen=count))
+
+    def close(self):
+        '''Waits for the snapshot being written'''
+        self.writer.shutdown()
+        self.file.close()
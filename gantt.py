@@ -0,0 +1,153 @@
+'''
+Gantt chart of a scheduler.Schedule, as a self-contained HTML page with an inline SVG.
+
+The page is written row by row to the file, it is never built in memory. Up to
+DETAIL_LIMIT operations, there is one row per part with a bar per operation.
+Past that, there is one lane per machine, and the bookings of a machine closer than
+one pixel are merged into one bar, so the file size depends on the chart width and
+the number of machines, not on the number of operations.
+'''
+
+import datetime
+import html
+import os
+import pathlib
+import webbrowser
+
+import scheduler
+
+DETAIL_LIMIT = 10000  #operations, above this the chart shows machine lanes
+ROW_HEIGHT = 18
+LABEL_WIDTH = 220
+AXIS_HEIGHT = 30
+DAY_WIDTH = 24  #pixels per day, reduced for long schedules
+MAX_WIDTH = 4000  #pixels of the time axis
+COLORS = ['#0F4563', '#E07B39', '#4E9A06', '#8F5902', '#75507B', '#C4A000',
+          '#CC0000', '#3465A4', '#555753', '#06989A']
+
+PAGE_HEADER = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; font-size: 12px; margin: 10px; }}
+svg text {{ font-size: 11px; }}
+.grid {{ stroke: #dddddd; }}
+.late {{ fill: #CC0000; }}
+</style></head><body>
+<h2>{title}</h2>
+<p>{subtitle}</p>
+<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}">
+'''
+PAGE_FOOTER = '</svg>\n</body></html>\n'
+
+
+class Time_Axis():
+    '''Converts scheduler times to x pixels'''
+    def __init__(self, start, end):
+        self.start = scheduler.to_time(scheduler.to_datetime(start).date())  #midnight of the first day
+        days = max(1, int((end - self.start) // 24) + 1)
+        self.day_width = min(DAY_WIDTH, MAX_WIDTH / days)
+        self.days = days
+        self.width = days * self.day_width
+
+    def x(self, time):
+        return LABEL_WIDTH + (time - self.start) / 24.0 * self.day_width
+
+    def write(self, f, height):
+        '''Vertical line and date label every week, or every month when the days are narrow'''
+        first = scheduler.to_datetime(self.start).date()
+        step = 7 if self.day_width >= 4 else 30
+        for day in range(0, self.days, step):
+            x = LABEL_WIDTH + day * self.day_width
+            f.write('<line class="grid" x1="{0:.1f}" y1="{1}" x2="{0:.1f}" y2="{2}"/>'
+                    '<text x="{3:.1f}" y="{4}">{5}</text>\n'.format(
+                        x, AXIS_HEIGHT - 5, height, x + 2, AXIS_HEIGHT - 10,
+                        first + datetime.timedelta(days=day)))
+
+
+def machine_colors(bookings):
+    machines = sorted({booking.machine for booking in bookings})
+    return {machine: COLORS[i % len(COLORS)] for i, machine in enumerate(machines)}
+
+
+def write_gantt(schedule, path, jobs=None, title='Gantt Chart'):
+    '''Writes the chart of the schedule to path. jobs limits the chart to these job numbers.
+    Returns the path'''
+    if jobs is not None:
+        jobs = set(jobs)
+        bookings = [booking for booking in schedule.bookings if schedule.routes[booking.route].job in jobs]
+    else:
+        bookings = schedule.bookings
+    end = max([booking.end for booking in bookings], default=schedule.start)
+    axis = Time_Axis(schedule.start, end)
+    colors = machine_colors(bookings)
+    temporary = path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        if len(bookings) <= DETAIL_LIMIT:
+            write_part_rows(f, schedule, bookings, axis, colors, title)
+        else:
+            write_machine_lanes(f, schedule, bookings, axis, colors, title)
+        f.write(PAGE_FOOTER)
+    os.replace(temporary, path)
+    return path
+
+
+def write_header(f, axis, rows, title, subtitle):
+    height = AXIS_HEIGHT + rows * ROW_HEIGHT
+    f.write(PAGE_HEADER.format(title=html.escape(title), subtitle=html.escape(subtitle),
+                               width=int(LABEL_WIDTH + axis.width + 10), height=height))
+    axis.write(f, height)
+
+
+def write_part_rows(f, schedule, bookings, axis, colors, title):
+    '''One row per part, a bar per operation, red label when the part is late'''
+    by_route = {}
+    for booking in bookings:
+        by_route.setdefault(booking.route, []).append(booking)
+    write_header(f, axis, len(by_route), title, '{} parts, {} operations'.format(len(by_route), len(bookings)))
+    for row, index in enumerate(sorted(by_route, key=lambda index: (schedule.routes[index].job, index))):
+        route = schedule.routes[index]
+        y = AXIS_HEIGHT + row * ROW_HEIGHT
+        late = ' class="late"' if schedule.part_end[index] > route.due else ''
+        f.write('<g><text x="2" y="{}"{}>{}</text>'.format(
+            y + ROW_HEIGHT - 5, late, html.escape('{} / {}'.format(route.job, route.part))[:40]))
+        for booking in by_route[index]:
+            x = axis.x(booking.start)
+            f.write('<rect x="{:.1f}" y="{}" width="{:.1f}" height="{}" fill="{}"><title>{}</title></rect>'.format(
+                x, y + 2, max(axis.x(booking.end) - x, 1.0), ROW_HEIGHT - 4, colors[booking.machine],
+                html.escape('{} {:%Y-%m-%d %H:%M} - {:%Y-%m-%d %H:%M}'.format(
+                    booking.machine, scheduler.to_datetime(booking.start), scheduler.to_datetime(booking.end)))))
+        f.write('</g>\n')
+
+
+def write_machine_lanes(f, schedule, bookings, axis, colors, title):
+    '''One lane per machine, bookings less than a pixel apart are drawn as one bar'''
+    by_machine = {}
+    for booking in bookings:
+        by_machine.setdefault(booking.machine, []).append((booking.start, booking.end))
+    write_header(f, axis, len(by_machine), title,
+                 '{} operations on {} machines'.format(len(bookings), len(by_machine)))
+    pixel = 24.0 / axis.day_width  #hours in one pixel
+    for row, machine in enumerate(sorted(by_machine)):
+        y = AXIS_HEIGHT + row * ROW_HEIGHT
+        intervals = sorted(by_machine[machine])
+        f.write('<g fill="{}"><text x="2" y="{}" fill="black">{} ({})</text>'.format(
+            colors[machine], y + ROW_HEIGHT - 5, html.escape(machine), len(intervals)))
+        start, end = intervals[0]
+        for next_start, next_end in intervals[1:]:
+            if next_start - end > pixel:
+                write_bar(f, axis, start, end, y)
+                start = next_start
+            end = max(end, next_end)
+        write_bar(f, axis, start, end, y)
+        f.write('</g>\n')
+
+
+def write_bar(f, axis, start, end, y):
+    x = axis.x(start)
+    f.write('<rect x="{:.1f}" y="{}" width="{:.1f}" height="{}"/>'.format(
+        x, y + 2, max(axis.x(end) - x, 1.0), ROW_HEIGHT - 4))
+
+
+def open_gantt(path):
+    '''Opens the chart in the default web browser, on any platform'''
+    webbrowser.open(pathlib.Path(path).resolve().as_uri())
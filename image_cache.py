@@ -0,0 +1,191 @@
+'''
+Process wide cache for the drawings and logos shown by the GUI.
+
+Images are keyed by path, modification time, file size and display size, so a
+drawing used by hundreds of parts is decoded once. Three levels:
+- an in memory LRU of PhotoImage objects, limited by a byte budget
+- thumbnails saved on disk in THUMBNAIL_FOLDER, so the original file is only decoded once
+- JPEG files are decoded in PIL draft mode, at the smallest scale larger than the display size
+
+Image_Loader decodes in a thread pool so a large drawing never blocks the Tk mainloop.
+'''
+
+import collections
+import concurrent.futures
+import hashlib
+import itertools
+import os
+import queue
+import tkinter as tk
+
+import lazy_imports
+
+#PIL is only imported when a drawing is decoded, usually by a worker thread
+Image = lazy_imports.lazy('PIL.Image')
+ImageTk = lazy_imports.lazy('PIL.ImageTk')
+
+TK_FORMATS = ('.png', '.gif', '.ppm', '.pgm')  #read by tk.PhotoImage without PIL
+THUMBNAIL_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.thumbnails')
+MEMORY_BUDGET = 32 * 1024 * 1024  #bytes of decoded pixels kept in memory
+DECODE_WORKERS = 2
+
+
+def image_key(path, size=None):
+    '''(path, mtime, file size, display size), a modified file gets a new key'''
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, size)
+
+
+def thumbnail_path(key):
+    name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+    return os.path.join(THUMBNAIL_FOLDER, name + '.png')
+
+
+def decode(path, size=None):
+    '''Opens the image resized to size. JPEG files are decoded at reduced scale with draft mode'''
+    img = Image.open(path)
+    if size is not None:
+        img.draft('RGB', size)
+        img = img.resize(size)
+    img.load()
+    return img
+
+
+def load_thumbnail(path, size, key=None):
+    '''PIL image of path at size, read from the disk cache or decoded and saved to it'''
+    if size is None:
+        return decode(path)
+    cached = thumbnail_path(key or image_key(path, size))
+    if os.path.exists(cached):
+        try:
+            img = Image.open(cached)
+            img.load()
+            return img
+        except OSError:
+            pass
+    img = decode(path, size)
+    try:
+        os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+        temporary = cached + '.{}.tmp'.format(os.getpid())
+        img.save(temporary, 'PNG')
+        os.replace(temporary, cached)
+    except OSError:
+        pass
+    return img
+
+
+class Image_Cache():
+    '''LRU of PhotoImage objects, the least recently used are dropped past the byte budget.
+    The widgets keep a reference to the PhotoImage they display, so dropping it is safe'''
+
+    def __init__(self, budget=MEMORY_BUDGET):
+        self.budget = budget
+        self.used = 0
+        self.images = collections.OrderedDict()  #key: (PhotoImage, bytes)
+
+    def get(self, path, size=None):
+        '''Returns a PhotoImage of path, resized to size (width, height) if given'''
+        key = image_key(path, size)
+        if key in self.images:
+            self.images.move_to_end(key)
+            return self.images[key][0]
+        if size is None and os.path.splitext(path)[1].lower() in TK_FORMATS:
+            return self.keep(key, tk.PhotoImage(file=path))
+        return self.add(key, load_thumbnail(path, size, key))
+
+    def add(self, key, img):
+        '''Converts a decoded PIL image to a PhotoImage and keeps it in the cache'''
+        return self.keep(key, ImageTk.PhotoImage(img))
+
+    def keep(self, key, photo):
+        nbytes = photo.width() * photo.height() * 4
+        self.images[key] = (photo, nbytes)
+        self.used += nbytes
+        while self.used > self.budget and len(self.images) > 1:
+            old_key, (old_photo, old_bytes) = self.images.popitem(last=False)
+            self.used -= old_bytes
+        return photo
+
+    def clear(self):
+        self.images.clear()
+        self.used = 0
+
+    def placeholder(self, size):
+        '''Grey image shown while a drawing is decoded'''
+        key = ('placeholder', size)
+        if key not in self.images:
+            photo = tk.PhotoImage(width=size[0], height=size[1])
+            photo.put('lightgrey', to=(0, 0, size[0], size[1]))
+            return self.keep(key, photo)
+        return self.images[key][0]
+
+
+class Image_Loader():
+    '''Decodes images in a thread pool.
+    Finished images are put on a queue; poll() must be called from the Tk thread (with after())
+    to create the PhotoImage objects and call back the widgets. Requests for an image that is
+    already being decoded share the same decode'''
+
+    def __init__(self, image_cache, workers=DECODE_WORKERS):
+        self.cache = image_cache
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.completed = queue.Queue()
+        self.tickets = itertools.count()
+        self.requests = {}  #ticket: (key, callback)
+        self.pending = {}  #key: future
+
+    def request(self, path, size, callback):
+        '''callback(photo) is called from poll() once the image is ready.
+        Returns a ticket for cancel(), or None if the image was cached and callback already called'''
+        key = image_key(path, size)
+        if key in self.cache.images:
+            callback(self.cache.get(path, size))
+            return None
+        ticket = next(self.tickets)
+        self.requests[ticket] = (key, callback)
+        if key not in self.pending:
+            future = self.executor.submit(load_thumbnail, path, size, key)
+            future.add_done_callback(lambda future, key=key: self.completed.put((key, future)))
+            self.pending[key] = future
+        return ticket
+
+    def cancel(self, ticket):
+        '''Drops a request, the decode is cancelled if it has not started and nobody else waits for it'''
+        key, callback = self.requests.pop(ticket, (None, None))
+        if key is not None and not any(k == key for k, c in self.requests.values()):
+            future = self.pending.pop(key, None)
+            if future is not None:
+                future.cancel()
+
+    def poll(self):
+        '''Hands the finished images to their callbacks, call from the Tk thread'''
+        while True:
+            try:
+                key, future = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            if self.pending.get(key) is future:
+                del self.pending[key]
+            if future.cancelled():
+                continue
+            waiting = [ticket for ticket, (k, callback) in self.requests.items() if k == key]
+            if not waiting or future.exception() is not None:
+                for ticket in waiting:
+                    del self.requests[ticket]
+                continue
+            if key in self.cache.images:
+                self.cache.images.move_to_end(key)
+                photo = self.cache.images[key][0]
+            else:
+                photo = self.cache.add(key, future.result())
+            for ticket in waiting:
+                key, callback = self.requests.pop(ticket)
+                callback(photo)
+
+
+cache = Image_Cache()
+loader = Image_Loader(cache)
+
+
+def get_photo(path, size=None):
+    return cache.get(path, size)
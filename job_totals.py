@@ -0,0 +1,93 @@
+'''
+Incremental recalculation of the values derived from the routings: part hours and cost,
+job hours and cost, and everything the views show from them.
+
+An edit marks its part dirty. recompute() only recosts the dirty parts, adjusts the job
+totals by the difference, and notifies the views with the parts that actually changed.
+The GUI debounces the calls to recompute(), so a burst of edits is recalculated once.
+
+A part changed when its totals or its inputs changed: number, quantity, material and
+routing operations. The schedule and the material planning use the inputs, two
+operations at the same rate have the same cost but not the same machine. An edit of
+the job number or delivery date notifies the views with no part.
+'''
+
+import costing
+
+
+def part_inputs(part):
+    '''Values of a part used by the views that depend on the totals'''
+    return (part.number, part.quantity, part.material, part.material_usage,
+            tuple((task.operation, task.hours) for task in part.tasks))
+
+
+def job_inputs(job):
+    return (job.number, job.delivery_date)
+
+
+class Job_Totals():
+    def __init__(self, job, rates=None, views=None):
+        self.job = job
+        self.rates = rates or costing.Rates()
+        self.views = views or []  #view(changed_parts, removed_parts), called after every recompute
+        self.dirty = {}  #id(part): part
+        self.inputs = {}  #id(part): part_inputs(part) at the last recompute
+        self.recompute_all()
+
+    def recompute_all(self):
+        '''Full vectorized calculation, used when a job is loaded or material lines change'''
+        self.line_costs = costing.line_costs(self.job, self.rates)
+        if self.job.parts:
+            result = costing.cost_job(self.job, self.rates)
+            result.apply(self.job)
+            self.job_hours = result.job_hours
+            self.job_cost = result.job_cost
+        else:  #new job at startup, numpy is not imported yet
+            self.job_hours = 0.0
+            self.job_cost = self.job.cost = 0.0
+        self.totals = {id(part): (part.hours, part.cost, part.price) for part in self.job.parts}
+        self.inputs = {id(part): part_inputs(part) for part in self.job.parts}
+        self.job_inputs = job_inputs(self.job)
+        self.dirty.clear()
+        self.notify(list(self.job.parts), [])
+
+    def mark_dirty(self, part):
+        self.dirty[id(part)] = part
+
+    def remove_part(self, part):
+        '''The part was removed from the job, its totals are subtracted from the job totals'''
+        self.dirty.pop(id(part), None)
+        hours, cost, price = self.totals.pop(id(part), (0.0, 0.0, 0.0))
+        self.inputs.pop(id(part), None)
+        self.job_hours -= hours
+        self.job_cost -= cost
+        self.job.cost = self.job_cost
+        self.notify([], [part])
+
+    def recompute(self):
+        '''Recosts the dirty parts only. Returns the parts whose totals, price or inputs changed'''
+        changed = []
+        for key, part in self.dirty.items():
+            hours, cost = costing.cost_part(part, self.rates, self.line_costs.get(part.number, 0.0))
+            part.hours = hours
+            part.cost = cost
+            old = self.totals.get(key)
+            old_hours, old_cost, old_price = old or (0.0, 0.0, 0.0)
+            inputs = part_inputs(part)
+            if old != (hours, cost, part.price) or self.inputs.get(key) != inputs:
+                self.totals[key] = (hours, cost, part.price)
+                self.inputs[key] = inputs
+                self.job_hours += hours - old_hours
+                self.job_cost += cost - old_cost
+                changed.append(part)
+        self.dirty.clear()
+        inputs = job_inputs(self.job)
+        if changed or inputs != self.job_inputs:
+            self.job_inputs = inputs
+            self.job.cost = self.job_cost
+            self.notify(changed, [])
+        return changed
+
+    def notify(self, changed, removed):
+        for view in self.views:
+            view(changed, removed)
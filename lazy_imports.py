@@ -0,0 +1,90 @@
+'''
+Deferred imports for the heavy modules (matplotlib, numpy, pandas, reportlab...).
+
+lazy('numpy') returns a stand-in that imports the module on first attribute access.
+warm_up() imports modules in a background thread once the window is shown, so the
+first click on a chart or report button does not pay for the import.
+
+Every deferred import and every startup mark() is timed, run the application with
+--startup-report to print them, like python -X importtime.
+'''
+
+import importlib
+import sys
+import threading
+import time
+
+START_TIME = time.perf_counter()
+
+_lock = threading.RLock()
+import_times = []  #(module name, seconds, thread name)
+marks = []  #(label, seconds since START_TIME)
+
+
+def load(name):
+    '''Imports the module now and records the import time if it was not imported yet.
+    If another thread is importing it, waits until that import is finished'''
+    already_loaded = is_loaded(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        with _lock:
+            import_times.append((name, time.perf_counter() - start, threading.current_thread().name))
+    return module
+
+
+def is_loaded(name):
+    '''True once the module is completely imported (not while another thread is importing it)'''
+    module = sys.modules.get(name)
+    spec = getattr(module, '__spec__', None)
+    return module is not None and not getattr(spec, '_initializing', False)
+
+
+class Lazy_Module():
+    '''Stand-in for a module, the import happens on first attribute access'''
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self.__dict__['_module'] = load(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        return '<lazy module {}>'.format(self._name)
+
+
+def lazy(name):
+    return Lazy_Module(name)
+
+
+def warm_up(names, callback=None):
+    '''Imports the modules in a daemon thread. callback() is called from that thread when done'''
+    def run():
+        for name in names:
+            try:
+                load(name)
+            except ImportError:
+                pass
+        if callback is not None:
+            callback()
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def mark(label):
+    '''Records the time elapsed since the application started'''
+    marks.append((label, time.perf_counter() - START_TIME))
+
+
+def startup_report():
+    '''Text report of the startup marks and of every deferred import'''
+    lines = ['startup (ms since launch)']
+    for label, seconds in marks:
+        lines.append('  {:>8.1f}  {}'.format(seconds * 1000, label))
+    lines.append('deferred imports (ms, thread)')
+    for name, seconds, thread in sorted(import_times, key=lambda item: -item[1]):
+        lines.append('  {:>8.1f}  {:<40} {}'.format(seconds * 1000, name, thread))
+    return '\n'.join(lines)
@@ -0,0 +1,124 @@
+'''
+Material requirements planning: the raw material needed by the open jobs, netted
+against the stock on hand and on order.
+
+The demand is exploded into columns, one entry per need:
+- each part uses quantity x material_usage of its material
+- each material line of a job, unless its status is Received (the material is
+  already there for that job)
+Then numpy reduces it per material: the total requirement, and an allocation of the
+stock to the needs in delivery date order, so a need is short when the stock runs
+out before its turn. The short needs of a job are its "What's Missing?" list.
+'''
+
+import lazy_imports
+import scheduler
+
+np = lazy_imports.lazy('numpy')
+
+
+class Demand():
+    '''Exploded material demand, as parallel lists. Cheap copy of the model,
+    so the planning can run in another thread'''
+    def __init__(self):
+        self.jobs = []
+        self.parts = []
+        self.materials = []
+        self.quantities = []
+        self.dues = []
+
+    def __len__(self):
+        return len(self.materials)
+
+    def add(self, job, part, material, quantity, due):
+        self.jobs.append(job)
+        self.parts.append(part)
+        self.materials.append(material)
+        self.quantities.append(quantity)
+        self.dues.append(due)
+
+    def extend(self, other):
+        for name in ('jobs', 'parts', 'materials', 'quantities', 'dues'):
+            getattr(self, name).extend(getattr(other, name))
+
+
+def explode(jobs):
+    '''Demand of the parts and of the material lines of the jobs'''
+    demand = Demand()
+    for job in jobs:
+        due = scheduler.due_time(job.delivery_date)
+        for part in job.parts:
+            material = part.material.strip()
+            quantity = part.quantity * part.material_usage
+            if material and quantity > 0:
+                demand.add(job.number, part.number, material, quantity, due)
+        for line in job.materials:
+            if line.status != 'Received' and line.quantity > 0:
+                demand.add(job.number, line.part, line.material.strip(), line.quantity, due)
+    return demand
+
+
+def allocate(codes, quantity, due, supply):
+    '''Quantity of each need that the supply of its material does not cover, the
+    earliest due needs of a material are served first'''
+    order = np.lexsort((due, codes))
+    codes_sorted = codes[order]
+    quantity_sorted = quantity[order]
+    total = np.cumsum(quantity_sorted)
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = codes_sorted[1:] != codes_sorted[:-1]
+    before_group = np.maximum.accumulate(np.where(first, total - quantity_sorted, 0.0))
+    needed = total - before_group  #demand of the material up to and including this need
+    short = np.empty(len(order))
+    short[order] = np.clip(needed - supply[codes_sorted], 0.0, quantity_sorted)
+    return short
+
+
+class Requirements():
+    '''Result of plan(). Per material: required, on_hand, on_order and missing arrays,
+    indexed like materials. Per need of the demand: short'''
+    def __init__(self, demand, stock):
+        self.demand = demand
+        self.materials = sorted(set(demand.materials) | set(stock))
+        index = {material: i for i, material in enumerate(self.materials)}
+        codes = np.fromiter((index[material] for material in demand.materials), dtype=np.int64,
+                            count=len(demand))
+        quantity = np.array(demand.quantities, dtype=np.float64)
+        due = np.array(demand.dues, dtype=np.float64)
+
+        levels = [stock.get(material, (0.0, 0.0)) for material in self.materials]
+        self.on_hand = np.array([on_hand for on_hand, on_order in levels], dtype=np.float64)
+        self.on_order = np.array([on_order for on_hand, on_order in levels], dtype=np.float64)
+        self.required = np.bincount(codes, weights=quantity, minlength=len(self.materials))
+        self.missing = np.maximum(self.required - self.on_hand - self.on_order, 0.0)
+        self.short = allocate(codes, quantity, due, self.on_hand + self.on_order)
+
+    def summary(self):
+        '''[(material, required, on hand, on order, missing)] of every material'''
+        return list(zip(self.materials, self.required.tolist(), self.on_hand.tolist(),
+                        self.on_order.tolist(), self.missing.tolist()))
+
+    def missing_materials(self):
+        '''Summary of the materials short across all the jobs, most missing first'''
+        summary = self.summary()
+        order = np.argsort(-self.missing, kind='stable')
+        return [summary[i] for i in order[self.missing[order] > 0].tolist()]
+
+    def job_shortages(self, job):
+        '''[(part, material, quantity, short)] of the needs of a job that the stock does
+        not cover, the "What's Missing?" list'''
+        demand = self.demand
+        return [(demand.parts[i], demand.materials[i], demand.quantities[i], float(self.short[i]))
+                for i in np.flatnonzero(self.short > 0).tolist() if demand.jobs[i] == job]
+
+
+def plan(demands, stock):
+    '''Requirements of the demands (a Demand or a list of them), stock is
+    {material: (on hand, on order)}'''
+    if isinstance(demands, Demand):
+        demand = demands
+    else:
+        demand = Demand()
+        for other in demands:
+            demand.extend(other)
+    return Requirements(demand, stock)
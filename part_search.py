@@ -0,0 +1,88 @@
+'''
+Type-ahead search over the parts of a job: part number, description, material and
+drawing number, case insensitive.
+
+- Prefix: the part numbers are kept sorted, bisect finds the range of the numbers
+  starting with the query. These matches come first, in part number order.
+- Substring: the searchable text of every part is joined into one string and
+  scanned with str.find, which runs in C. A match jumps to the next part, and the
+  scan stops at the result limit.
+- Narrowing: when the query extends the previous one and the previous results were
+  complete, only those parts are checked.
+
+The index is rebuilt on the first search after invalidate(), which takes about 0.1 s
+for 100k parts.
+'''
+
+import bisect
+import itertools
+
+FIELDS = ('number', 'description', 'material', 'drawing_number')
+MAX_RESULTS = 1000  #parts returned by a search, the list shows the first ones
+
+
+class Part_Search():
+    '''Search index over a list of erp_model.Part, the list is read when the index is built'''
+    def __init__(self, parts):
+        self.parts = parts
+        self.built = False
+        self.last = None  #(query, positions) of the last complete search, for narrowing
+
+    def invalidate(self):
+        '''Parts were added, removed or edited'''
+        self.built = False
+        self.last = None
+
+    def bind_parts(self, parts):
+        self.parts = parts
+        self.invalidate()
+
+    def build(self):
+        self.texts = ['\t'.join(getattr(part, field) for field in FIELDS).lower() for part in self.parts]
+        self.text = '\n'.join(self.texts)
+        self.starts = [0] + list(itertools.accumulate(len(text) + 1 for text in self.texts))
+        keys = sorted((part.number.lower(), i) for i, part in enumerate(self.parts))
+        self.numbers = [number for number, i in keys]
+        self.number_positions = [i for number, i in keys]
+        self.built = True
+
+    def prefix(self, query, limit):
+        '''Positions of the parts whose number starts with query, in part number order, at most limit'''
+        low = bisect.bisect_left(self.numbers, query)
+        high = bisect.bisect_left(self.numbers, query + '\uffff', low)
+        return self.number_positions[low:min(high, low + limit)]
+
+    def substring(self, query, limit):
+        '''Positions of the parts containing query, in part order, at most limit'''
+        positions = []
+        text, starts = self.text, self.starts
+        found = text.find(query)
+        while found != -1 and len(positions) < limit:
+            i = bisect.bisect_right(starts, found) - 1
+            positions.append(i)
+            found = text.find(query, starts[i + 1])
+        return positions
+
+    def search(self, query, limit=MAX_RESULTS):
+        '''Positions in parts of the matching parts, prefix matches of the part number first.
+        Returns (positions, complete), complete is False when the results were cut at limit.
+        An empty query returns every part, without building the index'''
+        query = query.strip().lower()
+        if not query:  #every part, in part order
+            return list(range(len(self.parts))), True
+        if not self.built:
+            self.build()
+
+        if self.last is not None and query.startswith(self.last[0]):
+            texts = self.texts
+            matches = sorted(i for i in self.last[1] if query in texts[i])
+        else:
+            matches = self.substring(query, limit + 1)
+        complete = len(matches) <= limit
+        if complete:
+            self.last = (query, matches)
+
+        first = self.prefix(query, limit)
+        in_first = set(first)
+        positions = first + [i for i in matches if i not in in_first][:limit - len(first)]
+        return positions, complete
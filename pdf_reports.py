@@ -1,17 +1,120 @@
+'''
+PDF reports of a job: price quotation and order confirmation.
+
+The report classes only write the PDF, to a file name or to a file object. The
+batch functions render many jobs in a process pool and return the paths, or the
+bytes of the documents, so a month-end run uses every core and the GUI never waits
+on reportlab. Nothing here opens a viewer.
+
+Rendered reports are cached in CACHE_FOLDER, named by a hash of everything they show,
+so the same report of an unchanged job is copied instead of rendered again. The style
+sheet and the decoded logo are shared by every document of a process.
+
+Routing sheets of large jobs are rendered in chunks of parts in the process pool and
+merged with pypdf when it is installed, otherwise in a single document by one process.
+
+A worker process keeps the drawing store index it read when it started, so the drawings
+are resolved in the parent by report_snapshot(), and the cache key is computed there too.
+'''
+
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.pdfgen import canvas
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Image
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.units import inch, mm
+from reportlab.lib.utils import ImageReader
+from xml.sax.saxutils import escape
+import concurrent.futures
+import datetime
+import functools
+import hashlib
+import io
 import os
+import shutil
+
+import drawing_store
+import erp_model
+import image_cache
+import task_runner
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+LOGO_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'img', 'logo.png')
+DATE_FORMAT = '%d/%m/%Y'
+CACHE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.report_cache')
+CACHE_SIZE = 200  #reports kept in CACHE_FOLDER
+THUMBNAIL_SIZE = (300, 300)  #pixels of the drawings on the routing sheets
+PARTS_PER_CHUNK = 100  #routing sheets rendered by one process before merging
+REPORT_VERSION = 1  #increase when a layout changes, so the cached reports are rendered again
+
+_threads = concurrent.futures.ThreadPoolExecutor(max_workers=2)  #waits on the process pool and merges
+
+
+def get_pool():
+    '''Process pool of the report functions, shared with the rest of the application'''
+    return task_runner.shared_process_pool()
+
+
+@functools.lru_cache(maxsize=None)
+def style_sheet():
+    '''Shared by every report, getSampleStyleSheet() builds a new style sheet on every call'''
+    return getSampleStyleSheet()
+
+
+@functools.lru_cache(maxsize=None)
+def logo_image():
+    '''The logo is decoded once per process, the ImageReader keeps the pixels for every document'''
+    return ImageReader(LOGO_FILE)
+
+
+@functools.lru_cache(maxsize=64)
+def drawing_image(path, mtime):
+    '''ImageReader of a drawing thumbnail. The thumbnail comes from the drawing store pyramid
+    or the image_cache disk cache, and is decoded once per process for every part using it'''
+    path = drawing_store.store.display_path(path, THUMBNAIL_SIZE)
+    with image_cache.Image.open(path) as image:  #reads the header only
+        width, height = image.size
+    scale = min(1.0, THUMBNAIL_SIZE[0] / width, THUMBNAIL_SIZE[1] / height)
+    size = None if scale == 1.0 else (max(1, round(width * scale)), max(1, round(height * scale)))
+    return ImageReader(image_cache.load_thumbnail(path, size))
+
+
+def report_snapshot(job, parts=None):
+    '''Job.snapshot() for the process pool, the drawing of every part is replaced by the file
+    its routing sheet shows'''
+    job = job.snapshot(parts)
+    for part in job.parts:
+        part.drawing = drawing_store.store.part_drawing(part)
+    return job
+
+
+def part_drawing(part):
+    '''ImageReader of the part drawing, None if there is no readable drawing.
+    The drawing was resolved by report_snapshot()'''
+    path = part.drawing
+    try:
+        return drawing_image(path, os.stat(path).st_mtime_ns)
+    except (OSError, ValueError):
+        return None
+
+
+def job_price(job):
+    '''Total selling price of the job, from the part prices'''
+    return sum(part.price * part.quantity for part in job.parts)
 
 class Order_Confirmation():
 
-    def __init__(self, pdf_file):
+    def __init__(self, pdf_file, job=None):
+        '''pdf_file is a file name or a binary file object'''
         self.canvas = canvas.Canvas(pdf_file, pagesize=letter)
-        self.styles = getSampleStyleSheet()
+        self.styles = style_sheet()
         self.width, self.height = letter
         self.pdf_file = pdf_file
+        self.job = job or erp_model.Job()
+        self.date = datetime.date.today().strftime(DATE_FORMAT)
 
         self.create_header()
         self.save()
@@ -22,10 +125,8 @@ class Order_Confirmation():
         return x, y
 
     def create_header(self):
-        logo_path = 'img\\logo.png'
-        logo = Image(logo_path, 2.222*inch, 1*inch)
-        logo.wrapOn(self.canvas, self.width, self.height)
-        logo.drawOn(self.canvas, *self.coord(.5, 1.5, inch))
+        self.canvas.drawImage(logo_image(), *self.coord(.5, 1.5, inch), width=2.222*inch, height=1*inch,
+                              mask='auto')
 
         ptext = '<font size=22><b>Confirmation de commande</b></font>'
         p = Paragraph(ptext, self.styles['Normal'])
@@ -33,13 +134,11 @@ class Order_Confirmation():
         p.drawOn(self.canvas, *self.coord(3.5, 1))
 
         ptext= '''  <font size=10>
-                    <b>Client:</b> MachinMachine <br/>
+                    <b>Client:</b> {} <br/>
                     <b>Date:</b> {}<br/>
-                    <b>Adresse:</b> 5 Rue des axes,<br/>
-                    Granby, QC J2J<br/>
-                    <b>Tel:</b> (450) 123-1111<br/>
+                    <b>Commande:</b> {}<br/>
                     </font>
-                    '''.format('01/01/2018')
+                    '''.format(escape(self.job.client), self.date, escape(self.job.number))
         p = Paragraph(ptext, self.styles['Normal'])
         p.wrapOn(self.canvas, self.width, self.height)
         p.drawOn(self.canvas, *self.coord(1, 3, inch))
@@ -51,21 +150,22 @@ class Order_Confirmation():
                     Granby, QC J2J<br/>
                     <b>Tel:</b> (450) 123-1234<br/>
                     </font>
-                    '''.format('01/01/2018')
+                    '''.format(self.date)
         p = Paragraph(ptext, self.styles['Normal'])
         p.wrapOn(self.canvas, self.width, self.height)
         p.drawOn(self.canvas, *self.coord(6, 3, inch))
 
         ptext= '''  <font size=10>
-                    Monsieur Machin,<br/><br/>
-                    Voici notre confirmation pour votre commande 123431 pour des beignes en titane<br/>
-                    selon le dessin beignes_001293_revA. <br/>
+                    Bonjour,<br/><br/>
+                    Voici notre confirmation pour votre commande {} pour {}<br/>
+                    ({} pieces, livraison prevue le {}).<br/>
                     <br/>
                     Cordialement, <br/>
                     <br/>
                     Patrick Touchette
                     </font>
-                    '''.format('01/01/2018')
+                    '''.format(escape(self.job.number), escape(self.job.description),
+                               len(self.job.parts), escape(self.job.delivery_date))
         p = Paragraph(ptext, self.styles['Normal'])
         p.wrapOn(self.canvas, self.width, self.height)
         p.drawOn(self.canvas, *self.coord(1, 5, inch))
@@ -73,17 +173,51 @@ class Order_Confirmation():
 
     def save(self):
         self.canvas.save()
-        os.startfile(self.pdf_file)
+
+class Lazy_Story(list):
+    '''Story for BaseDocTemplate.build() that pulls its flowables from an iterator a few
+    at a time. build() only looks at the front of the list, so the whole document is
+    never held in memory'''
+    def __init__(self, flowables, lookahead=4):
+        list.__init__(self)
+        self.source = iter(flowables)
+        self.lookahead = lookahead
+
+    def fill(self):
+        while self.source is not None and list.__len__(self) < self.lookahead:
+            try:
+                self.append(next(self.source))
+            except StopIteration:
+                self.source = None
+
+    def __len__(self):
+        self.fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self.fill()
+        return list.__getitem__(self, index)
+
 
 class Price_Quotation():
+    '''Quotation of a job: a line per part with its price, and a line per routing operation
+    with its hours. The lines are written in tables of ROWS_PER_TABLE rows, generated
+    while the document is built, and flow over as many pages as needed'''
+    COLUMNS = ['Item', 'Description', 'Qte', 'Heures', 'Prix unitaire', 'Total']
+    COLUMN_WIDTHS = [1.3*inch, 2.6*inch, 0.6*inch, 0.7*inch, 1.0*inch, 1.1*inch]
+    ROWS_PER_TABLE = 40
+    HEADER_HEIGHT = 3.2*inch  #first page, above the story
 
-    def __init__(self, pdf_file):
-        self.canvas = canvas.Canvas(pdf_file, pagesize=letter)
-        self.styles = getSampleStyleSheet()
+    def __init__(self, pdf_file, job=None):
+        '''pdf_file is a file name or a binary file object'''
+        self.styles = style_sheet()
         self.width, self.height = letter
         self.pdf_file = pdf_file
-
-        self.create_header()
+        self.job = job or erp_model.Job()
+        self.date = datetime.date.today().strftime(DATE_FORMAT)
+        self.doc = SimpleDocTemplate(pdf_file, pagesize=letter, topMargin=0.9*inch, bottomMargin=0.7*inch,
+                                     leftMargin=0.6*inch, rightMargin=0.6*inch,
+                                     title='Soumission {}'.format(self.job.number))
         self.save()
 
     def coord(self, x, y, unit=inch):
@@ -91,11 +225,30 @@ class Price_Quotation():
         y = self.height - y * unit
         return x, y
 
+    def first_page(self, canvas, doc):
+        self.canvas = canvas
+        self.create_header()
+        self.page_footer(canvas, doc)
+
+    def later_page(self, canvas, doc):
+        '''Title and column titles on top of every page after the first'''
+        self.canvas = canvas
+        p = Paragraph('<font size=12><b>Soumission {}</b></font> - {}'.format(
+            escape(self.job.number), escape(self.job.client)), self.styles['Normal'])
+        p.wrapOn(canvas, self.width, self.height)
+        p.drawOn(canvas, *self.coord(.75, .55))
+        table = Table([self.COLUMNS], colWidths=self.COLUMN_WIDTHS, style=self.table_style(0))
+        table.wrapOn(canvas, self.width, self.height)
+        table.drawOn(canvas, *self.coord((8.5 - sum(self.COLUMN_WIDTHS) / inch) / 2, .9))
+        self.page_footer(canvas, doc)
+
+    def page_footer(self, canvas, doc):
+        canvas.setFont('Helvetica', 8)
+        canvas.drawRightString(self.width - .75*inch, .4*inch, 'Page {}'.format(doc.page))
+
     def create_header(self):
-        logo_path = 'img\\logo.png'
-        logo = Image(logo_path, 2.222*inch, 1*inch)
-        logo.wrapOn(self.canvas, self.width, self.height)
-        logo.drawOn(self.canvas, *self.coord(.5, 1.5, inch))
+        self.canvas.drawImage(logo_image(), *self.coord(.5, 1.5, inch), width=2.222*inch, height=1*inch,
+                              mask='auto')
 
         ptext = '<font size=22><b>Soumission</b></font>'
         p = Paragraph(ptext, self.styles['Normal'])
@@ -103,13 +256,11 @@ class Price_Quotation():
         p.drawOn(self.canvas, *self.coord(3.5, 1))
 
         ptext= '''  <font size=10>
-                    <b>Client:</b> MachinMachine <br/>
+                    <b>Client:</b> {} <br/>
                     <b>Date:</b> {}<br/>
-                    <b>Adresse:</b> 5 Rue des axes,<br/>
-                    Granby, QC , J2J<br/>
-                    <b>Tel:</b> (450) 123-1111<br/>
+                    <b>Projet:</b> {}<br/>
                     </font>
-                    '''.format('01/01/2018')
+                    '''.format(escape(self.job.client), self.date, escape(self.job.number))
         p = Paragraph(ptext, self.styles['Normal'])
         p.wrapOn(self.canvas, self.width, self.height)
         p.drawOn(self.canvas, *self.coord(1, 3, inch))
@@ -121,36 +272,294 @@ class Price_Quotation():
                     Granby, QC J2J<br/>
                     <b>Tel:</b> (450) 123-1234<br/>
                     </font>
-                    '''.format('01/01/2018')
+                    '''.format(self.date)
         p = Paragraph(ptext, self.styles['Normal'])
         p.wrapOn(self.canvas, self.width, self.height)
         p.drawOn(self.canvas, *self.coord(6, 3, inch))
 
-        ptext= '''  <font size=10>
-                    Monsieur Machin,<br/><br/>
-                    Voici notre soumission pour l'usinage de vos beignes en titane<br/>
-                    selon le dessin beignes_001293_revA.<br/><br/>
-                    Prix: $1000.00 / chaque <br/>
-                    Quantite: 1000 <br/>
-                    Total: $1,000,000.00 <br/>
-                    <br/>
-                    Cordialement, <br/>
-                    <br/>
-                    Patrick Touchette
-                    </font>
-                    '''.format('01/01/2018')
-        p = Paragraph(ptext, self.styles['Normal'])
-        p.wrapOn(self.canvas, self.width, self.height)
-        p.drawOn(self.canvas, *self.coord(1, 6, inch))
+    def table_style(self, header_rows, part_rows=()):
+        commands = [('FONT', (0, 0), (-1, -1), 'Helvetica', 8),
+                    ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+                    ('TOPPADDING', (0, 0), (-1, -1), 1),
+                    ('BOTTOMPADDING', (0, 0), (-1, -1), 1)]
+        if header_rows is not None:
+            commands += [('FONT', (0, 0), (-1, header_rows), 'Helvetica-Bold', 8),
+                         ('LINEBELOW', (0, header_rows), (-1, header_rows), 0.5, 'black')]
+        for row in part_rows:
+            commands += [('FONT', (0, row), (-1, row), 'Helvetica-Bold', 8),
+                         ('LINEABOVE', (0, row), (-1, row), 0.25, 'grey')]
+        return TableStyle(commands)
+
+    def line_items(self):
+        '''(row, is a part row) for every part and every routing operation'''
+        for part in self.job.parts:
+            description = ', '.join(text for text in (part.description, part.material) if text)
+            yield ([part.number, description[:45], '{:g}'.format(part.quantity), '{:.1f}'.format(part.hours),
+                    '{:,.2f}'.format(part.price), '{:,.2f}'.format(part.price * part.quantity)], True)
+            for task in part.tasks:
+                operation = '  {} - {}'.format(task.department, task.operation)
+                if task.notes.strip():
+                    operation += ' ({})'.format(task.notes.strip().splitlines()[0])
+                yield (['', operation[:50], '', '{:.1f}'.format(task.hours), '', ''], False)
+
+    def tables(self):
+        '''The line items in tables of ROWS_PER_TABLE rows, the first one with the column titles'''
+        rows, part_rows = [self.COLUMNS], []
+        header_rows = 0
+        for row, is_part in self.line_items():
+            if is_part:
+                part_rows.append(len(rows))
+            rows.append(row)
+            if len(rows) == self.ROWS_PER_TABLE:
+                yield Table(rows, colWidths=self.COLUMN_WIDTHS, style=self.table_style(header_rows, part_rows))
+                rows, part_rows, header_rows = [], [], None
+        if rows:
+            yield Table(rows, colWidths=self.COLUMN_WIDTHS, style=self.table_style(header_rows, part_rows))
 
+    def story(self):
+        yield Spacer(1, self.HEADER_HEIGHT - self.doc.topMargin)
+        ptext = '''<font size=10>Bonjour,<br/><br/>
+                    Voici notre soumission pour l'usinage de {} ({} pieces).</font>
+                    '''.format(escape(self.job.description), len(self.job.parts))
+        yield Paragraph(ptext, self.styles['Normal'])
+        yield Spacer(1, 0.2*inch)
+        for table in self.tables():
+            yield table
+        yield Table([['', 'Total', '', '', '', '${:,.2f}'.format(job_price(self.job))]],
+                    colWidths=self.COLUMN_WIDTHS,
+                    style=TableStyle([('FONT', (0, 0), (-1, -1), 'Helvetica-Bold', 10),
+                                      ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+                                      ('LINEABOVE', (0, 0), (-1, 0), 1, 'black')]))
+        yield Spacer(1, 0.3*inch)
+        ptext = '''<font size=10>Cordialement, <br/><br/>Patrick Touchette</font>'''
+        yield Paragraph(ptext, self.styles['Normal'])
 
     def save(self):
-        self.canvas.save()
-        os.startfile(self.pdf_file)
+        self.doc.build(Lazy_Story(self.story()), onFirstPage=self.first_page, onLaterPages=self.later_page)
+
+class Routing_Sheet():
+    '''Shop traveler: one page per part with its attributes, its drawing and the ordered
+    routing operations, with a column to sign off each operation'''
+    COLUMNS = ['#', 'Departement', 'Operation', 'Heures', 'Notes', 'Fait', 'Initiales']
+    COLUMN_WIDTHS = [0.3*inch, 1.2*inch, 1.3*inch, 0.6*inch, 2.6*inch, 0.5*inch, 0.8*inch]
+
+    def __init__(self, pdf_file, job=None):
+        '''pdf_file is a file name or a binary file object'''
+        self.styles = style_sheet()
+        self.width, self.height = letter
+        self.pdf_file = pdf_file
+        self.job = job or erp_model.Job()
+        self.date = datetime.date.today().strftime(DATE_FORMAT)
+        self.doc = SimpleDocTemplate(pdf_file, pagesize=letter, topMargin=0.6*inch, bottomMargin=0.6*inch,
+                                     leftMargin=0.6*inch, rightMargin=0.6*inch,
+                                     title='Fiche de route {}'.format(self.job.number))
+        self.save()
+
+    def page_footer(self, canvas, doc):
+        canvas.setFont('Helvetica', 8)
+        canvas.drawString(.6*inch, .4*inch, 'Projet {}  -  imprime le {}'.format(self.job.number, self.date))
+
+    def attributes(self, part):
+        rows = [[label, part.get_text(attribute)] for label, attribute in erp_model.PART_FIELDS]
+        return Table(rows, colWidths=[1.1*inch, 2.2*inch],
+                     style=TableStyle([('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
+                                       ('FONT', (1, 0), (1, -1), 'Helvetica', 9),
+                                       ('LINEBELOW', (0, 0), (-1, -1), 0.25, 'grey')]))
+
+    def drawing(self, part):
+        image = part_drawing(part)
+        if image is None:
+            return ''
+        width, height = image.getSize()
+        scale = min(3.4*inch / width, 2.6*inch / height)
+        return Drawing_Flowable(image, width * scale, height * scale)
+
+    def tasks(self, part):
+        notes = self.styles['BodyText']
+        rows = [self.COLUMNS]
+        for i, task in enumerate(part.tasks, 1):
+            rows.append([str(i), task.department, task.operation, '{:.2f}'.format(task.hours),
+                         Paragraph(escape(task.notes).replace('\n', '<br/>'), notes), '', ''])
+        return Table(rows, colWidths=self.COLUMN_WIDTHS, repeatRows=1,
+                     style=TableStyle([('FONT', (0, 0), (-1, -1), 'Helvetica', 9),
+                                       ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+                                       ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                                       ('GRID', (0, 0), (-1, -1), 0.25, 'grey')]))
+
+    def story(self):
+        for i, part in enumerate(self.job.parts):
+            if i:
+                yield PageBreak()
+            ptext = '<font size=16><b>Fiche de route</b></font>'
+            yield Paragraph(ptext, self.styles['Normal'])
+            yield Spacer(1, 0.15*inch)
+            ptext = '<font size=11><b>Projet:</b> {} - {} &nbsp; <b>Piece:</b> {}</font>'.format(
+                escape(self.job.number), escape(self.job.client), escape(part.number))
+            yield Paragraph(ptext, self.styles['Normal'])
+            yield Spacer(1, 0.2*inch)
+            yield Table([[self.attributes(part), self.drawing(part)]], colWidths=[3.5*inch, 3.6*inch],
+                        style=TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP')]))
+            yield Spacer(1, 0.25*inch)
+            yield self.tasks(part)
+
+    def save(self):
+        self.doc.build(Lazy_Story(self.story()), onFirstPage=self.page_footer, onLaterPages=self.page_footer)
+
+
+class Drawing_Flowable(Spacer):
+    '''Draws an ImageReader, platypus Image only takes file names'''
+    def __init__(self, image, width, height):
+        Spacer.__init__(self, width, height)
+        self.image = image
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height, mask='auto')
+
+
+#report kind: (report class, file name prefix)
+REPORTS = {'quotation': (Price_Quotation, 'Soumission'),
+           'confirmation': (Order_Confirmation, 'Confirmation de commande'),
+           'routing': (Routing_Sheet, 'Fiche de route')}
+
+
+def report_filename(kind, job, folder='', suffix=''):
+    name = ' '.join(text for text in (REPORTS[kind][1], job.number, suffix) if text) + '.pdf'
+    return os.path.join(folder, name.replace('/', '-').replace('\\', '-'))
+
+
+def report_key(kind, job):
+    '''Hash of everything the report shows: the job, its parts and routings, the date and the logo'''
+    sha = hashlib.sha256()
+    logo = os.stat(LOGO_FILE)
+    sha.update(repr((kind, REPORT_VERSION, datetime.date.today(), logo.st_mtime_ns, logo.st_size)).encode('utf-8'))
+    sha.update(repr(job).encode('utf-8'))
+    for part in job.parts:
+        sha.update(repr(part).encode('utf-8'))  #with the drawing resolved by report_snapshot()
+        for task in part.tasks:
+            sha.update(repr(task).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def cache_path(kind, job):
+    return os.path.join(CACHE_FOLDER, '{}-{}.pdf'.format(kind, report_key(kind, job)))
+
+
+def copy_file(source, destination):
+    temporary = '{}.{}.tmp'.format(destination, os.getpid())
+    shutil.copyfile(source, temporary)
+    os.replace(temporary, destination)
+
+
+def copy_cached(cached, pdf_file):
+    '''Copies the cached report, from cache_path(), to pdf_file if it exists. Returns True if it was cached'''
+    if not os.path.exists(cached):
+        return False
+    copy_file(cached, pdf_file)
+    return True
+
+
+def prune_cache():
+    '''Removes the least recently written reports past CACHE_SIZE'''
+    entries = sorted(os.scandir(CACHE_FOLDER), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[CACHE_SIZE:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def render_report(kind, job, pdf_file=None, cached=None):
+    '''Renders one report, or takes it from cached, its cache_path(). Without cached, the
+    report is rendered in memory and nothing is written to the cache.
+    Returns pdf_file, or the bytes of the PDF when pdf_file is None'''
+    if cached is None:
+        buffer = io.BytesIO()
+        REPORTS[kind][0](buffer, job)
+        if pdf_file is None:
+            return buffer.getvalue()
+        with open(pdf_file, 'wb') as f:
+            f.write(buffer.getvalue())
+        return pdf_file
+    if not os.path.exists(cached):
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        temporary = '{}.{}.tmp'.format(cached, os.getpid())
+        REPORTS[kind][0](temporary, job)
+        os.replace(temporary, cached)
+        prune_cache()
+    if pdf_file is None:
+        with open(cached, 'rb') as f:
+            return f.read()
+    copy_file(cached, pdf_file)
+    return pdf_file
+
+
+def submit_report(kind, job, pdf_file=None, cached=None):
+    '''Renders the report of a report_snapshot() in the process pool, returns a
+    concurrent.futures.Future. cached is the cache_path() of the report, computed here if None'''
+    if cached is None:
+        cached = cache_path(kind, job)
+    if kind == 'routing' and len(job.parts) > PARTS_PER_CHUNK and pypdf is not None:
+        return _threads.submit(render_routing_sheets, job, pdf_file, cached)
+    return get_pool().submit(render_report, kind, job, pdf_file, cached)
+
+
+def render_routing_sheets(job, pdf_file, cached):
+    '''Routing sheets of every part, PARTS_PER_CHUNK parts per process, merged in one PDF.
+    Without pypdf the sheets are rendered in one document by one process. Runs in a worker
+    thread, the job must be a report_snapshot()'''
+    if pypdf is None:
+        return get_pool().submit(render_report, 'routing', job, pdf_file, cached).result()
+    if not os.path.exists(cached):
+        chunks = [job.with_parts(job.parts[i:i + PARTS_PER_CHUNK])
+                  for i in range(0, len(job.parts), PARTS_PER_CHUNK)]
+        futures = [get_pool().submit(render_report, 'routing', chunk) for chunk in chunks]
+        writer = pypdf.PdfWriter()
+        for future in futures:
+            writer.append(pypdf.PdfReader(io.BytesIO(future.result())))
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        temporary = '{}.{}.tmp'.format(cached, os.getpid())
+        with open(temporary, 'wb') as f:
+            writer.write(f)
+        os.replace(temporary, cached)
+        prune_cache()
+    if pdf_file is None:
+        with open(cached, 'rb') as f:
+            return f.read()
+    copy_file(cached, pdf_file)
+    return pdf_file
+
+
+def batch_filenames(kind, jobs, folder):
+    '''report_filename() of every job, numbered (2), (3)... when jobs share a job number or have none'''
+    paths = []
+    used = set()
+    for job in jobs:
+        path = report_filename(kind, job, folder)
+        count = 1
+        while path in used:
+            count += 1
+            path = report_filename(kind, job, folder, suffix='({})'.format(count))
+        used.add(path)
+        paths.append(path)
+    return paths
+
+
+def render_batch(kind, jobs, folder=None):
+    '''Renders the report of every job in the process pool. Writes them in folder and
+    returns the paths, or returns the bytes of each PDF when folder is None. In jobs order'''
+    jobs = [report_snapshot(job) for job in jobs]
+    if folder is None:
+        paths = [None] * len(jobs)
+    else:
+        os.makedirs(folder, exist_ok=True)
+        paths = batch_filenames(kind, jobs, folder)
+    futures = [submit_report(kind, job, path) for job, path in zip(jobs, paths)]
+    return [future.result() for future in futures]
 
 
 if __name__ == '__main__':
-    confirmation_file = 'Confirmation de commande.pdf'
-    order_confirmation = Order_Confirmation(confirmation_file)
-    quote_file = 'Soumission.pdf'
-    quote = Price_Quotation(quote_file)
+    job = erp_model.Job('123431', 'beignes en titane', 'MachinMachine', delivery_date='2018-04-21')
+    part = job.add_part('beignes_001293_revA', price=1000.0, quantity=1000.0)
+    part.add_task('Machining', 'Lathe', 0.25)
+    print(render_batch('confirmation', [job], '.'))
+    print(render_batch('quotation', [job], '.'))
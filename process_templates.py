@@ -0,0 +1,99 @@
+'''
+Library of process templates: named routings of (department, operation, standard hours).
+
+A template is plain data. Applying it replaces the routing of every given part with
+new erp_model.Routing_Task objects, no widget is involved: only the Part_Router of
+the part being viewed is rebound afterwards. The library is saved to TEMPLATES_FILE
+as JSON, DEFAULT_TEMPLATES are used until it exists.
+'''
+
+import json
+import os
+
+import erp_model
+
+TEMPLATES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates.json')
+
+#name: [(department, operation, standard hours), ...]
+DEFAULT_TEMPLATES = {
+    'Template 1': [('Methods', 'Planning', 0.5),
+                   ('Methods', 'Programming', 3.0),
+                   ('Machining', 'Lathe', 5.0),
+                   ('Surface Treatment', 'Black Oxyde', 1.0),
+                   ('Inspection', 'Manual Inspection', 1.0)],
+    'Milled Part': [('Methods', 'Planning', 0.5),
+                    ('Methods', 'Programming', 4.0),
+                    ('Machining', '3-axis mill', 6.0),
+                    ('Inspection', 'Manual Inspection', 1.0)],
+    'Anodized Part': [('Methods', 'Planning', 0.5),
+                      ('Methods', 'Programming', 4.0),
+                      ('Machining', '5-axis mill', 8.0),
+                      ('Surface Treatment', 'Hard Anodize', 1.0),
+                      ('Inspection', 'CMM Inspection', 2.0)],
+    'Sub-contracted': [('Methods', 'Planning', 0.5),
+                       ('Sub-contracting', 'JobShop', 0.0),
+                       ('Inspection', 'Manual Inspection', 1.0)]}
+
+
+def compile_template(operations):
+    '''Validated tuple of (department, operation, hours). Raises ValueError on an
+    operation that does not belong to its department'''
+    steps = []
+    for department, operation, hours in operations:
+        if operation not in erp_model.TASKS.get(department, ()):
+            raise ValueError('{} is not an operation of {}'.format(operation, department))
+        steps.append((department, operation, float(hours)))
+    return tuple(steps)
+
+
+def apply(steps, parts):
+    '''Replaces the routing of every part with the compiled template steps'''
+    task = erp_model.Routing_Task
+    for part in parts:
+        part.tasks = [task(department, operation, hours) for department, operation, hours in steps]
+    return parts
+
+
+class Template_Library():
+    '''Named compiled templates, in insertion order'''
+    def __init__(self, path=TEMPLATES_FILE):
+        self.path = path
+        self.templates = {}
+        templates = DEFAULT_TEMPLATES
+        if path is not None and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                templates = json.load(f)
+        for name, operations in templates.items():
+            self.add(name, operations)
+
+    def names(self):
+        return list(self.templates)
+
+    def __contains__(self, name):
+        return name in self.templates
+
+    def get(self, name):
+        return self.templates[name]
+
+    def add(self, name, operations):
+        self.templates[name] = compile_template(operations)
+
+    def add_from_part(self, name, part):
+        '''Saves the routing of a part as a template, the notes are left out'''
+        self.add(name, [(task.department, task.operation, task.hours) for task in part.tasks])
+
+    def remove(self, name):
+        del self.templates[name]
+
+    def apply(self, name, parts):
+        return apply(self.templates[name], parts)
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({name: [list(step) for step in steps] for name, steps in self.templates.items()},
+                      f, indent=1)
+        os.replace(temporary, self.path)
+
+
+library = Template_Library()
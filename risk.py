@@ -0,0 +1,185 @@
+'''
+What-if analysis of a schedule: Monte Carlo sampling of the task hours and of the
+machine downtime, for the probability of delivering on time.
+
+The schedule is replayed in its dispatch order, each machine unit keeps its sequence
+of operations. An operation starts at its planned time, later if its part or its
+machine unit is delayed: delays propagate, the plan is not pulled earlier when a task
+is shorter. Each operation takes its planned working hours multiplied by a sampled
+hours factor (triangular, HOURS_LOW to HOURS_HIGH), divided by the sampled availability
+of the machine (1 - downtime, beta distribution around MACHINE_DOWNTIME). The working
+hours are laid on the calendar of the machine like the scheduler does, so nights,
+weekends and holidays are not scaled.
+
+The replay is vectorized over the samples: one numpy row per part or machine unit,
+one column per sample. Chunks of SAMPLES_PER_TASK samples run in the process pool of
+the application.
+'''
+
+import heapq
+
+import lazy_imports
+import scheduler
+import task_runner
+
+np = lazy_imports.lazy('numpy')
+
+HOURS_LOW = 0.9  #task hours factors: minimum, most likely, maximum
+HOURS_MODE = 1.0
+HOURS_HIGH = 1.5
+MACHINE_DOWNTIME = 0.05  #average fraction of the time a machine is down
+NO_DOWNTIME = {'JobShop', 'MechantMachinage', 'MachinMachine', 'ToolShop', 'Black Oxyde', 'Hard Anodize'}
+DOWNTIME_CONCENTRATION = 20.0  #beta distribution a + b, higher is less spread
+SAMPLES_PER_TASK = 250
+BLOCK_SIZE = 4096  #operations whose hours factors are sampled at once
+HORIZON_FACTOR = 4.0  #working time tables cover this many times the planned span
+HORIZON_DAYS = 60  #and this many days more
+
+
+class Working_Time():
+    '''Working hours of a scheduler.Calendar from start to end, as arrays of shifts, so the
+    conversions between time and working hours are vectorized over the samples.
+    The first shift is an empty one before start, the last one runs without breaks'''
+    def __init__(self, calendar, start, end):
+        days = [day for day in range(int(start // 24), int(end // 24) + 2) if calendar.is_workday(day)]
+        shift = calendar.shift_end - calendar.shift_start
+        self.starts = np.array([start - 1.0] + [day * 24.0 + calendar.shift_start for day in days])
+        self.length = np.array([0.0] + [shift] * len(days))
+        self.length[-1] = np.inf
+        self.before = np.concatenate(([0.0], np.arange(len(days)) * shift))  #working hours before each shift
+        self.after = self.before + self.length
+
+    def hours_at(self, time):
+        '''Working hours from start to time, time is not before start'''
+        k = np.searchsorted(self.starts, time, side='right') - 1
+        return np.minimum(time - self.starts[k], self.length[k]) + self.before[k]
+
+    def time_at(self, hours):
+        '''Time at which the working hours are reached, at the end of a shift rather than
+        the start of the next one, like scheduler.Calendar.add_hours'''
+        k = np.searchsorted(self.after, hours, side='left')
+        return (hours - self.before[k]) + self.starts[k]
+
+
+class Plan():
+    '''The bookings of a schedule as arrays, in dispatch order, with the machine unit
+    that runs each operation and its working hours. selected are the routes whose
+    completion is returned. calendars are those of the schedule'''
+    def __init__(self, schedule, jobs=None, calendars=scheduler.CALENDARS,
+                 default_calendar=scheduler.DEFAULT_CALENDAR):
+        self.start = schedule.start
+        routes = schedule.routes
+        self.machines = sorted({booking.machine for booking in schedule.bookings})
+        machine_index = {machine: i for i, machine in enumerate(self.machines)}
+        self.downtime = np.array([0.0 if machine in NO_DOWNTIME else MACHINE_DOWNTIME
+                                  for machine in self.machines], dtype=np.float64)
+        end = max([booking.end for booking in schedule.bookings], default=self.start)
+        horizon = end + (end - self.start) * HORIZON_FACTOR + HORIZON_DAYS * 24.0
+        tables = {}  #id(calendar): Working_Time, machines share their calendar
+        self.working_time = []  #Working_Time of each machine
+        for machine in self.machines:
+            calendar = calendars.get(machine, default_calendar)
+            if id(calendar) not in tables:
+                tables[id(calendar)] = Working_Time(calendar, self.start, horizon)
+            self.working_time.append(tables[id(calendar)])
+
+        count = len(schedule.bookings)
+        self.route = np.empty(count, dtype=np.int64)
+        self.unit = np.empty(count, dtype=np.int64)
+        self.machine = np.empty(count, dtype=np.int64)
+        self.base_start = np.empty(count, dtype=np.float64)
+        self.base_ready = np.empty(count, dtype=np.float64)
+        self.work = np.empty(count, dtype=np.float64)
+        route_end = {}
+        units = {}  #machine: heap of (planned end of the last operation, unit number)
+        unit_end = []
+        for k, booking in enumerate(schedule.bookings):
+            free = units.setdefault(booking.machine, [])
+            if free and free[0][0] <= booking.start + 1e-9:
+                unit = heapq.heappop(free)[1]
+            else:
+                unit = len(unit_end)
+                unit_end.append(self.start)
+            heapq.heappush(free, (booking.end, unit))
+            self.route[k] = booking.route
+            self.unit[k] = unit
+            self.machine[k] = machine_index[booking.machine]
+            self.base_start[k] = booking.start
+            self.base_ready[k] = max(route_end.get(booking.route, self.start), unit_end[unit])
+            self.work[k] = routes[booking.route].operations[booking.position][1]
+            route_end[booking.route] = unit_end[unit] = booking.end
+        self.units = len(unit_end)
+        self.routes = len(routes)
+        self.selected = np.array([i for i, route in enumerate(routes) if jobs is None or route.job in jobs],
+                                 dtype=np.int64)
+
+
+def simulate_chunk(plan, samples, seed):
+    '''Completion times of the selected routes, shape (selected routes, samples)'''
+    rng = np.random.default_rng(seed)
+    route_end = np.full((plan.routes, samples), plan.start)
+    unit_end = np.full((plan.units, samples), plan.start)
+    availability = np.ones((len(plan.machines), samples))
+    for m, downtime in enumerate(plan.downtime):
+        if downtime > 0:
+            availability[m] -= rng.beta(downtime * DOWNTIME_CONCENTRATION,
+                                        (1 - downtime) * DOWNTIME_CONCENTRATION, samples)
+
+    route, unit, machine = plan.route.tolist(), plan.unit.tolist(), plan.machine.tolist()
+    base_start, base_ready, work = plan.base_start.tolist(), plan.base_ready.tolist(), plan.work.tolist()
+    working_time = plan.working_time
+    for first in range(0, len(route), BLOCK_SIZE):
+        factors = rng.triangular(HOURS_LOW, HOURS_MODE, HOURS_HIGH, (min(BLOCK_SIZE, len(route) - first), samples))
+        for k in range(first, first + len(factors)):
+            r, u, m = route[k], unit[k], machine[k]
+            delay = np.maximum(route_end[r], unit_end[u]) - base_ready[k]
+            begin = base_start[k] + np.maximum(delay, 0.0)
+            calendar = working_time[m]
+            end = calendar.time_at(calendar.hours_at(begin) + (work[k] / availability[m]) * factors[k - first])
+            end = np.maximum(end, begin)  #without work, time_at() gives the end of the previous shift
+            route_end[r] = end
+            unit_end[u] = end
+    return route_end[plan.selected]  #float64, hours since year 1 need more than float32
+
+
+class Risk():
+    '''On time probability and P50/P90 completion dates of the selected parts and their jobs.
+    parts: {route key: (probability, p50 date, p90 date)}, jobs: {job number: (...)}.
+    The probability is None without a delivery date'''
+    def __init__(self, schedule, plan, ends):
+        routes = [schedule.routes[i] for i in plan.selected.tolist()]
+        self.samples = ends.shape[1]
+        self.parts = self.summarize([route.key for route in routes], ends, [route.due for route in routes])
+
+        jobs = {}
+        for row, route in enumerate(routes):
+            jobs.setdefault(route.job, []).append(row)
+        job_ends = np.array([ends[rows].max(axis=0) for rows in jobs.values()]).reshape(len(jobs), self.samples)
+        self.jobs = self.summarize(list(jobs), job_ends, [schedule.job_due[job] for job in jobs])
+
+    def summarize(self, keys, ends, dues):
+        summary = {}
+        if not keys:
+            return summary
+        p50, p90 = np.percentile(ends, [50, 90], axis=1)
+        dues = np.array(dues, dtype=np.float64)
+        on_time = (ends <= dues[:, None]).mean(axis=1)
+        for key, due, probability, early, late in zip(keys, dues.tolist(), on_time.tolist(),
+                                                     p50.tolist(), p90.tolist()):
+            summary[key] = (None if due == scheduler.NO_DUE_DATE else probability,
+                            scheduler.to_datetime(early).date(), scheduler.to_datetime(late).date())
+        return summary
+
+
+def simulate(schedule, samples=1000, jobs=None, seed=None):
+    '''Samples the schedule, in the process pool. jobs limits the results to these job numbers
+    (every operation of every job is still simulated, they share the machines)'''
+    plan = Plan(schedule, set(jobs) if jobs is not None else None)
+    chunks = [SAMPLES_PER_TASK] * (samples // SAMPLES_PER_TASK)
+    if samples % SAMPLES_PER_TASK:
+        chunks.append(samples % SAMPLES_PER_TASK)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    pool = task_runner.shared_process_pool()
+    futures = [pool.submit(simulate_chunk, plan, size, child) for size, child in zip(chunks, seeds)]
+    ends = np.concatenate([future.result() for future in futures], axis=1)
+    return Risk(schedule, plan, ends)
@@ -0,0 +1,242 @@
+'''
+Finite capacity scheduling of the routings of every open job.
+
+Each routing task is an operation on the machine named by its operation (Lathe,
+5-axis mill...). The operations of a part run in routing order. A machine runs as
+many operations at once as it has units, within the working hours of its calendar.
+
+The dispatcher is event driven: one heap of events (an operation finishes) ordered
+by time, and for every machine a heap of the operations waiting for it, ordered by
+the priority rule:
+- 'edd': earliest job due date first
+- 'cr': critical ratio, time left until the due date / hours of work left on the part,
+  lowest first. The ratio is taken when the operation starts waiting for the machine
+
+Times are float hours since 0001-01-01 (date.toordinal() * 24), so they convert to
+dates without an origin.
+'''
+
+import collections
+import datetime
+import heapq
+
+import costing
+
+NO_DUE_DATE = float('inf')
+
+
+class Calendar():
+    '''Working hours of a machine: one shift of hours_per_day starting at shift_start,
+    on the workdays (0 is monday), except holidays. units is the number of identical machines'''
+    def __init__(self, hours_per_day=8.0, shift_start=7.0, workdays=(0, 1, 2, 3, 4), holidays=(), units=1):
+        self.shift_start = shift_start
+        self.shift_end = shift_start + hours_per_day
+        self.workdays = frozenset(workdays)
+        self.holidays = {date.toordinal() for date in holidays}
+        self.units = units
+
+    def is_workday(self, day):
+        '''day is a date ordinal, ordinal 1 is a monday'''
+        return (day - 1) % 7 in self.workdays and day not in self.holidays
+
+    def next_start(self, time):
+        '''Earliest working time at or after time'''
+        day = int(time // 24)
+        if self.is_workday(day) and time - day * 24 < self.shift_end:
+            return max(time, day * 24 + self.shift_start)
+        day += 1
+        while not self.is_workday(day):
+            day += 1
+        return day * 24 + self.shift_start
+
+    def add_hours(self, time, hours):
+        '''Time at which hours of work started at time are finished'''
+        time = self.next_start(time)
+        while True:
+            day = int(time // 24)
+            available = day * 24 + self.shift_end - time
+            if hours <= available:
+                return time + hours
+            hours -= available
+            time = self.next_start((day + 1) * 24)
+
+
+SUBCONTRACTOR = Calendar(units=100)  #outside shops, capacity is not limited by the shop floor
+
+#machine (routing operation): calendar. Machines missing from the table get DEFAULT_CALENDAR
+CALENDARS = {'Planning': Calendar(units=2),
+             'Programming': Calendar(units=2),
+             'Lathe': Calendar(hours_per_day=16.0, units=2),
+             '5-axis mill': Calendar(hours_per_day=16.0),
+             '3-axis mill': Calendar(hours_per_day=16.0, units=2),
+             'JobShop': SUBCONTRACTOR,
+             'MechantMachinage': SUBCONTRACTOR,
+             'MachinMachine': SUBCONTRACTOR,
+             'ToolShop': SUBCONTRACTOR,
+             'Black Oxyde': SUBCONTRACTOR,
+             'Hard Anodize': SUBCONTRACTOR,
+             'Manual Inspection': Calendar(units=2),
+             'CMM Inspection': Calendar()}
+DEFAULT_CALENDAR = Calendar()
+
+
+def to_time(moment):
+    '''date or datetime to scheduler hours'''
+    if not isinstance(moment, datetime.datetime):
+        return moment.toordinal() * 24.0
+    return (moment.toordinal() * 24.0 + moment.hour + moment.minute / 60.0
+            + (moment.second + moment.microsecond / 1e6) / 3600.0)
+
+
+def to_datetime(time):
+    day = int(time // 24)
+    return datetime.datetime.fromordinal(day) + datetime.timedelta(hours=time - day * 24)
+
+
+def due_time(text):
+    '''End of the delivery date (YYYY-MM-DD text) of a job, NO_DUE_DATE if it has none'''
+    try:
+        return to_time(datetime.datetime.strptime(text.strip(), '%Y-%m-%d')) + 24.0
+    except (AttributeError, ValueError):
+        return NO_DUE_DATE
+
+
+class Route():
+    '''Snapshot of the routing of one part: (machine, hours) of each operation, in order.
+    key identifies the part for the views, id(part) by default'''
+    __slots__ = ('job', 'part', 'key', 'due', 'operations', 'work_left')
+
+    def __init__(self, job, part, key, due, operations):
+        self.job = job
+        self.part = part
+        self.key = key
+        self.due = due
+        self.operations = operations
+        self.work_left = [0.0] * (len(operations) + 1)  #hours of work from each operation to the end
+        for i in range(len(operations) - 1, -1, -1):
+            self.work_left[i] = self.work_left[i + 1] + operations[i][1]
+
+
+def routes_from_jobs(jobs, rates=None):
+    '''Routes of every part of the jobs. Operation hours include the setup, and are
+    multiplied by the part quantity when the operation is per piece (see costing).
+    Cheap copy of the model, so the schedule can run in another thread'''
+    rates = rates or costing.Rates()
+    routes = []
+    for job in jobs:
+        due = due_time(job.delivery_date)
+        for part in job.parts:
+            operations = []
+            for task in part.tasks:
+                rate, setup, per_piece = rates.values[rates.operation_index(task.operation)]
+                operations.append((task.operation, setup + task.hours * (part.quantity if per_piece else 1.0)))
+            routes.append(Route(job.number, part.number, id(part), due, operations))
+    return routes
+
+
+def edd_priority(route, position, time):
+    return route.due
+
+
+def cr_priority(route, position, time):
+    if route.due == NO_DUE_DATE:
+        return NO_DUE_DATE
+    return (route.due - time) / max(route.work_left[position], 0.01)
+
+
+RULES = {'edd': edd_priority, 'cr': cr_priority}
+
+Booking = collections.namedtuple('Booking', 'route position machine start end')
+
+
+class Schedule():
+    '''Result of schedule(): every booking, and the completion time of every route and job'''
+    def __init__(self, start, routes, bookings, part_end):
+        self.start = start
+        self.routes = routes
+        self.bookings = bookings
+        self.part_end = part_end  #completion time of each route
+        self.job_end = {}  #job number: completion time of its last part
+        self.job_due = {}
+        for route, end in zip(routes, part_end):
+            self.job_end[route.job] = max(end, self.job_end.get(route.job, start))
+            self.job_due[route.job] = route.due
+
+    def part_dates(self):
+        '''{route key: completion date}'''
+        return {route.key: to_datetime(end).date() for route, end in zip(self.routes, self.part_end)}
+
+    def job_dates(self):
+        '''{job number: completion date}'''
+        return {job: to_datetime(end).date() for job, end in self.job_end.items()}
+
+    def job_lateness(self):
+        '''{job number: days late (negative when early), None for a job without delivery date}'''
+        lateness = {}
+        for job, end in self.job_end.items():
+            due = self.job_due[job]
+            if due == NO_DUE_DATE:
+                lateness[job] = None
+            else:
+                lateness[job] = (to_datetime(end).date() - to_datetime(due - 24.0).date()).days
+        return lateness
+
+
+def schedule(routes, start=None, rule='edd', calendars=CALENDARS, default_calendar=DEFAULT_CALENDAR):
+    '''Loads the routes on the machines from start (datetime, now by default).
+    Returns a Schedule'''
+    start = to_time(start or datetime.datetime.now())
+    priority = RULES[rule]
+    part_end = [start] * len(routes)
+    bookings = []
+    events = []  #(finish time, sequence, route index, operation position)
+    waiting = {}  #machine: heap of (priority, sequence, route index, operation position)
+    busy = collections.Counter()  #machine: units in use
+    sequence = 0
+
+    def release(index, position, time):
+        nonlocal sequence
+        machine = routes[index].operations[position][0]
+        heapq.heappush(waiting.setdefault(machine, []),
+                       (priority(routes[index], position, time), sequence, index, position))
+        sequence += 1
+        return machine
+
+    def dispatch(machine, time):
+        nonlocal sequence
+        calendar = calendars.get(machine, default_calendar)
+        queue = waiting[machine]
+        while queue and busy[machine] < calendar.units:
+            key, order, index, position = heapq.heappop(queue)
+            begin = calendar.next_start(time)
+            end = calendar.add_hours(begin, routes[index].operations[position][1])
+            busy[machine] += 1
+            bookings.append(Booking(index, position, machine, begin, end))
+            heapq.heappush(events, (end, sequence, index, position))
+            sequence += 1
+
+    touched = {release(index, 0, start) for index, route in enumerate(routes) if route.operations}
+    for machine in sorted(touched):  #set order of strings changes with the hash seed, the ties would too
+        dispatch(machine, start)
+
+    while events:
+        time = events[0][0]
+        touched = set()
+        while events and events[0][0] == time:  #every operation finishing now, before dispatching
+            end, order, index, position = heapq.heappop(events)
+            route = routes[index]
+            machine = route.operations[position][0]
+            busy[machine] -= 1
+            touched.add(machine)
+            if position + 1 < len(route.operations):
+                touched.add(release(index, position + 1, time))
+            else:
+                part_end[index] = time
+        for machine in sorted(touched):
+            dispatch(machine, time)
+
+    return Schedule(start, routes, bookings, part_end)
+
+
+def schedule_jobs(jobs, start=None, rule='edd', rates=None):
+    return schedule(routes_from_jobs(jobs, rates), start, rule)
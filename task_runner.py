@@ -0,0 +1,173 @@
+'''
+Background tasks for the GUI: a thread pool, a process pool and a message queue.
+
+The process pool is shared by the whole application: the runner tasks, the reports
+(pdf_reports) and the simulations (risk) all get it from shared_process_pool().
+
+Workers never touch Tk. They put their progress on a queue, and finished futures put
+themselves on the same queue. Task_Runner.poll() runs on the Tk thread (called with
+after()), hands the results to the callbacks and updates the views, and stops after
+POLL_BUDGET seconds so a burst of messages never stalls the mainloop.
+
+A thread task can receive its Task to report progress and check for cancellation:
+    def work(task, rows):
+        for i, row in enumerate(rows):
+            if task.cancelled():
+                raise task_runner.Cancelled()
+            task.report(i / len(rows), 'row {}'.format(i))
+    runner.submit('Export', work, rows, pass_task=True, on_done=open_document)
+'''
+
+import collections
+import concurrent.futures
+import itertools
+import os
+import queue
+import threading
+import time
+
+THREAD_WORKERS = 4
+POLL_BUDGET = 0.010  #seconds of callbacks per poll(), less than a frame
+KEEP_FINISHED = 5  #finished tasks still listed in the views
+PROCESS_WORKERS = max(1, (os.cpu_count() or 2) - 1)  #a core is left for the GUI
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def shared_process_pool():
+    '''The process pool of the application, created on first use from any thread'''
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+        return _process_pool
+
+
+class Cancelled(Exception):
+    '''Raised by a task function that noticed task.cancelled()'''
+
+
+class Task():
+    '''One background task. progress is None while unknown, or from 0 to 1'''
+    def __init__(self, runner, task_id, title, on_done=None, on_error=None):
+        self.runner = runner
+        self.id = task_id
+        self.title = title
+        self.on_done = on_done
+        self.on_error = on_error
+        self.status = 'queued'
+        self.progress = None
+        self.message = ''
+        self.future = None
+        self.cancel_event = threading.Event()
+
+    def report(self, progress, message=''):
+        '''Called from the worker thread'''
+        self.runner.messages.put(('progress', self, progress, message))
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        '''The future is cancelled if it has not started, otherwise a thread task stops at its
+        next check of cancelled(). A process task that started runs to the end, its result is dropped'''
+        self.cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running')
+
+
+class Task_Runner():
+    def __init__(self, thread_workers=THREAD_WORKERS, process_pool=None):
+        self.threads = concurrent.futures.ThreadPoolExecutor(max_workers=thread_workers)
+        self.process_pool = process_pool  #shared_process_pool() if None
+        self.messages = queue.Queue()
+        self.ids = itertools.count(1)
+        self.tasks = collections.OrderedDict()  #id: Task, the active and the last finished tasks
+        self.views = []  #view(task), called on the Tk thread after every change of a task
+
+    def submit(self, title, function, *args, on_done=None, on_error=None, process=False, pass_task=False):
+        '''Runs function(*args) in the thread pool, or in the process pool if process is True.
+        With pass_task, a thread task is called as function(task, *args).
+        on_done(result) and on_error(exception) are called on the Tk thread. Returns the Task'''
+        task = Task(self, next(self.ids), title, on_done, on_error)
+        if process:
+            future = (self.process_pool or shared_process_pool()).submit(function, *args)
+        else:
+            future = self.threads.submit(self.run, task, function, args, pass_task)
+        return self.track(task, future)
+
+    def add_future(self, title, future, on_done=None, on_error=None):
+        '''Tracks a future created elsewhere, like pdf_reports.submit_report()'''
+        return self.track(Task(self, next(self.ids), title, on_done, on_error), future)
+
+    def track(self, task, future):
+        task.future = future
+        self.tasks[task.id] = task
+        future.add_done_callback(lambda future: self.messages.put(('done', task, None, '')))
+        self.notify(task)
+        return task
+
+    def run(self, task, function, args, pass_task):
+        if task.cancelled():
+            raise Cancelled()
+        self.messages.put(('running', task, None, ''))
+        if pass_task:
+            return function(task, *args)
+        return function(*args)
+
+    def cancel(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is not None and task.active:
+            task.cancel()
+
+    def poll(self):
+        '''Hands the messages of the workers to the tasks and their callbacks, call from the Tk thread'''
+        deadline = time.perf_counter() + POLL_BUDGET
+        while time.perf_counter() < deadline:
+            try:
+                kind, task, progress, message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                if task.active:
+                    task.status = 'running'
+                    task.progress = progress
+                    task.message = message
+            elif kind == 'running':
+                if task.status == 'queued':
+                    task.status = 'running'
+            else:
+                self.finish(task)
+            self.notify(task)
+
+    def finish(self, task):
+        future = task.future
+        if future.cancelled() or task.cancelled():
+            task.status = 'cancelled'
+        elif isinstance(future.exception(), Cancelled):
+            task.status = 'cancelled'
+        elif future.exception() is not None:
+            task.status = 'failed'
+            task.message = str(future.exception())
+            if task.on_error is not None:
+                task.on_error(future.exception())
+        else:
+            task.status = 'done'
+            task.progress = 1.0
+            if task.on_done is not None:
+                task.on_done(future.result())
+        finished = [key for key, other in self.tasks.items() if not other.active]
+        for key in finished[:-KEEP_FINISHED]:
+            del self.tasks[key]
+
+    def notify(self, task):
+        for view in self.views:
+            view(task)
+
+    def active_tasks(self):
+        return [task for task in self.tasks.values() if task.active]
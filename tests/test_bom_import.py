@@ -0,0 +1,64 @@
+import pytest
+
+import bom_import
+
+pytest.importorskip('pandas')
+
+
+def rows(result):
+    return [result.table.row(i) for i in range(len(result.table))]
+
+
+def test_clipboard_without_header():
+    result = bom_import.import_text(None, 'P-1\tBracket\t4\tSteel\nP-2\tPlate\t\tAlu\n')
+    assert not result.header
+    assert rows(result) == [['P-1', 'Bracket', '4', 'Steel', ''], ['P-2', 'Plate', '1', 'Alu', '']]
+
+
+def test_header_mapped_by_name():
+    text = 'Qté;Matériel;No de pièce;Other\n2,5;Steel;P-1;x\n3;Alu;P-2;y\n'
+    result = bom_import.import_text(None, text)
+    assert result.header
+    assert rows(result) == [['P-1', '', '2.5', 'Steel', ''], ['P-2', '', '3', 'Alu', '']]
+
+
+def test_rejected_rows_are_reported():
+    text = 'Part Number,Qty,Material\nP-1,2,Steel\n\nP-2,3,Steel,extra\nP-3,-1,Steel\n,4,Steel\nP-4,,"Alu, 6061"\nP-5,1\n'
+    result = bom_import.import_text(None, text)
+    assert [row[0] for row in rows(result)] == ['P-1', 'P-4', 'P-5']
+    assert result.table.row(1)[3] == 'Alu, 6061'
+    assert result.error_count == 2
+    assert result.errors[0] == (4, 'expected 3 fields, saw 4')
+    assert result.errors[1][0] == 5
+    assert 'rejected' in result.summary()
+
+
+def test_line_numbers_across_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(bom_import, 'CHUNK_ROWS', 3)
+    path = tmp_path / 'bom.csv'
+    lines = ['Part Number,Quantity'] + ['P-{},{}'.format(i, 'x' if i == 7 else 1) for i in range(10)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    result = bom_import.import_file(None, str(path))
+    assert len(result.table) == 9
+    assert result.lines == 10
+    assert result.errors == [(9, "quantity 'x' is not a positive number")]
+
+
+def test_no_part_number_column():
+    with pytest.raises(ValueError):
+        bom_import.import_text(None, 'Qty,Material\n1,Steel\n')
+
+
+def test_xlsx(tmp_path):
+    openpyxl = pytest.importorskip('openpyxl')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Item', 'Desc', 'Qty'])
+    sheet.append(['P-1', 'Bracket', 2.0])
+    sheet.append(['P-2', None, 0])
+    sheet.append([None, 'no part', 1])
+    path = str(tmp_path / 'bom.xlsx')
+    workbook.save(path)
+    result = bom_import.import_file(None, path)
+    assert rows(result) == [['P-1', 'Bracket', '2', '', '']]
+    assert result.errors == [(3, "quantity '0' is not a positive number")]
@@ -0,0 +1,52 @@
+import pytest
+
+import costing
+import erp_model
+
+np = pytest.importorskip('numpy')
+
+
+def make_job():
+    job = erp_model.Job('J-1')
+    part = job.add_part('P-1', quantity=4.0, material='Steel 1010')
+    part.add_task('Machining', 'Lathe', 1.5)  #per piece, 1 h setup at 85 $/h
+    part.add_task('Methods', 'Planning', 0.5)  #for the part, at 60 $/h
+    other = job.add_part('P-2', quantity=2.0, material='Unobtainium')
+    other.add_task('Machining', 'Unknown machine', 1.0)  #DEFAULT_RATE, per piece at 75 $/h
+    job.add_part('P-3')
+    job.materials.append(erp_model.Material_Line('Steel 1010', 'P-1', quantity=3.0))
+    return job
+
+
+def test_cost_job():
+    job = make_job()
+    result = costing.cost_job(job)
+    assert result.part_hours.tolist() == [7.5, 2.0, 0.0]
+    assert result.labour_cost.tolist() == [7.0 * 85.0 + 0.5 * 60.0, 150.0, 0.0]
+    assert result.material_cost.tolist() == [4.0 * 10.0 + 3.0 * 10.0, 0.0, 0.0]
+    assert result.job_hours == 9.5
+    assert result.job_cost == pytest.approx(695.0 + 150.0)
+
+
+def test_apply_writes_the_totals():
+    job = make_job()
+    costing.cost_job(job).apply(job)
+    assert [part.hours for part in job.parts] == [7.5, 2.0, 0.0]
+    assert job.cost == pytest.approx(845.0)
+
+
+def test_cost_part_matches_cost_job():
+    job = make_job()
+    rates = costing.Rates()
+    result = costing.cost_job(job, rates)
+    lines = costing.line_costs(job, rates)
+    for part, hours, cost in zip(job.parts, result.part_hours.tolist(), result.part_cost.tolist()):
+        assert costing.cost_part(part, rates, lines.get(part.number, 0.0)) == pytest.approx((hours, cost))
+
+
+def test_job_without_tasks():
+    job = erp_model.Job('J-2')
+    job.add_part('P-1')
+    result = costing.cost_job(job)
+    assert result.job_hours == 0.0
+    assert result.job_cost == 0.0
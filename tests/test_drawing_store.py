@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+import drawing_store
+import erp_model
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return drawing_store.Drawing_Store(str(tmp_path / 'drawings'))
+
+
+def drawing(tmp_path, name, color='red'):
+    path = str(tmp_path / name)
+    Image.new('RGB', (800, 400), color).save(path)
+    return path
+
+
+def test_revision_from_name():
+    assert drawing_store.revision_from_name('part-REV-B-2018-03-18.jpg') == 'B'
+    assert drawing_store.revision_from_name('bracket_rev12.png') == '12'
+    assert drawing_store.revision_from_name('bracket.png') == ''
+
+
+def test_import_stores_the_content_once(store, tmp_path):
+    first = store.import_drawing(drawing(tmp_path, 'a.png'), 'P-1', 'A')
+    second = store.import_drawing(drawing(tmp_path, 'b.png'), 'P-2', 'A')
+    assert first == second
+    assert first.startswith('blobs/')
+    digest = os.path.splitext(os.path.basename(first))[0]
+    assert store.has_pyramid(digest)
+    assert os.path.exists(store.resolve(first))
+
+
+def test_lookup_latest_revision(store, tmp_path):
+    store.import_drawing(drawing(tmp_path, 'b.png', 'red'), 'P-1', 'B')
+    store.import_drawing(drawing(tmp_path, 'aa.png', 'blue'), 'P-1', 'AA')
+    store.import_drawing(drawing(tmp_path, 'c.png', 'green'), 'P-1', 'C')
+    assert store.lookup('P-1') == store.lookup('P-1', 'AA')
+    assert store.lookup('P-1', 'B') != store.lookup('P-1', 'C')
+    assert store.lookup('P-2') is None
+    reopened = drawing_store.Drawing_Store(store.folder)
+    assert reopened.lookup('P-1') == store.lookup('P-1')
+
+
+def test_part_drawing(store, tmp_path):
+    reference = store.import_drawing(drawing(tmp_path, 'a.png'), 'DWG-1', 'A')
+    part = erp_model.Part('P-1', drawing_number='DWG-1')
+    assert part.drawing == erp_model.DEFAULT_DRAWING
+    assert store.part_drawing(part) == store.resolve(reference)
+    part.drawing_number = ''
+    assert store.part_drawing(part) == os.path.join(drawing_store.APPLICATION_FOLDER, 'img',
+                                                    'part-REV-B-2018-03-18.jpg')
+
+
+def test_resolve_blob_path_of_another_machine(store, tmp_path):
+    reference = store.import_drawing(drawing(tmp_path, 'a.png'))
+    foreign = os.path.join(os.sep, 'elsewhere', 'drawings', *reference.split('/'))
+    assert store.resolve(foreign) == store.resolve(reference)
+
+
+def test_display_path(store, tmp_path):
+    blob = store.resolve(store.import_drawing(drawing(tmp_path, 'a.png')))
+    digest = os.path.splitext(os.path.basename(blob))[0]
+    assert store.display_path(blob, (100, 100)) == store.thumbnail_path(digest, 150)
+    assert store.display_path(blob, (2000, 2000)) == store.thumbnail_path(digest, 600)
+    other = drawing(tmp_path, 'other.png')
+    assert store.display_path(other, (100, 100)) == other
@@ -0,0 +1,87 @@
+import datetime
+import sqlite3
+
+import pytest
+
+import erp_model
+import erp_store
+
+
+def make_job(number, status=''):
+    job = erp_model.Job(number, 'Brackets', 'ACME', delivery_date='2026-11-02', status=status)
+    part = job.add_part(number + '-1', quantity=4.0, material='Steel 1010', drawing_number='DWG-7', price=12.5)
+    part.add_task('Machining', 'Lathe', 1.5, 'chamfer')
+    part.add_task('Inspection', 'Manual Inspection', 0.25)
+    job.add_part(number + '-2').add_task()
+    job.checklist[0].check(True, datetime.date(2026, 10, 1))
+    job.materials.append(erp_model.Material_Line('Steel 1010', number + '-1', 'Ordered', 3.0))
+    return job
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = erp_store.Job_Store(str(tmp_path / 'erp.db'))
+    yield store
+    store.close()
+
+
+def test_save_and_load(store):
+    job = make_job('J-1')
+    store.save_job(job)
+    loaded = store.load_job('J-1')
+    assert repr(loaded) == repr(job)
+    assert [repr(part) for part in loaded.parts] == [repr(part) for part in job.parts]
+    assert [repr(task) for task in loaded.parts[0].tasks] == [repr(task) for task in job.parts[0].tasks]
+    assert [repr(item) for item in loaded.checklist] == [repr(item) for item in job.checklist]
+    assert [repr(line) for line in loaded.materials] == [repr(line) for line in job.materials]
+    assert store.load_job('J-2') is None
+
+
+def test_save_replaces_the_previous_version(store):
+    job = make_job('J-1')
+    store.save_job(job)
+    job.remove_part(1)
+    job.parts[0].tasks.pop()
+    store.save_job(job)
+    loaded = store.load_job('J-1')
+    assert len(loaded.parts) == 1
+    assert len(loaded.parts[0].tasks) == 1
+
+
+def test_save_needs_a_job_number(store):
+    with pytest.raises(ValueError):
+        store.save_job(erp_model.Job())
+
+
+def test_load_open_jobs(store):
+    for number, status in (('A', ''), ('B', 'Shipped'), ('C', None), ('D', 'In Progress')):
+        store.save_job(make_job(number, status))
+    jobs = store.load_open_jobs(exclude='D', materials=True)
+    assert [job.number for job in jobs] == ['A', 'C']
+    assert [len(part.tasks) for part in jobs[0].parts] == [2, 1]
+    assert len(jobs[1].materials) == 1
+    assert store.load_open_jobs()[0].materials == []
+
+
+def test_old_database_gets_the_new_columns(tmp_path):
+    path = str(tmp_path / 'old.db')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE parts (job_id INTEGER NOT NULL, position INTEGER NOT NULL, '
+                       'number TEXT, description TEXT, quantity REAL, material TEXT, cost REAL, '
+                       'status TEXT, hours REAL, dimension TEXT, drawing TEXT, '
+                       'PRIMARY KEY (job_id, position)) WITHOUT ROWID')
+    connection.close()
+
+    store = erp_store.Job_Store(path)
+    columns = [row[1] for row in store.connection.execute('PRAGMA table_info(parts)')]
+    assert columns[-3:] == ['drawing_number', 'price', 'material_usage']
+    store.save_job(make_job('J-1'))
+    part = store.load_job('J-1').parts[0]
+    assert (part.drawing_number, part.price, part.material_usage) == ('DWG-7', 12.5, 1.0)
+    store.close()
+
+
+def test_stock(store):
+    store.save_stock({'Steel 1010': (5.0, 2.0)})
+    store.save_stock({'Steel 1010': (4.0, 0.0), 'Acier 1020': (1.0, 1.0)})
+    assert store.load_stock() == {'Steel 1010': (4.0, 0.0), 'Acier 1020': (1.0, 1.0)}
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import event_log
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'events.jsonl'), str(tmp_path / 'snapshot.json')
+
+
+def test_record_and_reload(paths):
+    log = event_log.Event_Log(*paths)
+    log.record('checklist', 'J-1', 'Purchase', (True, 'Bob', '2026-10-18'))
+    log.record('routing', 'J-1', keys=['P-1', 'P-2'], value=[['Machining', 'Lathe', 1.0]])
+    assert log.record_change('status', 'J-1', 'job', '', default='') is None
+    assert log.record_change('status', 'J-1', 'job', 'Released', default='')['seq'] == 3
+    assert log.record_change('checklist', 'J-1', 'Purchase', (True, 'Bob', '2026-10-18')) is None
+    log.close()
+
+    reloaded = event_log.Event_Log(*paths)
+    assert reloaded.state == log.state
+    assert reloaded.seq == 3
+    assert reloaded.get('routing', 'J-1', 'P-2') == [['Machining', 'Lathe', 1.0]]
+    reloaded.close()
+
+
+def test_snapshot_then_replay(paths):
+    log = event_log.Event_Log(*paths, snapshot_every=10)
+    for i in range(25):
+        log.record('status', 'J-{}'.format(i % 3), 'job', i)
+    log.close()
+    assert os.path.exists(paths[1])
+    reloaded = event_log.Event_Log(*paths)
+    assert reloaded.state == log.state
+    assert (reloaded.seq, reloaded.since_snapshot) == (25, 5)
+    reloaded.close()
+
+
+def test_bad_line_is_skipped_and_cut_last_line_removed(paths):
+    log = event_log.Event_Log(*paths)
+    for i in range(3):
+        log.record('status', 'J-1', 'k{}'.format(i), i)
+    log.close()
+    with open(paths[0], 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    lines[1] = b'{"seq": 2, garbage\n'
+    with open(paths[0], 'wb') as f:
+        f.write(b''.join(lines) + b'{"seq":4,"ki')
+    size = len(b''.join(lines))
+
+    reloaded = event_log.Event_Log(*paths)
+    assert reloaded.skipped == 1
+    assert reloaded.state == {'status': {'J-1': {'k0': 0, 'k2': 2}}}
+    assert os.path.getsize(paths[0]) == size
+    reloaded.record('status', 'J-1', 'k3', 3)
+    assert [event['key'] for event in reloaded.history('J-1')] == ['k0', 'k2', 'k3']
+    reloaded.close()
+
+
+def test_snapshot_past_the_end_of_the_log(paths):
+    log = event_log.Event_Log(*paths)
+    log.record('status', 'J-1', 'job', 'Released')
+    log.snapshot().result()
+    log.close()
+    open(paths[0], 'wb').close()
+    reloaded = event_log.Event_Log(*paths)
+    assert (reloaded.state, reloaded.seq) == ({}, 0)
+    reloaded.close()
+
+
+def test_history(paths):
+    log = event_log.Event_Log(*paths)
+    for i in range(5):
+        log.record('status', 'J-1', 'job', i)
+        log.record('checklist', 'J-10', 'Purchase', i)
+    assert [event['value'] for event in log.last('J-1', 2)] == [3, 4]
+    assert len(log.last('J-10')) == 5
+    assert len(log.last(kinds={'checklist'})) == 5
+    assert len(log.last()) == 10
+    log.close()
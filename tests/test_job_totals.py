@@ -0,0 +1,61 @@
+import pytest
+
+import costing
+import erp_model
+import job_totals
+
+pytest.importorskip('numpy')
+
+
+class Recorder():
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, changed, removed):
+        self.calls.append(([part.number for part in changed], [part.number for part in removed]))
+
+
+def make_totals():
+    job = erp_model.Job('J-1', delivery_date='2026-11-02')
+    for number in ('P-1', 'P-2'):
+        job.add_part(number, quantity=2.0).add_task('Machining', 'Lathe', 1.0)
+    view = Recorder()
+    return job, job_totals.Job_Totals(job, views=[view]), view
+
+
+def test_recompute_only_notifies_changed_parts():
+    job, totals, view = make_totals()
+    assert view.calls == [(['P-1', 'P-2'], [])]
+    job.parts[0].tasks[0].hours = 2.0
+    totals.mark_dirty(job.parts[0])
+    totals.mark_dirty(job.parts[1])
+    assert totals.recompute() == [job.parts[0]]
+    assert view.calls[-1] == (['P-1'], [])
+    assert totals.job_cost == pytest.approx(costing.cost_job(job).job_cost)
+    assert job.cost == totals.job_cost
+
+
+def test_routing_change_at_the_same_cost_notifies():
+    job, totals, view = make_totals()
+    job.parts[0].tasks[0].operation = '3-axis mill'
+    job.parts[0].tasks[0].hours = (85.0 * 3.0 - 95.0 * 1.5) / 95.0 / 2.0  #same cost, another machine
+    totals.mark_dirty(job.parts[0])
+    assert totals.recompute() == [job.parts[0]]
+
+
+def test_job_input_change_notifies_without_parts():
+    job, totals, view = make_totals()
+    job.delivery_date = '2026-12-01'
+    assert totals.recompute() == []
+    assert view.calls[-1] == ([], [])
+    count = len(view.calls)
+    totals.recompute()
+    assert len(view.calls) == count
+
+
+def test_remove_part():
+    job, totals, view = make_totals()
+    part = job.remove_part(0)
+    totals.remove_part(part)
+    assert view.calls[-1] == ([], ['P-1'])
+    assert totals.job_cost == pytest.approx(costing.cost_job(job).job_cost)
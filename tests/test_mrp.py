@@ -0,0 +1,47 @@
+import pytest
+
+import erp_model
+import mrp
+
+pytest.importorskip('numpy')
+
+
+def make_jobs():
+    late = erp_model.Job('J-late', delivery_date='2026-11-01')
+    late.add_part('P-1', quantity=4.0, material='Steel', material_usage=2.0)
+    late.add_part('P-2', quantity=1.0, material=' Alu ')
+    late.add_part('P-3', quantity=1.0)  #no material
+    late.materials.append(erp_model.Material_Line('Steel', 'P-1', 'Ordered', 3.0))
+    late.materials.append(erp_model.Material_Line('Steel', 'P-1', 'Received', 50.0))
+    soon = erp_model.Job('J-soon', delivery_date='2026-10-25')
+    soon.add_part('P-9', quantity=5.0, material='Steel')
+    return [late, soon]
+
+
+def test_explode():
+    demand = mrp.explode(make_jobs())
+    assert list(zip(demand.jobs, demand.parts, demand.materials, demand.quantities)) == [
+        ('J-late', 'P-1', 'Steel', 8.0), ('J-late', 'P-2', 'Alu', 1.0),
+        ('J-late', 'P-1', 'Steel', 3.0), ('J-soon', 'P-9', 'Steel', 5.0)]
+
+
+def test_plan_serves_the_earliest_due_first():
+    requirements = mrp.plan(mrp.explode(make_jobs()), {'Steel': (6.0, 2.0), 'Brass': (1.0, 0.0)})
+    assert requirements.summary() == [('Alu', 1.0, 0.0, 0.0, 1.0), ('Brass', 0.0, 1.0, 0.0, 0.0),
+                                      ('Steel', 16.0, 6.0, 2.0, 8.0)]
+    assert requirements.job_shortages('J-soon') == []
+    assert requirements.job_shortages('J-late') == [('P-1', 'Steel', 8.0, 5.0), ('P-2', 'Alu', 1.0, 1.0),
+                                                    ('P-1', 'Steel', 3.0, 3.0)]
+    assert [row[0] for row in requirements.missing_materials()] == ['Steel', 'Alu']
+
+
+def test_plan_of_several_demands():
+    late, soon = make_jobs()
+    together = mrp.plan([mrp.explode([late]), mrp.explode([soon])], {'Steel': (20.0, 0.0)})
+    assert together.missing_materials() == [('Alu', 1.0, 0.0, 0.0, 1.0)]
+
+
+def test_empty_demand():
+    requirements = mrp.plan(mrp.Demand(), {})
+    assert requirements.summary() == []
+    assert requirements.job_shortages('J-1') == []
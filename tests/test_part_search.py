@@ -0,0 +1,46 @@
+import erp_model
+import part_search
+
+
+def make_parts():
+    return [erp_model.Part('B-200', 'Bracket', material='Steel'),
+            erp_model.Part('A-100', 'Plate', material='Alu', drawing_number='DWG-B2'),
+            erp_model.Part('B-201', 'Spacer', material='Steel'),
+            erp_model.Part('C-300', 'Big bracket', material='Alu')]
+
+
+def test_prefix_matches_first():
+    search = part_search.Part_Search(make_parts())
+    assert search.search('b') == ([0, 2, 1, 3], True)
+    assert search.search(' B-20 ') == ([0, 2], True)
+    assert search.search('BRACKET') == ([0, 3], True)
+    assert search.search('dwg-b2') == ([1], True)
+    assert search.search('nothing') == ([], True)
+
+
+def test_empty_query_does_not_build_the_index():
+    search = part_search.Part_Search(make_parts())
+    assert search.search('  ') == ([0, 1, 2, 3], True)
+    assert not search.built
+
+
+def test_limit():
+    parts = [erp_model.Part('P-{:03}'.format(i), 'Washer') for i in range(50)]
+    search = part_search.Part_Search(parts)
+    positions, complete = search.search('washer', limit=10)
+    assert positions == list(range(10))
+    assert not complete
+    assert search.search('p-04', limit=5) == ([40, 41, 42, 43, 44], False)
+
+
+def test_narrowing_and_invalidate():
+    parts = make_parts()
+    search = part_search.Part_Search(parts)
+    assert search.search('st') == ([0, 2], True)
+    assert search.search('ste') == ([0, 2], True)
+    parts[2].material = 'Brass'
+    search.invalidate()
+    assert search.search('stee') == ([0], True)
+    parts.append(erp_model.Part('S-1', material='Steel'))
+    search.bind_parts(parts)
+    assert search.search('s') == ([4, 0, 2], True)
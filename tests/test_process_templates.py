@@ -0,0 +1,45 @@
+import pytest
+
+import erp_model
+import process_templates
+
+
+def test_defaults_until_saved(tmp_path):
+    library = process_templates.Template_Library(str(tmp_path / 'templates.json'))
+    assert library.names() == list(process_templates.DEFAULT_TEMPLATES)
+    assert 'Milled Part' in library
+    assert 'Nothing' not in library
+
+
+def test_apply_gives_every_part_its_own_tasks():
+    library = process_templates.Template_Library(None)
+    parts = [erp_model.Part('P-1'), erp_model.Part('P-2')]
+    parts[0].add_task('Machining', 'Lathe', 9.0)
+    library.apply('Milled Part', parts)
+    assert [(task.department, task.operation, task.hours) for task in parts[0].tasks] == \
+        list(process_templates.DEFAULT_TEMPLATES['Milled Part'])
+    parts[0].tasks[0].hours = 7.0
+    assert parts[1].tasks[0].hours == 0.5
+
+
+def test_operation_must_belong_to_its_department():
+    library = process_templates.Template_Library(None)
+    with pytest.raises(ValueError):
+        library.add('Wrong', [('Machining', 'Planning', 1.0)])
+    assert 'Wrong' not in library
+
+
+def test_save_add_from_part_and_remove(tmp_path):
+    path = str(tmp_path / 'templates.json')
+    library = process_templates.Template_Library(path)
+    part = erp_model.Part('P-1')
+    part.add_task('Machining', 'Lathe', 2.0, notes='left out')
+    part.add_task('Inspection', 'CMM Inspection', 0.5)
+    library.add_from_part('Turned', part)
+    library.remove('Template 1')
+    library.save()
+
+    reloaded = process_templates.Template_Library(path)
+    assert reloaded.get('Turned') == (('Machining', 'Lathe', 2.0), ('Inspection', 'CMM Inspection', 0.5))
+    assert 'Template 1' not in reloaded
+    assert reloaded.names() == library.names()
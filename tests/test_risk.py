@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+import risk
+import scheduler
+from scheduler import Route
+
+np = pytest.importorskip('numpy')
+
+START = datetime.datetime(2026, 10, 19, 7)  #a monday
+CALENDAR = scheduler.Calendar(hours_per_day=8.0, shift_start=7.0, holidays=[datetime.date(2026, 10, 21)])
+
+
+def make_schedule():
+    routes = [Route('J-{}'.format(i % 3), 'P-{}'.format(i), i, scheduler.to_time(START) + 24.0 * (3 + i),
+                    [('Lathe', 3.0 + i % 4), ('Mill', 2.5), ('Lathe', 1.0)]) for i in range(12)]
+    calendars = {'Lathe': CALENDAR, 'Mill': scheduler.Calendar(hours_per_day=16.0, shift_start=6.0, units=2)}
+    return scheduler.schedule(routes, START, calendars=calendars), calendars
+
+
+def test_working_time_matches_the_calendar():
+    start = scheduler.to_time(START)
+    table = risk.Working_Time(CALENDAR, start, start + 24.0 * 30)
+    begins = np.array([start, start + 3.5, start + 10.0, start + 49.0, start + 100.0])
+    for work in (0.5, 4.0, 8.0, 30.0):
+        ends = table.time_at(table.hours_at(begins) + work)
+        expected = [CALENDAR.add_hours(begin, work) for begin in begins.tolist()]
+        assert ends.tolist() == pytest.approx(expected, abs=1e-9)
+
+
+def test_replay_without_variation_gives_the_schedule(monkeypatch):
+    #triangular() needs low < high, a factor above 1 would push an operation ending at the
+    #end of a shift to the next shift
+    monkeypatch.setattr(risk, 'HOURS_LOW', 1.0 - 1e-12)
+    monkeypatch.setattr(risk, 'HOURS_MODE', 1.0)
+    monkeypatch.setattr(risk, 'HOURS_HIGH', 1.0)
+    monkeypatch.setattr(risk, 'MACHINE_DOWNTIME', 0.0)
+    schedule, calendars = make_schedule()
+    plan = risk.Plan(schedule, calendars=calendars)
+    ends = risk.simulate_chunk(plan, 4, np.random.SeedSequence(1))
+    assert ends.dtype == np.float64
+    assert ends.shape == (12, 4)
+    for row, end in zip(ends.tolist(), schedule.part_end):
+        assert row == pytest.approx([end] * 4, abs=1e-6)
+
+
+def test_selected_routes_and_seed():
+    schedule, calendars = make_schedule()
+    plan = risk.Plan(schedule, jobs={'J-1'}, calendars=calendars)
+    assert plan.selected.tolist() == [1, 4, 7, 10]
+    ends = risk.simulate_chunk(plan, 50, np.random.SeedSequence(2))
+    assert ends.shape == (4, 50)
+    assert ends.tolist() == risk.simulate_chunk(plan, 50, np.random.SeedSequence(2)).tolist()
+    assert (ends.std(axis=1) > 0).all()
+
+
+def test_simulate():
+    schedule, calendars = make_schedule()
+    schedule = scheduler.schedule(schedule.routes, START)  #default calendars, like the application
+    result = risk.simulate(schedule, samples=300, jobs=['J-0'], seed=3)
+    assert result.samples == 300
+    assert set(result.jobs) == {'J-0'}
+    for probability, p50, p90 in list(result.parts.values()) + list(result.jobs.values()):
+        assert 0.0 <= probability <= 1.0
+        assert p50 <= p90
@@ -0,0 +1,88 @@
+import datetime
+import os
+import subprocess
+import sys
+
+import scheduler
+from scheduler import Route
+
+MONDAY = datetime.datetime(2026, 10, 19)
+
+
+def hours(day, hour):
+    '''Scheduler time of a day of the week of MONDAY'''
+    return scheduler.to_time(MONDAY + datetime.timedelta(days=day, hours=hour))
+
+
+def test_calendar():
+    calendar = scheduler.Calendar(hours_per_day=8.0, shift_start=7.0, holidays=[datetime.date(2026, 10, 20)])
+    assert calendar.next_start(hours(0, 3)) == hours(0, 7)
+    assert calendar.next_start(hours(0, 16)) == hours(2, 7)  #after the shift, tuesday is a holiday
+    assert calendar.next_start(hours(4, 20)) == hours(7, 7)  #friday evening to monday
+    assert calendar.add_hours(hours(0, 13), 2.0) == hours(0, 15)  #at the end of the shift
+    assert calendar.add_hours(hours(0, 13), 5.0) == hours(2, 10)
+    assert calendar.add_hours(hours(0, 5), 1.0) == hours(0, 8)
+
+
+def test_time_conversions():
+    assert scheduler.to_datetime(scheduler.to_time(MONDAY.replace(hour=9, minute=30))) == MONDAY.replace(hour=9, minute=30)
+    assert scheduler.due_time('2026-10-19') == hours(1, 0)
+    assert scheduler.due_time('') == scheduler.NO_DUE_DATE
+    assert scheduler.due_time('someday') == scheduler.NO_DUE_DATE
+
+
+def make_schedule(routes, rule='edd'):
+    calendars = {'Lathe': scheduler.Calendar(hours_per_day=8.0, shift_start=7.0),
+                 'Mill': scheduler.Calendar(hours_per_day=8.0, shift_start=7.0, units=2)}
+    return scheduler.schedule(routes, MONDAY.replace(hour=7), rule, calendars)
+
+
+def test_earliest_due_date_first():
+    routes = [Route('J-late', 'P-1', 1, hours(4, 24), [('Lathe', 4.0)]),
+              Route('J-soon', 'P-2', 2, hours(1, 24), [('Lathe', 4.0)])]
+    result = make_schedule(routes)
+    assert result.part_end == [hours(0, 15), hours(0, 11)]
+    assert result.job_lateness() == {'J-late': -4, 'J-soon': -1}
+
+
+def test_operations_in_routing_order_and_machine_units():
+    routes = [Route('J-1', 'P-{}'.format(i), i, hours(4, 24), [('Mill', 2.0), ('Lathe', 1.0)]) for i in range(3)]
+    result = make_schedule(routes)
+    mills = [booking for booking in result.bookings if booking.machine == 'Mill']
+    assert sorted(booking.start for booking in mills) == [hours(0, 7), hours(0, 7), hours(0, 9)]
+    for booking in result.bookings:
+        if booking.machine == 'Lathe':
+            mill = next(b for b in mills if b.route == booking.route)
+            assert booking.start >= mill.end
+    assert max(result.part_end) == result.job_end['J-1']
+
+
+SCHEDULE_SCRIPT = """
+import datetime, scheduler
+machines = ['Lathe', 'Mill', 'Drill', 'Saw', 'Press', 'Grinder']
+routes = [scheduler.Route('J-1', str(i), i, 1e9, [(machines[(i + k) % 6], 1.0) for k in range(3)])
+          for i in range(30)]
+print(scheduler.schedule(routes, datetime.datetime(2026, 10, 19, 7)).bookings)
+"""
+
+
+def test_schedule_does_not_depend_on_the_hash_seed():
+    root = os.path.dirname(os.path.abspath(scheduler.__file__))
+    outputs = set()
+    for seed in ('1', '2', '3'):
+        environment = dict(os.environ, PYTHONHASHSEED=seed)
+        outputs.add(subprocess.run([sys.executable, '-c', SCHEDULE_SCRIPT], cwd=root, env=environment,
+                                   capture_output=True, text=True, check=True).stdout)
+    assert len(outputs) == 1
+
+
+def test_routes_from_jobs():
+    import erp_model
+    job = erp_model.Job('J-1', delivery_date='2026-10-23')
+    part = job.add_part('P-1', quantity=3.0)
+    part.add_task('Machining', 'Lathe', 2.0)  #1 h setup + 3 x 2 h
+    part.add_task('Methods', 'Planning', 0.5)  #for the part
+    route, = scheduler.routes_from_jobs([job])
+    assert route.operations == [('Lathe', 7.0), ('Planning', 0.5)]
+    assert route.work_left == [7.5, 0.5, 0.0]
+    assert route.due == hours(5, 0)